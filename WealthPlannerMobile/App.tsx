@@ -1,13 +1,15 @@
 import React, { useEffect } from 'react';
 import { GestureHandlerRootView } from 'react-native-gesture-handler';
-import { Provider, useSelector } from 'react-redux';
+import { Provider, useDispatch, useSelector } from 'react-redux';
 import { PersistGate } from 'redux-persist/integration/react';
 import { ActivityIndicator, View } from 'react-native';
 import { store, persistor } from './src/redux/store';
 import { initializeAuth } from './src/api/client';
+import { bootstrapApp } from './src/redux/slices/authSlice';
 import AppNavigator from './src/navigation/AppNavigator';
 
 const AppContent = () => {
+  const dispatch = useDispatch();
   const { tokens } = useSelector(state => state.auth);
 
   useEffect(() => {
@@ -15,10 +17,11 @@ const AppContent = () => {
     initializeAuth();
   }, []);
 
-  // Re-initialize when tokens change (restored from persist)
+  // Re-initialize when tokens change (restored from persist), then load
+  // profile, dashboard and savings in one request
   useEffect(() => {
     if (tokens?.access) {
-      initializeAuth();
+      initializeAuth().then(() => dispatch(bootstrapApp()));
     }
   }, [tokens]);
 
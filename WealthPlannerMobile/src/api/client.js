@@ -174,6 +174,11 @@ export const transactionAPI = {
     reorder: (order) => api.post('/api/transactions/reorder/', { order }),
 };
 
+// App launch: profile, this month's dashboard, savings and sync cursor in one request
+export const bootstrapAPI = {
+    get: () => api.get('/api/bootstrap/'),
+};
+
 // Dashboard API
 export const dashboardAPI = {
     getSummary: (params) => api.get('/api/dashboard/', { params }),
@@ -187,6 +192,7 @@ export const savingsAPI = {
 // Settings API
 export const settingsAPI = {
     resetData: () => api.post('/api/settings/reset/'),
+    deletionStatus: (id) => api.get(`/api/settings/deletions/${id}/`),
     toggleTheme: () => api.post('/api/settings/toggle-theme/'),
 };
 
@@ -1,5 +1,5 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
-import api, { authAPI, userAPI, setTokens, clearTokens } from '../../api/client';
+import api, { authAPI, bootstrapAPI, userAPI, setTokens, clearTokens } from '../../api/client';
 
 // Async thunks
 export const checkUserStatus = createAsyncThunk(
@@ -66,6 +66,19 @@ export const fetchUserProfile = createAsyncThunk(
     }
 );
 
+// App launch: profile, this month's dashboard and this year's savings in one request
+export const bootstrapApp = createAsyncThunk(
+    'auth/bootstrapApp',
+    async (_, { rejectWithValue }) => {
+        try {
+            const response = await bootstrapAPI.get();
+            return response.data;
+        } catch (error) {
+            return rejectWithValue(error.response?.data?.error || 'Failed to load app');
+        }
+    }
+);
+
 export const updateUserProfile = createAsyncThunk(
     'auth/updateUserProfile',
     async (data, { rejectWithValue }) => {
@@ -184,6 +197,10 @@ const authSlice = createSlice({
             .addCase(fetchUserProfile.fulfilled, (state, action) => {
                 state.user = action.payload;
             })
+            // Bootstrap (dashboard and savings sections are taken by their slices)
+            .addCase(bootstrapApp.fulfilled, (state, action) => {
+                state.user = action.payload.user;
+            })
             // Update User Profile
             .addCase(updateUserProfile.pending, (state) => {
                 state.loading = true;
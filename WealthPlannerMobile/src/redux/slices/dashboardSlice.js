@@ -1,5 +1,6 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import { dashboardAPI, transactionAPI } from '../../api/client';
+import { bootstrapApp } from './authSlice';
 
 // Async thunks
 export const fetchDashboard = createAsyncThunk(
@@ -62,6 +63,18 @@ export const reorderTransactions = createAsyncThunk(
     }
 );
 
+const applyDashboard = (state, data) => {
+    state.data = data;
+    state.transactions = data.transactions || [];
+    state.totalIncome = data.total_income || 0;
+    state.totalSpent = data.total_spent || 0;
+    state.balance = data.balance || 0;
+    state.categories = data.categories || { needs: 0, wants: 0, savings: 0 };
+    state.limits = data.limits || { needs: 0, wants: 0, savings: 0 };
+    state.advice = data.advice || [];
+    state.history = data.history || [];
+};
+
 const initialState = {
     data: null,
     transactions: [],
@@ -74,6 +87,7 @@ const initialState = {
     history: [],
     currentYear: new Date().getFullYear(),
     currentMonth: new Date().getMonth() + 1,
+    bootstrapStatus: 'idle', // 'pending' or 'done': the launch bootstrap brings the current month
     loading: false,
     error: null,
 };
@@ -99,20 +113,26 @@ const dashboardSlice = createSlice({
             })
             .addCase(fetchDashboard.fulfilled, (state, action) => {
                 state.loading = false;
-                state.data = action.payload;
-                state.transactions = action.payload.transactions || [];
-                state.totalIncome = action.payload.total_income || 0;
-                state.totalSpent = action.payload.total_spent || 0;
-                state.balance = action.payload.balance || 0;
-                state.categories = action.payload.categories || { needs: 0, wants: 0, savings: 0 };
-                state.limits = action.payload.limits || { needs: 0, wants: 0, savings: 0 };
-                state.advice = action.payload.advice || [];
-                state.history = action.payload.history || [];
+                applyDashboard(state, action.payload);
             })
             .addCase(fetchDashboard.rejected, (state, action) => {
                 state.loading = false;
                 state.error = action.payload;
             })
+            // Bootstrap: the dashboard of the month in progress
+            .addCase(bootstrapApp.pending, (state) => {
+                const today = new Date();
+                state.currentYear = today.getFullYear();
+                state.currentMonth = today.getMonth() + 1;
+                state.bootstrapStatus = 'pending';
+            })
+            .addCase(bootstrapApp.fulfilled, (state, action) => {
+                state.bootstrapStatus = 'done';
+                applyDashboard(state, action.payload.dashboard);
+            })
+            .addCase(bootstrapApp.rejected, (state) => {
+                state.bootstrapStatus = 'failed';
+            })
             // Add Transaction
             .addCase(addTransaction.pending, (state) => {
                 state.loading = true;
@@ -1,5 +1,6 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import { settingsAPI, savingsAPI } from '../../api/client';
+import { bootstrapApp } from './authSlice';
 
 // Async thunks
 export const fetchSavings = createAsyncThunk(
@@ -14,12 +15,23 @@ export const fetchSavings = createAsyncThunk(
     }
 );
 
+const DELETION_POLL_MS = 1000;
+const DELETION_POLL_LIMIT = 120;
+
 export const resetAllData = createAsyncThunk(
     'settings/resetAllData',
     async (_, { rejectWithValue }) => {
         try {
             const response = await settingsAPI.resetData();
-            return response.data;
+            // 202: transactions are deleted in the background; wait so refetches don't bring them back
+            let deletion = response.data.deletion;
+            for (let i = 0; response.status === 202 && i < DELETION_POLL_LIMIT; i++) {
+                if (deletion.status === 'done') break;
+                if (deletion.status === 'failed') return rejectWithValue('Failed to delete transactions');
+                await new Promise((resolve) => setTimeout(resolve, DELETION_POLL_MS));
+                deletion = (await settingsAPI.deletionStatus(deletion.id)).data;
+            }
+            return { ...response.data, deletion };
         } catch (error) {
             return rejectWithValue(error.response?.data?.error || 'Failed to reset data');
         }
@@ -71,6 +83,10 @@ const settingsSlice = createSlice({
                 state.loading = false;
                 state.error = action.payload;
             })
+            // Bootstrap: this year's savings
+            .addCase(bootstrapApp.fulfilled, (state, action) => {
+                state.savings = action.payload.savings;
+            })
             // Reset All Data
             .addCase(resetAllData.pending, (state) => {
                 state.loading = true;
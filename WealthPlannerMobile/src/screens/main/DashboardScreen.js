@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import {
     View,
     Text,
@@ -31,7 +31,7 @@ const DashboardScreen = ({ navigation }) => {
     const {
         transactions, totalIncome, totalSpent, balance,
         categories, limits, advice, history,
-        currentYear, currentMonth
+        currentYear, currentMonth, bootstrapStatus
     } = useSelector(state => state.dashboard);
 
     const [activeTab, setActiveTab] = useState('dashboard');
@@ -49,11 +49,24 @@ const DashboardScreen = ({ navigation }) => {
         dispatch(fetchDashboard({ year: currentYear, month: currentMonth }));
     }, [dispatch, currentYear, currentMonth]);
 
-    // Load on mount and when month changes - silently in background
+    // Load on mount and when month changes - silently in background.
+    // The launch bootstrap already brings the current month, so mounting during it doesn't load again
+    const skipInitialLoad = useRef(bootstrapStatus === 'pending' || bootstrapStatus === 'done');
     useEffect(() => {
+        if (skipInitialLoad.current) {
+            skipInitialLoad.current = false;
+            return;
+        }
         loadDashboard();
     }, [currentYear, currentMonth]);
 
+    // Bootstrap failed: load the dashboard by itself
+    useEffect(() => {
+        if (bootstrapStatus === 'failed') {
+            loadDashboard();
+        }
+    }, [bootstrapStatus]);
+
     // Pre-fetch adjacent months for instant navigation
     useEffect(() => {
         const prevMonth = currentMonth === 1 ? 12 : currentMonth - 1;
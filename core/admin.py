@@ -1,27 +1,209 @@
+"""
+Admin for tables with millions of rows.
+
+The change lists avoid everything that scans a whole table: the user is
+picked with autocomplete or filtered by phone, never listed in a sidebar;
+rows are ordered by primary key; there is no date_hierarchy; related users
+are joined rather than fetched per row; and the paginator counts at most
+COUNT_LIMIT rows (on PostgreSQL, an unfiltered table uses the planner's
+estimate), with the full result count turned off. A search term of digits
+matches the phone number exactly, through its unique index, and searches
+the text as usual if no phone matches. "Export as CSV" streams the
+selected rows instead of building the file in memory.
+"""
+import csv
+from itertools import chain
+
 from django.contrib import admin
-from .models import User, OTP, Transaction
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+
+from . import deletion
+from .models import (User, OTP, Transaction, RecurringRule, RevokedToken, TransactionArchive, ArchivedMonth,
+                     DeletionRequest)
+
+
+# ============== Large tables ==============
+
+class EstimatedCountPaginator(Paginator):
+    """Counts at most COUNT_LIMIT rows, so paging never scans a large table"""
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.where and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > self.COUNT_LIMIT:
+                return row[0]
+        return queryset.order_by()[:self.COUNT_LIMIT].count()
+
+
+class PhoneFilter(admin.SimpleListFilter):
+    """Rows of the user with this exact phone number, typed in rather than picked from a list of every user"""
+    title = 'user phone'
+    parameter_name = 'phone'
+    field = 'user__phone'
+    template = 'admin/core/phone_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        # Kept as hidden inputs, so typing a phone adds to the other filters
+        self.other_params = [(key, value) for key, values in request.GET.lists()
+                             if key not in (self.parameter_name, 'p') for value in values]
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.field: self.value().strip()})
+        return queryset
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for csv.writer into a streaming response"""
+
+    def write(self, value):
+        return value
+
+
+@admin.action(description='Export selected as CSV')
+def export_csv(modeladmin, request, queryset):
+    fields = modeladmin.csv_fields
+    writer = csv.writer(Echo())
+    rows = queryset.order_by('pk').values_list(*fields).iterator(chunk_size=2000)
+    response = StreamingHttpResponse(
+        chain([writer.writerow(fields)], (writer.writerow(row) for row in rows)),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{queryset.model._meta.model_name}s.csv"'
+    return response
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Change list settings for tables too big to count, sort or list related rows from in full"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-pk',)
+    phone_search_field = 'user__phone'
+    csv_fields = ()
 
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if term.lstrip('+').isdigit():
+            by_phone = queryset.filter(**{self.phone_search_field: term})
+            # Otherwise it's a number in the text, e.g. an invoice number in a description
+            if by_phone.exists():
+                return by_phone, False
+        return super().get_search_results(request, queryset, search_term)
+
+    def lookup_allowed(self, lookup, value, request=None):
+        # One user's rows by id, as linked from the user list; 'user' itself stays out of list_filter
+        return lookup == 'user__id__exact' or super().lookup_allowed(lookup, value, request)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if self.csv_fields:
+            actions['export_csv'] = self.get_action(export_csv)
+        return actions
+
+
+# ============== Models ==============
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
-    list_display = ('phone', 'income', 'currency', 'theme', 'created_at')
+class UserAdmin(LargeTableAdmin):
+    list_display = ('phone', 'name', 'income', 'currency', 'theme', 'created_at', 'transactions_link')
     list_filter = ('currency', 'theme', 'created_at')
-    search_fields = ('phone',)
-    readonly_fields = ('created_at', 'updated_at')
+    search_fields = ('name',)  # Digits search the phone; see get_search_results
+    phone_search_field = 'phone'
+    readonly_fields = ('created_at', 'updated_at', 'data_version', 'has_archive')
+    csv_fields = ('id', 'phone', 'name', 'income', 'currency', 'theme', 'created_at')
+
+    @admin.display(description='Transactions')
+    def transactions_link(self, user):
+        url = reverse('admin:core_transaction_changelist')
+        return format_html('<a href="{}?user__id__exact={}">View</a>', url, user.pk)
 
 
 @admin.register(OTP)
 class OTPAdmin(admin.ModelAdmin):
-    list_display = ('phone', 'code', 'is_verified', 'created_at')
-    list_filter = ('is_verified', 'created_at')
+    list_display = ('phone', 'code', 'is_verified', 'delivery_status', 'delivery_attempts', 'created_at')
+    list_filter = ('is_verified', 'delivery_status', 'created_at')
     search_fields = ('phone',)
-    readonly_fields = ('created_at',)
+    readonly_fields = ('created_at', 'delivered_at', 'provider_message_id', 'delivery_error')
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(LargeTableAdmin):
     list_display = ('user', 'description', 'amount', 'category', 'date', 'order')
-    list_filter = ('category', 'date', 'user')
-    search_fields = ('description', 'user__phone')
+    list_select_related = ('user',)
+    list_filter = (PhoneFilter, 'category', 'date')
+    search_fields = ('description',)
+    autocomplete_fields = ('user',)
+    raw_id_fields = ('recurring_rule',)
+    readonly_fields = ('created_at', 'updated_at')
+    csv_fields = ('id', 'user__phone', 'description', 'amount', 'category', 'date', 'order',
+                  'recurring_rule_id', 'created_at', 'updated_at')
+
+
+@admin.register(RecurringRule)
+class RecurringRuleAdmin(LargeTableAdmin):
+    list_display = ('user', 'description', 'amount', 'category', 'frequency', 'start_date', 'end_date')
+    list_select_related = ('user',)
+    list_filter = (PhoneFilter, 'category', 'frequency')
+    search_fields = ('description',)
+    autocomplete_fields = ('user',)
     readonly_fields = ('created_at', 'updated_at')
-    date_hierarchy = 'date'
+    csv_fields = ('id', 'user__phone', 'description', 'amount', 'category', 'frequency', 'start_date',
+                  'end_date')
+
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ('jti', 'token_type', 'user_id', 'expires_at', 'revoked_at')
+    list_filter = ('token_type',)
+    search_fields = ('jti', 'user_id')
+    readonly_fields = ('revoked_at',)
+
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(LargeTableAdmin):
+    list_display = ('user', 'year', 'count', 'created_at')
+    list_select_related = ('user',)
+    list_filter = (PhoneFilter, 'year')
+    exclude = ('data',)
+    readonly_fields = ('user', 'year', 'count', 'created_at')
+
+
+@admin.register(ArchivedMonth)
+class ArchivedMonthAdmin(LargeTableAdmin):
+    list_display = ('user', 'month', 'category', 'total', 'count', 'recurring_total')
+    list_select_related = ('user',)
+    list_filter = (PhoneFilter, 'category', 'month')
+
+
+@admin.register(DeletionRequest)
+class DeletionRequestAdmin(admin.ModelAdmin):
+    list_display = ('phone', 'kind', 'status', 'deleted', 'total', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('phone',)
+    readonly_fields = ('user', 'last_transaction_id', 'last_rule_id', 'total', 'deleted', 'error',
+                       'created_at', 'started_at', 'finished_at')
+    actions = ['approve']
+
+    @admin.action(description='Approve and delete the selected accounts')
+    def approve(self, request, queryset):
+        approved = deletion.approve(queryset.filter(status=DeletionRequest.REQUESTED))
+        self.message_user(request, f'Queued {approved} account deletions')
@@ -0,0 +1,230 @@
+"""
+Declarative advisor rules.
+
+Each rule is a function registered with @rule(...) naming the aggregates it
+reads. advise() works out the union of aggregates the registered rules need,
+computes each of them once (or takes precomputed ones from the caller), and
+evaluates every rule in registration order. A rule returns an advice dict, a
+list of them, or None. Adding advice means adding a rule here, not editing
+the views.
+
+Results are cached per (user, month, User.data_version); the current month
+also keys on today's date since the forecast moves with it.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+
+from . import forecasting, metrics, recurring
+from .models import Transaction
+
+
+def get_advisor_settings():
+    """ADVISOR settings merged over defaults"""
+    config = {
+        'CACHE_TIMEOUT': 60 * 60 * 24,  # Seconds; entries are also invalidated by data_version
+    }
+    config.update(getattr(settings, 'ADVISOR', {}))
+    return config
+
+
+AGGREGATES = {}
+RULES = []
+
+
+def aggregate(name):
+    """Register func(ctx) as the provider of a named aggregate"""
+    def decorator(func):
+        AGGREGATES[name] = func
+        return func
+    return decorator
+
+
+def rule(*requires, stop=False):
+    """Register func(ctx, **aggregates) as an advice rule.
+
+    With stop=True, no later rules run once this one has produced advice.
+    """
+    def decorator(func):
+        unknown = set(requires) - set(AGGREGATES)
+        if unknown:
+            raise ValueError(f'Rule {func.__name__} requires unknown aggregates: {", ".join(sorted(unknown))}')
+        RULES.append((func, tuple(requires), stop))
+        return func
+    return decorator
+
+
+class AdvisorContext:
+    def __init__(self, user, year, month, today=None, recurring_rules=None):
+        self.user = user
+        self.year = year
+        self.month = month
+        self.today = today or date.today()
+        self.recurring_rules = recurring_rules
+
+    @property
+    def is_current_month(self):
+        return (self.year, self.month) == (self.today.year, self.today.month)
+
+
+class MonthTotals:
+    """Spend and extra income for one month, by category"""
+
+    def __init__(self, income):
+        self.income = income
+        self.total_spent = Decimal('0')
+        self.extra_income = Decimal('0')
+        self.categories = {'needs': Decimal('0'), 'wants': Decimal('0'), 'savings': Decimal('0')}
+
+    def add(self, category, amount):
+        if category == 'income':
+            self.extra_income += amount
+        else:
+            self.total_spent += amount
+            if category in self.categories:
+                self.categories[category] += amount
+
+    @property
+    def total_income(self):
+        return self.income + self.extra_income
+
+    @property
+    def balance(self):
+        return self.total_income - self.total_spent
+
+
+class Advice:
+    """advise() result: the advice list and the aggregates it was computed from"""
+
+    def __init__(self, advice, aggregates):
+        self.advice = advice
+        self.aggregates = aggregates
+
+
+# ============== Aggregates ==============
+
+@aggregate('month_totals')
+def month_totals(ctx):
+    """Totals summed in the database, plus recurring transactions not confirmed yet"""
+    totals = MonthTotals(ctx.user.income)
+    month_txs = Transaction.objects.filter(user=ctx.user, date__year=ctx.year, date__month=ctx.month)
+    for category, amount in month_txs.values_list('category').annotate(total=Sum('amount')).order_by():
+        totals.add(category, amount)
+    confirmed = month_txs.filter(recurring_rule__isnull=False).only('recurring_rule_id', 'date')
+    for tx in recurring.virtual_transactions(ctx.user, ctx.year, ctx.month, confirmed):
+        totals.add(tx.category, tx.amount)
+    return totals
+
+
+@aggregate('forecast')
+def forecast(ctx):
+    """Month-end projection; only the month in progress has one"""
+    if not ctx.is_current_month:
+        return None
+    return forecasting.forecast_user(ctx.user, ctx.today, ctx.recurring_rules)
+
+
+# ============== Rules ==============
+
+@rule(stop=True)
+def setup_required(ctx):
+    if ctx.user.income == 0:
+        return {
+            'type': 'warning',
+            'title': '⚠️ Setup Required',
+            'text': 'Please go to Settings and set your Monthly Income.'
+        }
+
+
+@rule('month_totals')
+def budget_status(ctx, month_totals):
+    income_base = month_totals.total_income if month_totals.total_income > 0 else Decimal('1')
+    total_pct = (month_totals.total_spent / income_base) * 100
+    if total_pct > 100:
+        return {
+            'type': 'warning',
+            'title': '🚨 Over Budget',
+            'text': f'You are spending {total_pct:.1f}% of your income!'
+        }
+    if total_pct < 85:
+        return {
+            'type': 'good',
+            'title': '✅ Good Status',
+            'text': f'You are under budget ({total_pct:.1f}%).'
+        }
+
+
+@rule('month_totals')
+def wants_alert(ctx, month_totals):
+    income_base = month_totals.total_income if month_totals.total_income > 0 else Decimal('1')
+    if (month_totals.categories['wants'] / income_base) * 100 > ctx.user.rule_wants:
+        return {
+            'type': 'warning',
+            'title': '⚠️ Wants Alert',
+            'text': 'You exceeded your "Wants" limit.'
+        }
+
+
+@rule('month_totals')
+def savings_tip(ctx, month_totals):
+    if month_totals.categories['savings'] == 0 and month_totals.total_spent > 0:
+        return {
+            'type': 'info',
+            'title': '💡 Savings Tip',
+            'text': 'No money allocated to Savings yet.'
+        }
+
+
+@rule('month_totals', 'forecast')
+def month_end_forecast(ctx, month_totals, forecast):
+    if forecast is not None:
+        return forecasting.forecast_advice(ctx.user, forecast, month_totals.total_income)
+
+
+# ============== Engine ==============
+
+def cache_key(ctx):
+    key = f'advice:{ctx.user.pk}:{ctx.year}-{ctx.month:02d}:v{ctx.user.data_version}'
+    if ctx.is_current_month:
+        key += f':{ctx.today.isoformat()}'
+    return key
+
+
+def evaluate(ctx, precomputed=None):
+    """Run every rule, computing the aggregates they need once"""
+    values = dict(precomputed or {})
+    required = {name for _, requires, _ in RULES for name in requires}
+    for name in sorted(required - set(values)):
+        values[name] = AGGREGATES[name](ctx)
+
+    advice = []
+    for func, requires, stop in RULES:
+        result = func(ctx, **{name: values[name] for name in requires})
+        if not result:
+            continue
+        advice.extend(result if isinstance(result, list) else [result])
+        if stop:
+            break
+    return Advice(advice, values)
+
+
+def advise(user, year, month, use_cache=True, recurring_rules=None, **precomputed):
+    """Advice for one user and month.
+
+    Callers that already have an aggregate (e.g. month_totals built while
+    rendering the page) pass it by name so it isn't recomputed, and the
+    user's recurring rules if they loaded them.
+    """
+    ctx = AdvisorContext(user, year, month, recurring_rules=recurring_rules)
+    if not use_cache:
+        return evaluate(ctx, precomputed)
+    key = cache_key(ctx)
+    result = cache.get(key)
+    metrics.record_cache('advisor', result is not None)
+    if result is None:
+        result = evaluate(ctx, precomputed)
+        cache.set(key, result, get_advisor_settings()['CACHE_TIMEOUT'])
+    return result
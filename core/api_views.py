@@ -2,20 +2,28 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.db import transaction as db_transaction
 from django.db.models import F
+from django.utils import timezone
 from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
+from copy import copy
 from decimal import Decimal
+from itertools import chain
 import json
 import logging
 
-from .models import User, OTP, Transaction
+from .idempotency import idempotent
+from .models import User, OTP, Transaction, RecurringRule, DeletionRequest
+from . import advisor, archive, bootstrap, deletion, ledger, metrics, otp_delivery, recurring, revocation
 from .serializers import (
     UserSerializer, UserProfileUpdateSerializer,
     OTPSerializer, OTPVerifySerializer,
     TransactionSerializer, TransactionCreateSerializer,
-    TransactionReorderSerializer
+    TransactionReorderSerializer, FastTransactionSerializer,
+    RecurringRuleSerializer, RecurringOccurrenceSerializer, RecurringConfirmSerializer
 )
 import firebase_admin
 from firebase_admin import auth as firebase_auth
@@ -56,6 +64,9 @@ def get_tokens_for_user(user):
 
 def get_user_from_token(request):
     """Extract user from JWT token"""
+    if isinstance(request.user, User):
+        # CustomJWTAuthentication already loaded it for this request
+        return request.user
     try:
         # SimpleJWT puts the validated token in request.auth
         # The token payload contains our custom user_id claim
@@ -78,7 +89,11 @@ def get_user_from_token(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def token_refresh(request):
-    """Custom token refresh endpoint for our custom User model"""
+    """Custom token refresh endpoint for our custom User model.
+    
+    Refresh tokens are single use: the one presented is revoked as the new
+    pair is issued, so a replayed (or stolen and already used) token fails.
+    """
     try:
         refresh_token = request.data.get('refresh')
         if not refresh_token:
@@ -90,12 +105,16 @@ def token_refresh(request):
             token = RT(refresh_token)
             user_id = token.payload.get('user_id')
             
-            if not user_id:
+            if not user_id or revocation.is_revoked(token.get(api_settings.JTI_CLAIM)):
                 return Response({'error': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
             
             # Verify user exists in our custom User model
             user = User.objects.get(id=user_id)
             
+            # Rotate: a concurrent refresh with the same token loses here
+            if not revocation.revoke(token):
+                return Response({'error': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
+            
             # Generate new tokens
             new_tokens = get_tokens_for_user(user)
             
@@ -111,6 +130,24 @@ def token_refresh(request):
         return Response({'error': 'Token refresh failed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def logout(request):
+    """Revoke the refresh token in the body and the access token the request was made with"""
+    from rest_framework_simplejwt.tokens import RefreshToken as RT
+    from rest_framework_simplejwt.exceptions import TokenError
+    
+    tokens = [request.auth] if request.auth is not None else []
+    refresh_token = request.data.get('refresh')
+    if refresh_token:
+        try:
+            tokens.append(RT(refresh_token))
+        except TokenError:
+            return Response({'error': 'Invalid or expired token'}, status=status.HTTP_401_UNAUTHORIZED)
+    revocation.revoke_all(tokens)
+    return Response({'message': 'Logged out'})
+
+
 # ============== Authentication APIs ==============
 
 @api_view(['POST'])
@@ -129,16 +166,10 @@ def send_otp(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Generate OTP
+    # Generate OTP and queue the SMS; delivery happens off the request thread
     otp = OTP.generate_otp(phone)
-    
-    # Log OTP to console (for development)
-    logger.info(f"{'=' * 50}")
-    logger.info(f"OTP for {phone}: {otp.code}")
-    logger.info(f"{'=' * 50}")
-    print(f"\n{'=' * 50}")
-    print(f"📱 OTP for {phone}: {otp.code}")
-    print(f"{'=' * 50}\n")
+    metrics.record_otp_sent('api')
+    otp_delivery.dispatch(otp)
     
     return Response({'message': 'OTP sent successfully', 'phone': phone})
 
@@ -160,6 +191,7 @@ def verify_otp(request):
         if otp.code == code and otp.is_valid():
             otp.is_verified = True
             otp.save()
+            metrics.record_otp_verification('api', True)
             
             # Get or create user
             user, created = User.objects.get_or_create(phone=phone)
@@ -173,11 +205,13 @@ def verify_otp(request):
                 'is_new_user': created or not user.name
             })
         else:
+            metrics.record_otp_verification('api', False)
             return Response(
                 {'error': 'Invalid or expired OTP'},
                 status=status.HTTP_400_BAD_REQUEST
             )
     except OTP.DoesNotExist:
+        metrics.record_otp_verification('api', False)
         return Response(
             {'error': 'OTP not found. Please request a new one.'},
             status=status.HTTP_400_BAD_REQUEST
@@ -205,6 +239,7 @@ def check_user_status(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent(issues_tokens=True)
 def register_with_pin(request):
     """Register new user or Set PIN for existing user"""
     phone = request.data.get('phone')
@@ -263,6 +298,7 @@ def login_with_pin(request):
     try:
         user = User.objects.get(phone=phone)
         if user.pin == pin:
+            metrics.record_login('api', True)
             # Generate tokens
             tokens = get_tokens_for_user(user)
             return Response({
@@ -271,9 +307,11 @@ def login_with_pin(request):
                 'is_new_user': False
             })
         else:
+            metrics.record_login('api', False)
             return Response({'error': 'Invalid PIN'}, status=status.HTTP_401_UNAUTHORIZED)
             
     except User.DoesNotExist:
+        metrics.record_login('api', False)
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
@@ -300,6 +338,7 @@ def user_profile(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def setup_user(request):
     """Setup new user's profile (name, income, currency)"""
     user = get_user_from_token(request)
@@ -339,6 +378,7 @@ def setup_user(request):
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def transaction_list(request):
     """List transactions or create new transaction"""
     user = get_user_from_token(request)
@@ -352,6 +392,14 @@ def transaction_list(request):
         category = request.GET.get('category', 'all')
         search = request.GET.get('search', '').strip()
         
+        archived = archive.month_transactions(user, year, month)
+        if archived is not None:
+            # Decoded from the archive, filtered the same way
+            transactions = [tx for tx in archived
+                            if (category == 'all' or tx.category == category)
+                            and (not search or search.lower() in tx.description.lower())]
+            return Response(FastTransactionSerializer(transactions).data)
+        
         transactions = Transaction.objects.filter(
             user=user,
             date__year=year,
@@ -364,7 +412,7 @@ def transaction_list(request):
         if search:
             transactions = transactions.filter(description__icontains=search)
         
-        return Response(TransactionSerializer(transactions, many=True).data)
+        return Response(FastTransactionSerializer(transactions).data)
     
     elif request.method == 'POST':
         serializer = TransactionCreateSerializer(data=request.data)
@@ -375,29 +423,38 @@ def transaction_list(request):
         tx_date = data.get('date', date.today())
         year = tx_date.year
         month = tx_date.month
+        archive.ensure_hot(user, year)
         
-        # Check balance for expenses
-        if data['category'] != 'income':
-            current_bal = calculate_monthly_balance(user, year, month)
-            if (current_bal - data['amount']) < 0:
+        def create():
+            # Shift existing orders down
+            Transaction.objects.filter(
+                user=user,
+                date__year=year,
+                date__month=month
+            ).update(order=F('order') + 1)
+            
+            # Create transaction
+            return Transaction.objects.create(
+                user=user,
+                order=0,
+                **data
+            )
+        
+        if data['category'] == 'income':
+            transaction = create()
+            user.bump_data_version()
+        else:
+            # Check balance for expenses, atomically with the insert
+            try:
+                transaction = ledger.checked_write(user, year, month, data['amount'], create)
+            except ledger.InsufficientBalance as e:
                 return Response(
-                    {'error': f'Insufficient balance! Available: {user.currency}{current_bal}'},
+                    {'error': f'Insufficient balance! Available: {user.currency}{e.available}'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-        
-        # Shift existing orders down
-        Transaction.objects.filter(
-            user=user,
-            date__year=year,
-            date__month=month
-        ).update(order=F('order') + 1)
-        
-        # Create transaction
-        transaction = Transaction.objects.create(
-            user=user,
-            order=0,
-            **data
-        )
+            except ledger.WriteConflict:
+                return Response({'error': 'Too many concurrent changes, please retry'},
+                                status=status.HTTP_409_CONFLICT)
         
         return Response(TransactionSerializer(transaction).data, status=status.HTTP_201_CREATED)
 
@@ -410,9 +467,13 @@ def transaction_detail(request, pk):
     if not user:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    try:
-        transaction = Transaction.objects.get(id=pk, user=user)
-    except Transaction.DoesNotExist:
+    if request.method == 'GET':
+        # Archived rows are read as they are; only changing one brings its year back
+        transaction = (Transaction.objects.filter(id=pk, user=user).first()
+                       or archive.archived_transaction(user, pk))
+    else:
+        transaction = archive.hot_transaction(user, pk)
+    if transaction is None:
         return Response({'error': 'Transaction not found'}, status=status.HTTP_404_NOT_FOUND)
     
     if request.method == 'GET':
@@ -420,18 +481,50 @@ def transaction_detail(request, pk):
     
     elif request.method == 'PUT':
         serializer = TransactionCreateSerializer(transaction, data=request.data, partial=True)
-        if serializer.is_valid():
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        tx_date = data.get('date', transaction.date)
+        archive.ensure_hot(user, tx_date.year)
+        
+        def credit():
+            """Balance the edit gives back: the edited row is already counted if it stays in the month"""
+            old_tx = Transaction.objects.filter(id=pk, user=user).first()
+            if old_tx is None or (old_tx.date.year, old_tx.date.month) != (tx_date.year, tx_date.month):
+                return Decimal('0')
+            return -old_tx.amount if old_tx.category == 'income' else old_tx.amount
+        
+        if data.get('category', transaction.category) == 'income':
             serializer.save()
-            return Response(TransactionSerializer(transaction).data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            user.bump_data_version()
+        else:
+            # Same balance check as adding, atomically with the update
+            try:
+                ledger.checked_write(user, tx_date.year, tx_date.month, data.get('amount', transaction.amount),
+                                     serializer.save, credit)
+            except ledger.InsufficientBalance as e:
+                return Response(
+                    {'error': f'Insufficient balance! Available: {user.currency}{e.available}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            except ledger.WriteConflict:
+                return Response({'error': 'Too many concurrent changes, please retry'},
+                                status=status.HTTP_409_CONFLICT)
+        return Response(TransactionSerializer(transaction).data)
     
     elif request.method == 'DELETE':
-        transaction.delete()
+        # Version first, in one transaction: an expense checked against the balance with this row in it
+        # can no longer commit once the row is gone
+        with db_transaction.atomic():
+            user.bump_data_version()
+            transaction.delete()
         return Response({'message': 'Transaction deleted'}, status=status.HTTP_204_NO_CONTENT)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def reorder_transactions(request):
     """Reorder transactions"""
     user = get_user_from_token(request)
@@ -443,22 +536,138 @@ def reorder_transactions(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     order_list = serializer.validated_data['order']
+    if user.has_archive:
+        # All from one month: bring it back if it is archived
+        archive.hot_transaction(user, order_list[0])
     
     for idx, tx_id in enumerate(order_list):
         Transaction.objects.filter(id=tx_id, user=user).update(order=idx)
+    user.bump_data_version()
     
     return Response({'success': True})
 
 
-# ============== Dashboard APIs ==============
+# ============== Recurring Transaction APIs ==============
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def recurring_list(request):
+    """List recurring rules or create a new one"""
+    user = get_user_from_token(request)
+    if not user:
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if request.method == 'GET':
+        rules = RecurringRule.objects.filter(user=user).order_by('start_date', 'id')
+        return Response(RecurringRuleSerializer(rules, many=True).data)
+    
+    serializer = RecurringRuleSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # Its occurrences count from the start, like expenses added there
+        rule = ledger.checked_rule_write(user, RecurringRule(user=user, **serializer.validated_data),
+                                         lambda: serializer.save(user=user))
+    except ledger.InsufficientBalance as e:
+        return Response(
+            {'error': f'Insufficient balance! Available: {user.currency}{e.available}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except ledger.WriteConflict:
+        return Response({'error': 'Too many concurrent changes, please retry'},
+                        status=status.HTTP_409_CONFLICT)
+    return Response(RecurringRuleSerializer(rule).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def recurring_detail(request, pk):
+    """View, update, or stop a recurring rule; confirmed occurrences are kept"""
+    user = get_user_from_token(request)
+    if not user:
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        rule = RecurringRule.objects.get(id=pk, user=user)
+    except RecurringRule.DoesNotExist:
+        return Response({'error': 'Recurring rule not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if request.method == 'GET':
+        return Response(RecurringRuleSerializer(rule).data)
+    
+    elif request.method == 'PUT':
+        serializer = RecurringRuleSerializer(rule, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        changed = copy(rule)
+        for name, value in serializer.validated_data.items():
+            setattr(changed, name, value)
+        try:
+            # The old occurrences are given back, the changed ones must fit
+            ledger.checked_rule_write(user, changed, serializer.save, old=rule)
+        except ledger.InsufficientBalance as e:
+            return Response(
+                {'error': f'Insufficient balance! Available: {user.currency}{e.available}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except ledger.WriteConflict:
+            return Response({'error': 'Too many concurrent changes, please retry'},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(serializer.data)
+    
+    elif request.method == 'DELETE':
+        rule.delete()
+        user.bump_data_version()
+        return Response({'message': 'Recurring rule deleted'}, status=status.HTTP_204_NO_CONTENT)
 
-def calculate_monthly_balance(user, year, month):
-    """Calculate balance for a specific month"""
-    txs = Transaction.objects.filter(user=user, date__year=year, date__month=month)
-    spent = sum(tx.amount for tx in txs if tx.category != 'income')
-    extra_income = sum(tx.amount for tx in txs if tx.category == 'income')
-    return (user.income + extra_income) - spent
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def recurring_confirm(request, pk):
+    """Store one occurrence of a rule as a real transaction, optionally edited"""
+    user = get_user_from_token(request)
+    if not user:
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        rule = RecurringRule.objects.get(id=pk, user=user)
+    except RecurringRule.DoesNotExist:
+        return Response({'error': 'Recurring rule not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    serializer = RecurringConfirmSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = dict(serializer.validated_data)
+    on = data.pop('date')
+    archive.ensure_hot(user, on.year)
+    write = lambda: recurring.materialize(rule, on, **data)
+    try:
+        if (data.get('category') or rule.category) == 'income':
+            transaction = write()
+            user.bump_data_version()
+        else:
+            # An edited amount must fit the balance like any other expense
+            transaction = ledger.checked_write(user, on.year, on.month, data.get('amount') or rule.amount, write,
+                                               lambda: ledger.occurrence_credit(rule, on))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ledger.InsufficientBalance as e:
+        return Response(
+            {'error': f'Insufficient balance! Available: {user.currency}{e.available}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except ledger.WriteConflict:
+        return Response({'error': 'Too many concurrent changes, please retry'},
+                        status=status.HTTP_409_CONFLICT)
+    
+    return Response(TransactionSerializer(transaction).data, status=status.HTTP_201_CREATED)
+
+
+# ============== Dashboard APIs ==============
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -471,82 +680,63 @@ def dashboard_summary(request):
     # Get current month from query params
     year = int(request.GET.get('year', date.today().year))
     month = int(request.GET.get('month', date.today().month))
+    return Response({'user': UserSerializer(user).data, **dashboard_data(user, year, month)})
+
+
+def dashboard_data(user, year, month, recurring_rules=None, archived=None):
+    """Dashboard for one month; `recurring_rules` and `archived` months are fetched unless passed in"""
     current_date = date(year, month, 1)
     
-    # Get transactions for current month
-    transactions = Transaction.objects.filter(
-        user=user,
-        date__year=year,
-        date__month=month
-    ).order_by('order', '-date', '-created_at')
+    # Get transactions for current month; an archived month is read from its archive
+    transactions = archive.month_transactions(user, year, month)
+    if transactions is None:
+        transactions = Transaction.objects.filter(
+            user=user,
+            date__year=year,
+            date__month=month
+        ).order_by('order', '-date', '-created_at')
+    tx_serializer = FastTransactionSerializer(transactions)
+    amount_idx = tx_serializer.index('amount')
+    category_idx = tx_serializer.index('category')
+    rule_idx = tx_serializer.index('recurring_rule')
+    date_idx = tx_serializer.index('date')
+    
+    # Recurring transactions not confirmed yet this month
+    if recurring_rules is None:
+        recurring_rules = list(user.recurring_rules.all())
+    confirmed = {(row[rule_idx], row[date_idx]) for row in tx_serializer.rows if row[rule_idx]}
+    recurring_transactions = recurring.expand(recurring_rules, year, month, confirmed)
     
     # Calculate finances
-    total_spent = Decimal('0')
-    extra_income = Decimal('0')
-    categories = {'needs': Decimal('0'), 'wants': Decimal('0'), 'savings': Decimal('0')}
-    
-    for tx in transactions:
-        if tx.category == 'income':
-            extra_income += tx.amount
-        else:
-            total_spent += tx.amount
-            if tx.category in categories:
-                categories[tx.category] += tx.amount
-    
-    total_income = user.income + extra_income
-    balance = total_income - total_spent
+    totals = advisor.MonthTotals(user.income)
+    month_amounts = chain(
+        ((row[category_idx], row[amount_idx]) for row in tx_serializer.rows),
+        ((tx.category, tx.amount) for tx in recurring_transactions),
+    )
+    for category, amount in month_amounts:
+        totals.add(category, amount)
+    
+    total_spent = totals.total_spent
+    categories = totals.categories
+    total_income = totals.total_income
+    balance = totals.balance
     
     # Budget limits
     limits = {
-        'needs': float(total_income * Decimal(user.rule_needs) / 100),
-        'wants': float(total_income * Decimal(user.rule_wants) / 100),
-        'savings': float(total_income * Decimal(user.rule_savings) / 100),
+        'needs': total_income * Decimal(user.rule_needs) / 100,
+        'wants': total_income * Decimal(user.rule_wants) / 100,
+        'savings': total_income * Decimal(user.rule_savings) / 100,
     }
     
-    # Generate advice
-    advice = []
-    if user.income == 0:
-        advice.append({
-            'type': 'warning',
-            'title': '⚠️ Setup Required',
-            'text': 'Please go to Settings and set your Monthly Income.'
-        })
-    else:
-        income_base = total_income if total_income > 0 else Decimal('1')
-        total_pct = (total_spent / income_base) * 100
-        wants_pct = (categories['wants'] / income_base) * 100
-        
-        if total_pct > 100:
-            advice.append({
-                'type': 'warning',
-                'title': '🚨 Over Budget',
-                'text': f'You are spending {float(total_pct):.1f}% of your income!'
-            })
-        elif total_pct < 85:
-            advice.append({
-                'type': 'good',
-                'title': '✅ Good Status',
-                'text': f'You are under budget ({float(total_pct):.1f}%).'
-            })
-        
-        if wants_pct > user.rule_wants:
-            advice.append({
-                'type': 'warning',
-                'title': '⚠️ Wants Alert',
-                'text': 'You exceeded your "Wants" limit.'
-            })
-        
-        if categories['savings'] == 0 and total_spent > 0:
-            advice.append({
-                'type': 'info',
-                'title': '💡 Savings Tip',
-                'text': 'No money allocated to Savings yet.'
-            })
+    # Advice, plus the month-end projection it was based on (current month only)
+    result = advisor.advise(user, year, month, recurring_rules=recurring_rules, month_totals=totals)
+    advice = result.advice
+    forecast = result.aggregates.get('forecast')
     
     # History data
     all_transactions = Transaction.objects.filter(user=user).order_by('-date')
     monthly_data = {}
-    for tx in all_transactions:
+    for tx in archive.history_rows(user, recurring_rules, all_transactions, date.today(), archived):
         key = tx.date.strftime('%Y-%m')
         if key not in monthly_data:
             monthly_data[key] = {'spent': Decimal('0'), 'extra_income': Decimal('0')}
@@ -568,28 +758,57 @@ def dashboard_summary(request):
             'month': month_name,
             'year': int(y),
             'month_num': int(m),
-            'total_income': float(hist_total_income),
-            'spent': float(data['spent']),
-            'saved': float(saved),
+            'total_income': hist_total_income,
+            'spent': data['spent'],
+            'saved': saved,
             'status': 'Saved' if saved >= 0 else 'Over'
         })
     
     prev_month = current_date - relativedelta(months=1)
     next_month = current_date + relativedelta(months=1)
     
-    return Response({
-        'user': UserSerializer(user).data,
+    return {
         'current_date': current_date.isoformat(),
-        'transactions': TransactionSerializer(transactions, many=True).data,
-        'total_income': float(total_income),
-        'total_spent': float(total_spent),
-        'balance': float(balance),
-        'categories': {k: float(v) for k, v in categories.items()},
+        'transactions': tx_serializer.data,
+        'recurring': RecurringOccurrenceSerializer(recurring_transactions, many=True).data,
+        'total_income': total_income,
+        'total_spent': total_spent,
+        'balance': balance,
+        'categories': categories,
         'limits': limits,
         'advice': advice,
+        'forecast': forecast.as_dict() if forecast is not None else None,
         'history': history,
         'prev_month': {'year': prev_month.year, 'month': prev_month.month},
         'next_month': {'year': next_month.year, 'month': next_month.month},
+    }
+
+
+# ============== Bootstrap API ==============
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def bootstrap_data(request):
+    """Everything the app shows on launch: profile, this month's dashboard, this year's savings, sync cursor"""
+    # Already loaded by CustomJWTAuthentication; sections share it rather than fetching it again
+    user = request.user
+    today = date.today()
+    # Taken before the sections are computed, so writes made meanwhile are after the cursor
+    cursor = user.data_version
+    
+    # Aggregates both sections need
+    recurring_rules = list(user.recurring_rules.all())
+    archived = archive.archived_months(user)
+    
+    sections = bootstrap.gather({
+        'dashboard': lambda: dashboard_data(user, today.year, today.month, recurring_rules, archived),
+        'savings': lambda: savings_data(user, today.year, archived),
+    })
+    return Response({
+        'user': UserSerializer(user).data,
+        'pin_set': user.pin not in ('000000', ''),
+        **sections,
+        'sync': {'cursor': cursor, 'server_time': timezone.now().isoformat()},
     })
 
 
@@ -604,24 +823,39 @@ def savings_summary(request):
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
     
     year = int(request.GET.get('year', date.today().year))
-    
+    return Response({**savings_data(user, year), 'user': UserSerializer(user).data})
+
+
+def savings_data(user, year, archived=None):
+    """Savings analysis for one year; `archived` months are fetched unless passed in"""
     # All savings transactions
     all_savings_tx = Transaction.objects.filter(user=user, category='savings').order_by('-date')
-    total_saved_all_time = sum(tx.amount for tx in all_savings_tx)
-    
-    # Filter for selected year
-    year_savings_tx = all_savings_tx.filter(date__year=year)
-    total_saved_year = sum(tx.amount for tx in year_savings_tx)
+    savings_serializer = FastTransactionSerializer(all_savings_tx)
+    amount_idx = savings_serializer.index('amount')
+    date_idx = savings_serializer.index('date')
+    total_saved_all_time = sum(row[amount_idx] for row in savings_serializer.rows)
+    if archived is None:
+        archived = archive.archived_months(user)
+    total_saved_all_time += sum(row.total for row in archived if row.category == 'savings')
+    
+    # Filter for selected year, from the rows already fetched
+    year_savings_rows = [row for row in savings_serializer.rows if row[date_idx].year == year]
+    total_saved_year = sum(row[amount_idx] for row in year_savings_rows)
     
     # Monthly trend
     month_range = range(1, 13)
     monthly_data = {month: Decimal('0') for month in month_range}
     
-    for tx in year_savings_tx:
-        monthly_data[tx.date.month] += tx.amount
+    for row in year_savings_rows:
+        monthly_data[row[date_idx].month] += row[amount_idx]
+    # Archived years: per-month totals instead of transactions
+    for row in archived:
+        if row.month.year == year and row.category == 'savings':
+            monthly_data[row.month.month] += row.total
+            total_saved_year += row.total
     
     chart_labels = [date(year, m, 1).strftime('%b') for m in month_range]
-    chart_values = [float(monthly_data[m]) for m in month_range]
+    chart_values = [monthly_data[m] for m in month_range]
     
     # Goals
     monthly_goal = float(user.income * Decimal(user.rule_savings) / 100)
@@ -631,6 +865,7 @@ def savings_summary(request):
     base_income_year = user.income * 12
     extra_income_tx = Transaction.objects.filter(user=user, category='income', date__year=year)
     extra_income_year = sum(tx.amount for tx in extra_income_tx)
+    extra_income_year += sum(row.total for row in archived if row.month.year == year and row.category == 'income')
     total_income_year = base_income_year + extra_income_year
     
     savings_rate = 0
@@ -649,9 +884,9 @@ def savings_summary(request):
         best_month_name = date(year, best_month_idx, 1).strftime('%B')
     
     # Recent savings
-    recent_savings = TransactionSerializer(list(all_savings_tx[:10]), many=True).data
+    recent_savings = savings_serializer.to_representation(savings_serializer.rows[:10])
     
-    return Response({
+    return {
         'current_year': year,
         'year_prev': year - 1,
         'year_next': year + 1 if year < date.today().year else None,
@@ -667,8 +902,7 @@ def savings_summary(request):
         'projected_year': projected_year,
         'best_month_name': best_month_name,
         'best_month_val': float(best_month_val),
-        'user': UserSerializer(user).data,
-    })
+    }
 
 
 # ============== Settings APIs ==============
@@ -681,8 +915,9 @@ def reset_data(request):
     if not user:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Delete all transactions
-    Transaction.objects.filter(user=user).delete()
+    # Delete all transactions, in batches; poll api_deletion_status for progress
+    wipe = deletion.schedule(user, DeletionRequest.RESET)
+    archive.discard(user)
     
     # Reset user settings
     user.income = Decimal('0')
@@ -692,7 +927,30 @@ def reset_data(request):
     user.rule_savings = 20
     user.save()
     
-    return Response({'message': 'All data has been reset', 'user': UserSerializer(user).data})
+    if wipe.status == DeletionRequest.DONE:
+        message, code = 'All data has been reset', status.HTTP_200_OK
+    else:
+        # Transactions are still there; poll api_deletion_status before fetching them again
+        message, code = 'Settings reset; transactions are being deleted', status.HTTP_202_ACCEPTED
+    return Response({
+        'message': message,
+        'user': UserSerializer(user).data,
+        'deletion': deletion.as_dict(wipe),
+    }, status=code)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def deletion_status(request, pk):
+    """Progress of one of the user's data deletions"""
+    user = get_user_from_token(request)
+    if not user:
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    wipe = DeletionRequest.objects.filter(pk=pk, user=user).first()
+    if wipe is None:
+        return Response({'error': 'Deletion not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(deletion.as_dict(wipe))
 
 
 @api_view(['POST'])
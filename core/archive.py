@@ -0,0 +1,267 @@
+"""
+Cold storage for closed years.
+
+The app reads the current month and the last twelve; older transactions
+only feed a few totals. `manage.py archive_transactions` moves each user's
+years before the KEEP_YEARS horizon out of the Transaction table into one
+TransactionArchive row per (user, year): the year's rows packed column-wise,
+amounts as integer minor units, then zlib-compressed. Alongside it go
+ArchivedMonth rows with per-month, per-category totals, which stay hot:
+
+- history (monthly_history and the API dashboard) reads them through
+  history_rows() in place of the archived transactions;
+- savings totals, all-time and for an archived year, add archived_months();
+- export includes archived_transactions();
+- pages and endpoints showing an archived month decode it on the fly
+  through month_transactions() and archived_transaction(), leaving the
+  archive in place;
+- rehydrate() restores a year into the Transaction table. Besides the
+  command, only writes do that: ensure_hot() before adding to or confirming
+  in an archived year, hot_transaction() before changing an archived row.
+
+Unconfirmed recurring occurrences of an archived month are frozen into its
+totals (recurring_total), so later changes to a rule don't rewrite closed
+years. Whether a year is archived is decided by its TransactionArchive row,
+not by the current KEEP_YEARS, which the command can override.
+User.has_archive lets users with nothing archived skip all of this without
+a query.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from . import recurring
+from .models import ArchivedMonth, RecurringRule, Transaction, TransactionArchive, User
+from .money import from_minor, minor, to_minor
+
+FORMAT = 1
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+COLUMNS = ('id', 'description', 'amount', 'category', 'date', 'order', 'recurring_rule_id',
+           'created_at', 'updated_at')
+
+
+def get_archive_settings():
+    """ARCHIVE settings merged over defaults"""
+    config = {
+        'KEEP_YEARS': 2,          # Closed years kept hot besides the current one
+        'COMPRESSION_LEVEL': 9,   # zlib level for packed years
+    }
+    config.update(getattr(settings, 'ARCHIVE', {}))
+    return config
+
+
+def cutoff_year(today=None, keep_years=None):
+    """Years before this one may be archived"""
+    if keep_years is None:
+        keep_years = get_archive_settings()['KEEP_YEARS']
+    return (today or date.today()).year - keep_years
+
+
+# ============== Packing ==============
+
+def _micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def pack(rows, level):
+    """Compress values_list(*COLUMNS) rows, with amounts in minor units, column by column"""
+    columns = list(zip(*rows)) or [()] * len(COLUMNS)
+    packed = dict(zip(COLUMNS, map(list, columns)))
+    packed['date'] = [day.toordinal() for day in packed['date']]
+    packed['created_at'] = [_micros(value) for value in packed['created_at']]
+    packed['updated_at'] = [_micros(value) for value in packed['updated_at']]
+    packed['format'] = FORMAT
+    return zlib.compress(json.dumps(packed, separators=(',', ':')).encode(), level)
+
+
+def unpack(data, user_id):
+    """Unsaved Transaction instances from pack() output"""
+    packed = json.loads(zlib.decompress(bytes(data)))
+    if packed.get('format') != FORMAT:
+        raise ValueError(f"Unknown archive format {packed.get('format')!r}")
+    return [
+        Transaction(
+            id=tx_id, user_id=user_id, description=description, amount=from_minor(amount),
+            category=category, date=date.fromordinal(day), order=order, recurring_rule_id=rule_id,
+            created_at=EPOCH + timedelta(microseconds=created), updated_at=EPOCH + timedelta(microseconds=updated),
+        )
+        for tx_id, description, amount, category, day, order, rule_id, created, updated
+        in zip(*(packed[column] for column in COLUMNS))
+    ]
+
+
+# ============== Archiving ==============
+
+def archivable_years(before, user=None):
+    """{user_id: [year, ...]} with transactions dated before January 1 of `before`"""
+    queryset = Transaction.objects.filter(date__lt=date(before, 1, 1))
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    result = defaultdict(set)
+    for user_id, day in queryset.values_list('user_id', 'date').distinct().order_by():
+        result[user_id].add(day.year)
+    return {user_id: sorted(years) for user_id, years in result.items()}
+
+
+def archive_year(user, year):
+    """Move the user's transactions dated in `year` into an archive; returns how many were moved"""
+    config = get_archive_settings()
+    first, last = date(year, 1, 1), date(year, 12, 31)
+    with transaction.atomic():
+        if TransactionArchive.objects.filter(user=user, year=year).exists():
+            # Rows added to an archived year since: merge them in
+            rehydrate(user, year)
+        year_txs = Transaction.objects.filter(user=user, date__gte=first, date__lte=last)
+        rows = list(year_txs.order_by('date', 'id').values_list(*COLUMNS[:2], minor('amount'), *COLUMNS[3:]))
+        if not rows:
+            return 0
+
+        totals = defaultdict(lambda: [0, 0, 0])  # (month, category) -> [total, count, recurring_total]
+        for _, _, amount, category, day, *_ in rows:
+            entry = totals[(day.replace(day=1), category)]
+            entry[0] += amount
+            entry[1] += 1
+        rules = list(RecurringRule.objects.filter(user=user, start_date__lte=last))
+        done = {(rule_id, day) for _, _, _, _, day, _, rule_id, _, _ in rows if rule_id}
+        for month in range(1, 13):
+            for tx in recurring.expand(rules, year, month, done):
+                totals[(tx.date.replace(day=1), tx.category)][2] += to_minor(tx.amount)
+
+        TransactionArchive.objects.create(user=user, year=year, count=len(rows),
+                                          data=pack(rows, config['COMPRESSION_LEVEL']))
+        ArchivedMonth.objects.bulk_create([
+            ArchivedMonth(user=user, month=month, category=category, total=from_minor(total), count=count,
+                          recurring_total=from_minor(recurring_total))
+            for (month, category), (total, count, recurring_total) in sorted(totals.items())
+        ])
+        year_txs.delete()
+        User.objects.filter(pk=user.pk).update(has_archive=True, data_version=F('data_version') + 1)
+    user.has_archive = True
+    user.__dict__.pop('data_version', None)
+    return len(rows)
+
+
+def rehydrate(user, year):
+    """Restore an archived year into the Transaction table; returns how many rows came back"""
+    with transaction.atomic():
+        archive = TransactionArchive.objects.select_for_update().filter(user=user, year=year).first()
+        if archive is None:
+            return 0
+        transactions = unpack(archive.data, user.pk)
+        # Rules deleted since archiving: keep the rows, as SET_NULL would have
+        rule_ids = set(RecurringRule.objects.filter(user=user).values_list('id', flat=True))
+        for tx in transactions:
+            if tx.recurring_rule_id not in rule_ids:
+                tx.recurring_rule_id = None
+        # bulk_create stamps auto_now(_add) fields with the current time; put the originals back
+        stamps = [(tx.created_at, tx.updated_at) for tx in transactions]
+        Transaction.objects.bulk_create(transactions)
+        for tx, (created_at, updated_at) in zip(transactions, stamps):
+            tx.created_at, tx.updated_at = created_at, updated_at
+        Transaction.objects.bulk_update(transactions, ['created_at', 'updated_at'], batch_size=500)
+        ArchivedMonth.objects.filter(user=user, month__year=year).delete()
+        archive.delete()
+        still_archived = TransactionArchive.objects.filter(user=user).exists()
+        User.objects.filter(pk=user.pk).update(has_archive=still_archived, data_version=F('data_version') + 1)
+    user.has_archive = still_archived
+    user.__dict__.pop('data_version', None)
+    return len(transactions)
+
+
+def ensure_hot(user, year):
+    """Rehydrate `year` if it is archived, before a write to its transactions"""
+    # Whatever was archived, whichever KEEP_YEARS was in effect then
+    if user.has_archive and TransactionArchive.objects.filter(user=user, year=year).exists():
+        rehydrate(user, year)
+
+
+def hot_transaction(user, tx_id):
+    """The user's Transaction `tx_id`, rehydrating its year first if it is archived; None if there is none"""
+    tx = Transaction.objects.filter(pk=tx_id, user=user).first()
+    if tx is None:
+        archived = archived_transaction(user, tx_id)
+        if archived is not None:
+            rehydrate(user, archived.date.year)
+            tx = Transaction.objects.filter(pk=tx_id, user=user).first()
+    return tx
+
+
+def discard(user):
+    """Drop all archived data, when the user's transactions are reset or replaced"""
+    if user.has_archive:
+        TransactionArchive.objects.filter(user=user).delete()
+        ArchivedMonth.objects.filter(user=user).delete()
+        User.objects.filter(pk=user.pk).update(has_archive=False)
+        user.has_archive = False
+
+
+# ============== Reading ==============
+
+class ArchivedTotal:
+    """An archived month's total for one category, shaped like a Transaction for per-month aggregation"""
+
+    def __init__(self, month, category, amount):
+        self.date = month
+        self.category = category
+        self.amount = amount
+
+
+def archived_months(user):
+    """The user's ArchivedMonth rows; no query for users with nothing archived"""
+    if not user.has_archive:
+        return []
+    return list(ArchivedMonth.objects.filter(user=user).order_by('month', 'category'))
+
+
+def history_rows(user, rules, transactions, until, archived=None):
+    """Rows for per-month history: real transactions, unconfirmed recurring occurrences
+    outside archived years, and one ArchivedTotal per archived month and category"""
+    if archived is None:
+        archived = archived_months(user)
+    archived_years = {row.month.year for row in archived}
+    virtual = recurring.virtual_history(rules, transactions, until)
+    if archived_years:
+        virtual = [tx for tx in virtual if tx.date.year not in archived_years]
+    totals = [ArchivedTotal(row.month, row.category, row.total + row.recurring_total) for row in archived]
+    return [*transactions, *virtual, *totals]
+
+
+def month_transactions(user, year, month):
+    """Unsaved Transaction instances of an archived month, in list order; None if `year` is not archived"""
+    if not user.has_archive:
+        return None
+    data = TransactionArchive.objects.filter(user=user, year=year).values_list('data', flat=True).first()
+    if data is None:
+        return None
+    transactions = [tx for tx in unpack(data, user.pk) if tx.date.month == month]
+    # order_by('order', '-date', '-created_at'), as stable sorts from the last key
+    transactions.sort(key=lambda tx: tx.created_at, reverse=True)
+    transactions.sort(key=lambda tx: tx.date, reverse=True)
+    transactions.sort(key=lambda tx: tx.order)
+    return transactions
+
+
+def archived_transaction(user, tx_id):
+    """The user's archived transaction `tx_id` as an unsaved instance, or None"""
+    if not user.has_archive:
+        return None
+    for data in TransactionArchive.objects.filter(user=user).values_list('data', flat=True):
+        for tx in unpack(data, user.pk):
+            if tx.pk == int(tx_id):
+                return tx
+    return None
+
+
+def archived_transactions(user):
+    """Unsaved Transaction instances for every archived year, oldest first"""
+    if not user.has_archive:
+        return []
+    result = []
+    for data in TransactionArchive.objects.filter(user=user).order_by('year').values_list('data', flat=True):
+        result.extend(unpack(data, user.pk))
+    return result
@@ -1,7 +1,9 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import Token
 from .models import User
+from . import revocation
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,6 +12,13 @@ logger = logging.getLogger(__name__)
 class CustomJWTAuthentication(JWTAuthentication):
     """Custom JWT authentication that uses our custom User model instead of Django's auth.User"""
     
+    def get_validated_token(self, raw_token):
+        """Reject tokens revoked by logout; see core/revocation.py"""
+        token = super().get_validated_token(raw_token)
+        if revocation.is_revoked(token.get(api_settings.JTI_CLAIM)):
+            raise InvalidToken('Token has been revoked')
+        return token
+    
     def get_user(self, validated_token):
         """
         Override to lookup user in our custom User model instead of Django's auth.User
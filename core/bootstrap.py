@@ -0,0 +1,110 @@
+"""
+Concurrent sections for /api/bootstrap/.
+
+On launch the app used to ask for its profile, the dashboard and the
+savings summary one request at a time, each authenticating and loading the
+user again. The bootstrap endpoint answers all of it at once: what the
+sections share (the user, recurring rules, archived months) is loaded once,
+and the independent sections run at the same time, so the response takes
+as long as the slowest section rather than the sum.
+
+The first section runs in the request thread; the others go to a small
+thread pool, but only while it has an idle thread for them. Under load,
+when other bootstrap requests hold every thread, the remaining sections
+run in the request as well, instead of queueing behind those requests.
+
+Each pool thread has its own database connection, which is handled after
+every section as Django does at the end of a request
+(close_old_connections: closed unless CONN_MAX_AGE keeps it). With
+CONCURRENT off, or a single section, sections run one after another in the
+request; tests do that, since rows a TestCase has not committed are
+invisible to other connections. Queries run on pool threads are not
+counted in the request's REQUEST_TIMING db_queries.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+
+
+def get_bootstrap_settings():
+    """BOOTSTRAP settings merged over defaults"""
+    config = {
+        'CONCURRENT': True,   # False computes sections one after another in the request
+        'WORKERS': 4,         # Pool threads per process, shared by all bootstrap requests
+    }
+    config.update(getattr(settings, 'BOOTSTRAP', {}))
+    return config
+
+
+_executor = None
+_idle = None  # One slot per pool thread not running a section
+_executor_lock = threading.Lock()
+
+
+def get_executor(config):
+    """(executor, idle-thread semaphore)"""
+    global _executor, _idle
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=config['WORKERS'], thread_name_prefix='bootstrap')
+            _idle = threading.BoundedSemaphore(config['WORKERS'])
+        return _executor, _idle
+
+
+def _in_thread(idle, section):
+    try:
+        return section()
+    finally:
+        # Pool threads outlive the request, so nothing else would close their connections
+        close_old_connections()
+        idle.release()
+
+
+def _call(section):
+    try:
+        return section(), None
+    except Exception as exc:
+        return None, exc
+
+
+def gather(sections):
+    """Run {name: callable} sections, concurrently if configured; returns {name: result}.
+
+    If sections fail, the exception of the first of them (in `sections`
+    order) is raised.
+    """
+    config = get_bootstrap_settings()
+    if not config['CONCURRENT'] or len(sections) < 2:
+        return {name: section() for name, section in sections.items()}
+    executor, idle = get_executor(config)
+    names = list(sections)
+    futures = {}
+    for name in names[1:]:
+        if not idle.acquire(blocking=False):
+            break  # Every pool thread is busy: the rest run here rather than wait in its queue
+        futures[name] = executor.submit(_in_thread, idle, sections[name])
+    inline = {name: _call(sections[name]) for name in names if name not in futures}
+    results = {}
+    for name in names:
+        if name in futures:
+            results[name] = futures[name].result()
+        else:
+            results[name], exc = inline[name]
+            if exc is not None:
+                raise exc
+    return results
+
+
+def _reset_executor(setting, **kwargs):
+    global _executor, _idle
+    if setting == 'BOOTSTRAP':
+        with _executor_lock:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = _idle = None
+
+
+setting_changed.connect(_reset_executor)
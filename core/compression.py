@@ -0,0 +1,119 @@
+"""
+Response compression for CompressionMiddleware.
+
+gzip is always available; brotli is offered when the `brotli` package is
+installed. The client's Accept-Encoding q-values decide, with ties going to
+the first entry of ENCODINGS.
+"""
+from django.conf import settings
+import secrets
+import struct
+import zlib
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+def get_compression_settings():
+    """COMPRESSION settings merged over defaults"""
+    config = {
+        'ENCODINGS': ('br', 'gzip'),  # Server preference when q-values tie
+        'MIN_SIZE': 860,              # Bytes; smaller bodies are sent as-is
+        'GZIP_LEVEL': 6,              # 1 (fast) .. 9 (small)
+        'BROTLI_QUALITY': 5,          # 0 (fast) .. 11 (small)
+        'MAX_RANDOM_BYTES': 100,      # Random gzip filename padding against BREACH, as GZipMiddleware
+        'SKIP_TYPES': (               # Content-Type prefixes that are already compressed
+            'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'image/avif',
+            'video/', 'audio/', 'font/woff',
+            'application/zip', 'application/gzip', 'application/x-gzip',
+            'application/pdf', 'application/octet-stream',
+        ),
+    }
+    config.update(getattr(settings, 'COMPRESSION', {}))
+    return config
+
+
+def available_encodings(preference):
+    return [e for e in preference if e == 'gzip' or (e == 'br' and brotli is not None)]
+
+
+def parse_accept_encoding(header):
+    """{'gzip': 1.0, 'br': 0.5, ...} from an Accept-Encoding header"""
+    result = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        result[coding] = q
+    return result
+
+
+def negotiate(header, encodings):
+    """Best of `encodings` (in server preference order) the client accepts, or None"""
+    accepted = parse_accept_encoding(header or '')
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class GzipStream:
+    """Incremental gzip writer with a random-length filename in the header"""
+    encoding = 'gzip'
+
+    def __init__(self, level, max_random_bytes=0):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.crc = 0
+        self.size = 0
+        flags, filename = 0, b''
+        if max_random_bytes:
+            flags = 0x08  # FNAME
+            length = 1 + secrets.randbelow(max_random_bytes)
+            filename = secrets.token_hex(length)[:length].encode() + b'\x00'
+        # magic, deflate, flags, mtime=0, no extra flags, OS unknown
+        self.header = struct.pack('<BBBBIBB', 0x1f, 0x8b, 8, flags, 0, 0, 255) + filename
+
+    def compress(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        return self.compressor.compress(data)
+
+    def finish(self):
+        return self.compressor.flush() + struct.pack('<II', self.crc & 0xffffffff, self.size & 0xffffffff)
+
+
+class BrotliStream:
+    encoding = 'br'
+    header = b''
+
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def open_stream(encoding, config):
+    if encoding == 'br':
+        return BrotliStream(config['BROTLI_QUALITY'])
+    return GzipStream(config['GZIP_LEVEL'], config['MAX_RANDOM_BYTES'])
+
+
+def compress_bytes(stream, data):
+    return stream.header + stream.compress(data) + stream.finish()
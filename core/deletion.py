@@ -0,0 +1,287 @@
+"""
+Bulk deletion of a user's data.
+
+Resetting data, replacing it on import and deleting an account used to run
+`Transaction.objects.filter(user=user).delete()` in the request. Django's
+delete collector loads every row (and whatever cascades from it) into
+memory first, and the whole DELETE runs as one write, so a heavy user kept
+SQLite locked for seconds.
+
+Each of these now creates a DeletionRequest. It is processed in batches:
+select up to BATCH_SIZE primary keys, DELETE them by key without the
+collector (nothing cascades from the rows deleted here), record the
+progress in the same short transaction, then sleep PAUSE seconds so other
+writers get the database in between. The request row tracks status,
+`total` and `deleted` from submission to completion, and stays behind as
+the record once an account is gone.
+
+Reset and import only delete rows up to the ids that existed when the
+request was made, so whatever the user writes meanwhile (the imported data
+itself) survives. With ASYNC on, requests are processed by one background
+thread per process, like OTP delivery. With ASYNC off they run inside the
+request, still in batches. A request is claimed with a conditional UPDATE
+before any row is deleted, so the worker thread and `manage.py
+process_deletions` never work on the same one; the command picks up
+requests left queued, and RUNNING ones whose processor has been gone for
+STALE_AFTER seconds (interrupted by a restart). Account deletions asked for on the
+public page, without a session for that phone, wait as REQUESTED until
+staff approve them in the admin.
+"""
+from datetime import timedelta
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import (OTP, ArchivedMonth, DeletionRequest, RecurringRule, Transaction, TransactionArchive,
+                     User)
+
+logger = logging.getLogger(__name__)
+
+
+def get_deletion_settings():
+    """DELETION settings merged over defaults"""
+    config = {
+        'BATCH_SIZE': 500,   # Rows per DELETE, and per write transaction
+        'PAUSE': 0.05,       # Seconds between batches, for other writers
+        'ASYNC': True,       # False processes requests inside the request that made them
+        'STALE_AFTER': 15 * 60,  # Seconds before a RUNNING request counts as abandoned and may be taken over
+    }
+    config.update(getattr(settings, 'DELETION', {}))
+    return config
+
+
+# ============== Requests ==============
+
+def _last_id(queryset):
+    return queryset.order_by('-pk').values_list('pk', flat=True).first()
+
+
+def schedule(user, kind, reason=''):
+    """Record and submit the deletion of `user`'s transactions and rules (and, for ACCOUNT, everything)"""
+    deletion = DeletionRequest(user=user, phone=user.phone, kind=kind, reason=reason)
+    if kind != DeletionRequest.ACCOUNT:
+        deletion.last_transaction_id = _last_id(Transaction.objects.filter(user=user))
+        deletion.last_rule_id = _last_id(RecurringRule.objects.filter(user=user))
+    deletion.save()
+    submit(deletion)
+    return deletion
+
+
+def request_account_deletion(phone, reason='', session_user=None):
+    """Record an account deletion asked for on the public page.
+
+    Only the signed-in owner of the phone number is trusted to delete the
+    account right away; anyone else's request waits for staff approval.
+    """
+    if session_user is not None and session_user.phone == phone:
+        return schedule(session_user, DeletionRequest.ACCOUNT, reason)
+    return DeletionRequest.objects.create(
+        user=User.objects.filter(phone=phone).first(), phone=phone, kind=DeletionRequest.ACCOUNT,
+        reason=reason, status=DeletionRequest.REQUESTED,
+    )
+
+
+def approve(deletions):
+    """Queue REQUESTED account deletions, e.g. from the admin; returns how many were queued"""
+    approved = 0
+    for deletion in deletions:
+        if deletion.status == DeletionRequest.REQUESTED:
+            deletion.status = DeletionRequest.QUEUED
+            deletion.save(update_fields=['status'])
+            submit(deletion)
+            approved += 1
+    return approved
+
+
+def as_dict(deletion):
+    return {
+        'id': deletion.pk,
+        'kind': deletion.kind,
+        'status': deletion.status,
+        'total': deletion.total,
+        'deleted': deletion.deleted,
+        'progress': deletion.progress,
+        'created_at': deletion.created_at.isoformat(),
+        'finished_at': deletion.finished_at.isoformat() if deletion.finished_at else None,
+    }
+
+
+# ============== Processing ==============
+
+def _steps(deletion):
+    """(queryset, before_batch) pairs, deleted in this order"""
+    transactions = Transaction.objects.filter(user_id=deletion.user_id)
+    rules = RecurringRule.objects.filter(user_id=deletion.user_id)
+    if deletion.kind != DeletionRequest.ACCOUNT:
+        # No id recorded means the user had no such rows when asking
+        transactions = transactions.filter(pk__lte=deletion.last_transaction_id or 0)
+        rules = rules.filter(pk__lte=deletion.last_rule_id or 0)
+
+    def detach(rule_ids):
+        # What SET_NULL would do, for occurrences confirmed after the request
+        Transaction.objects.filter(recurring_rule_id__in=rule_ids).update(recurring_rule=None)
+
+    steps = [(transactions, None), (rules, detach)]
+    if deletion.kind == DeletionRequest.ACCOUNT:
+        steps += [
+            (ArchivedMonth.objects.filter(user_id=deletion.user_id), None),
+            (TransactionArchive.objects.filter(user_id=deletion.user_id), None),
+            (OTP.objects.filter(phone=deletion.phone), None),
+        ]
+    return steps
+
+
+def _delete_in_batches(deletion, queryset, before_batch, config):
+    model = queryset.model
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:config['BATCH_SIZE']])
+        if not ids:
+            return
+        with transaction.atomic():
+            if before_batch is not None:
+                before_batch(ids)
+            # By primary key, without the delete collector: nothing cascades from these rows
+            deleted = model.objects.filter(pk__in=ids)._raw_delete(model.objects.db)
+            DeletionRequest.objects.filter(pk=deletion.pk).update(deleted=F('deleted') + deleted)
+        deletion.deleted += deleted
+        if len(ids) < config['BATCH_SIZE']:
+            return
+        time.sleep(config['PAUSE'])
+
+
+def _stale_before(config):
+    return timezone.now() - timedelta(seconds=config['STALE_AFTER'])
+
+
+def claim(deletion, config):
+    """Mark the request RUNNING for this processor; False if another one has it (or it is finished)"""
+    now = timezone.now()
+    claimable = Q(status=DeletionRequest.QUEUED) | Q(status=DeletionRequest.RUNNING,
+                                                     started_at__lt=_stale_before(config))
+    if not DeletionRequest.objects.filter(claimable, pk=deletion.pk).update(status=DeletionRequest.RUNNING,
+                                                                             started_at=now):
+        return False
+    # Progress made by an abandoned run is in the row, not in this instance
+    deletion.refresh_from_db(fields=['deleted'])
+    deletion.status, deletion.started_at = DeletionRequest.RUNNING, now
+    return True
+
+
+def process(deletion):
+    """Claim and carry out a QUEUED (or abandoned RUNNING) request; failures are recorded on it"""
+    config = get_deletion_settings()
+    if not claim(deletion, config):
+        return deletion
+    steps = _steps(deletion) if deletion.user_id else []
+    try:
+        deletion.total = deletion.deleted + sum(queryset.count() for queryset, _ in steps)
+        DeletionRequest.objects.filter(pk=deletion.pk).update(total=deletion.total)
+
+        for queryset, before_batch in steps:
+            _delete_in_batches(deletion, queryset, before_batch, config)
+
+        if deletion.kind == DeletionRequest.ACCOUNT:
+            # Only the row itself is left, plus anything written since; the collector handles that
+            User.objects.filter(pk=deletion.user_id).delete()
+        elif deletion.user_id:
+            User.objects.filter(pk=deletion.user_id).update(data_version=F('data_version') + 1)
+        deletion.status = DeletionRequest.DONE
+    except Exception as exc:
+        logger.exception('Deletion request %s failed', deletion.pk)
+        deletion.status = DeletionRequest.FAILED
+        deletion.error = str(exc)[:255]
+    deletion.finished_at = timezone.now()
+    DeletionRequest.objects.filter(pk=deletion.pk).update(
+        status=deletion.status, error=deletion.error, finished_at=deletion.finished_at,
+    )
+    logger.info('Deletion request %s (%s) %s: %s of %s rows', deletion.pk, deletion.kind, deletion.status,
+                deletion.deleted, deletion.total)
+    return deletion
+
+
+def pending():
+    """Requests waiting to be processed, or abandoned while running, oldest first"""
+    return DeletionRequest.objects.filter(
+        Q(status=DeletionRequest.QUEUED)
+        | Q(status=DeletionRequest.RUNNING, started_at__lt=_stale_before(get_deletion_settings()))
+    ).order_by('pk')
+
+
+# ============== Worker ==============
+
+class Worker:
+    """Process deletion requests on one background thread per process"""
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.pid = None
+        self.thread = None
+
+    def submit(self, deletion):
+        if not self.config['ASYNC']:
+            process(deletion)
+            return
+        # The worker reads the request with its own connection, so only after it is committed
+        transaction.on_commit(lambda: self.put(deletion.pk))
+
+    def put(self, pk):
+        with self.lock:
+            self.ensure_worker()
+            self.queue.put(pk)
+
+    def ensure_worker(self):
+        """Start the worker, again in a forked child, where the parent's thread does not exist"""
+        if self.pid == os.getpid() and self.thread.is_alive():
+            return
+        self.pid = os.getpid()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='deletion', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            pk = self.queue.get()
+            try:
+                deletion = DeletionRequest.objects.filter(pk=pk).first()
+                if deletion is not None:
+                    process(deletion)
+            except Exception:
+                logger.exception('Deletion request %s could not be processed', pk)
+            finally:
+                close_old_connections()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = Worker(get_deletion_settings())
+        return _worker
+
+
+def submit(deletion):
+    """Process `deletion` in the background, or right away with ASYNC off"""
+    get_worker().submit(deletion)
+
+
+def _reset_worker(setting, **kwargs):
+    global _worker
+    if setting == 'DELETION':
+        with _worker_lock:
+            _worker = None
+
+
+setting_changed.connect(_reset_worker)
@@ -0,0 +1,42 @@
+"""
+Per-user template fragment caching.
+
+Templates wrap expensive sections in Django's {% cache %} tag, varying on
+the user's id and User.data_version plus whatever request parameters the
+section depends on:
+
+    {% cache fragment_timeout 'history_table' user.pk user.data_version fragment_period %}
+
+Every write bumps data_version, so a changed user gets new keys and stale
+fragments simply expire. fragment_period (the current month) covers
+sections that also depend on today's date, such as recurring occurrences
+and year-to-date projections.
+
+Views pass the data for cached sections through lazy(), so the queries
+behind a fragment only run when the fragment has to be rendered.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+
+def get_fragment_cache_settings():
+    """FRAGMENT_CACHE settings merged over defaults"""
+    config = {
+        'TIMEOUT': 60 * 60 * 24,  # Seconds; entries are also superseded by data_version
+    }
+    config.update(getattr(settings, 'FRAGMENT_CACHE', {}))
+    return config
+
+
+def lazy(func, *args, **kwargs):
+    """Value computed on first use in the template, then reused within the render"""
+    return SimpleLazyObject(lambda: func(*args, **kwargs))
+
+
+def context_processor(request):
+    return {
+        'fragment_timeout': get_fragment_cache_settings()['TIMEOUT'],
+        'fragment_period': date.today().strftime('%Y-%m'),
+    }
@@ -0,0 +1,150 @@
+"""
+Idempotency keys for write endpoints.
+
+Mobile clients retry POSTs on flaky networks. A client that sends an
+`Idempotency-Key` header (any unique string, e.g. a UUID per user action)
+gets the original response back for every replay of that request, without
+the view running again:
+
+    @api_view(['POST'])
+    @permission_classes([IsAuthenticated])
+    @idempotent
+    def setup_user(request): ...
+
+Responses are kept in the cache for TTL seconds, keyed by the caller and the
+key, together with a digest of the method, path and body. The caller is the
+user id from the token; anonymous requests (registration) are scoped by the
+phone number in the body, so two devices picking the same key never share a
+response. Responses that carry tokens are replayable for AUTH_TTL seconds
+only, long enough for a retry but not to hand out live tokens for a day:
+
+    @idempotent(issues_tokens=True)
+    def register_with_pin(request): ...
+
+Reusing a key for a different request is rejected with 422. While the first request is still running, a duplicate waits for
+its result rather than doing the work twice, and gets 409 if it does not
+finish within WAIT_TIMEOUT. 5xx responses and exceptions are not stored, so
+those requests can be retried.
+
+Cache entries are only shared between worker processes when CACHES points
+at a shared backend (Redis, Memcached); the default local-memory cache
+covers retries that reach the same process.
+"""
+from functools import wraps
+import hashlib
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import metrics
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def get_idempotency_settings():
+    """IDEMPOTENCY settings merged over defaults"""
+    config = {
+        'CACHE': 'default',
+        'TTL': 60 * 60 * 24,     # Seconds a response is replayed for
+        'AUTH_TTL': 5 * 60,      # Seconds for responses carrying tokens (issues_tokens=True)
+        'LOCK_TIMEOUT': 60,      # Seconds before an unfinished request's claim on a key lapses
+        'WAIT_TIMEOUT': 10,      # Seconds a duplicate waits for the first request to finish
+        'POLL_INTERVAL': 0.05,   # First wait between checks; doubles up to 0.5s
+    }
+    config.update(getattr(settings, 'IDEMPOTENCY', {}))
+    return config
+
+
+def fingerprint(request):
+    """Digest of what the request asks for, to catch a key reused for another request"""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()[:32]
+
+
+def cache_key(request, key):
+    user_id = request.auth.get('user_id') if request.auth is not None else None
+    if user_id:
+        scope = user_id
+    else:
+        phone = request.data.get('phone', '') if isinstance(request.data, dict) else ''
+        scope = 'anon-' + hashlib.sha256(str(phone).encode()).hexdigest()[:16]
+    digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+    return f'idempotency:{scope}:{digest}'
+
+
+def claim_or_wait(store, key, config):
+    """Claim `key` for this request, or wait for the request holding it.
+
+    Returns (None, token) once claimed, or (entry, None) with the stored
+    (fingerprint, status, data) of the finished request; (None, None) if it
+    is still running after WAIT_TIMEOUT.
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + config['WAIT_TIMEOUT']
+    delay = config['POLL_INTERVAL']
+    while True:
+        # add() is atomic: of concurrent duplicates, exactly one claims the key
+        if store.add(key, ('pending', token), config['LOCK_TIMEOUT']):
+            return None, token
+        entry = store.get(key)
+        if entry is not None and entry[0] != 'pending':
+            return entry, None
+        if time.monotonic() >= deadline:
+            return None, None
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, 0.5)
+
+
+def idempotent(view=None, *, issues_tokens=False):
+    """Replay the stored response for a repeated Idempotency-Key instead of running `view`"""
+    if view is None:
+        return lambda view: idempotent(view, issues_tokens=issues_tokens)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if request.method != 'POST' or not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        config = get_idempotency_settings()
+        store = caches[config['CACHE']]
+        key = cache_key(request, key)
+        digest = fingerprint(request)
+
+        entry, token = claim_or_wait(store, key, config)
+        if entry is not None:
+            metrics.record_cache('idempotency', True)
+            stored_digest, stored_status, data = entry
+            if stored_digest != digest:
+                return Response({'error': f'{HEADER} was already used for a different request'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            response = Response(data, status=stored_status)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+        if token is None:
+            return Response({'error': f'A request with this {HEADER} is still in progress'},
+                            status=status.HTTP_409_CONFLICT)
+
+        metrics.record_cache('idempotency', False)
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            store.delete(key)
+            raise
+        if response.status_code >= 500 or not hasattr(response, 'data'):
+            store.delete(key)
+        else:
+            ttl = config['AUTH_TTL'] if issues_tokens else config['TTL']
+            store.set(key, (digest, response.status_code, response.data), ttl)
+        return response
+
+    return wrapper
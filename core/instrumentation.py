@@ -0,0 +1,104 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Per-request timing spans (milliseconds) and counters"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.counters = {}
+        self._depth = {}
+
+    def record(self, name, seconds):
+        """Add a measured duration to a span"""
+        self.spans[name] = self.spans.get(name, 0.0) + seconds * 1000
+
+    def incr(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def span(self, name):
+        """Time a block; nested blocks with the same name are only counted once"""
+        depth = self._depth.get(name, 0)
+        self._depth[name] = depth + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] = depth
+            if depth == 0:
+                self.record(name, time.perf_counter() - start)
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook counting queries and DB time"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record('db', time.perf_counter() - start)
+            self.incr('db_queries')
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+def current_timings():
+    """Timings of the request being handled, or None if it is not sampled"""
+    return _current.get()
+
+
+def activate(timings):
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Time a block against the current request, if any"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    with timings.span(name):
+        yield
+
+
+def _timed_method(func, name):
+    def wrapper(*args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return func(*args, **kwargs)
+        with timings.span(name):
+            return func(*args, **kwargs)
+    wrapper.__wrapped__ = func
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+_hooks_installed = False
+
+
+def install_hooks():
+    """Time template rendering and DRF serializer output for sampled requests"""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    _hooks_installed = True
+
+    from django.template.base import Template
+    from rest_framework import serializers
+
+    Template.render = _timed_method(Template.render, 'template')
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        prop = cls.__dict__['data']
+        cls.data = property(_timed_method(prop.fget, 'serialize'))
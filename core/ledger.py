@@ -0,0 +1,152 @@
+"""
+Balance-checked writes.
+
+Adding an expense must not take a month's balance below zero, but checking
+the balance and inserting are separate statements: two concurrent expenses
+can both see enough balance and both be written. Rather than lock the
+table, writes are made conditional on User.data_version, which every write
+to a user's data already increments:
+
+    1. read the user's income and data_version, then the month's balance
+    2. refuse if the balance doesn't cover the amount
+    3. in one transaction, UPDATE ... SET data_version = v + 1
+       WHERE id = user AND data_version = v, and only if that matched a
+       row, do the write
+
+If another write for the same user got in between, the UPDATE matches
+nothing and the whole check is retried against the new state, up to
+MAX_ATTEMPTS times. The UPDATE holds the user's row (on SQLite, the
+database write lock) only until the write commits, and users never
+contend with each other's rows.
+"""
+from datetime import date
+from decimal import Decimal
+import random
+import time
+
+from django.conf import settings
+from django.db import transaction
+from dateutil.relativedelta import relativedelta
+
+from . import recurring
+from .models import ArchivedMonth, Transaction, User
+from .money import from_minor, minor, to_minor
+
+
+def get_ledger_settings():
+    """LEDGER settings merged over defaults"""
+    config = {
+        'MAX_ATTEMPTS': 5,       # Balance checks per write before giving up with WriteConflict
+        'RETRY_DELAY': 0.005,    # Seconds before the first retry; doubles per attempt, with jitter
+    }
+    config.update(getattr(settings, 'LEDGER', {}))
+    return config
+
+
+class InsufficientBalance(Exception):
+    def __init__(self, available):
+        super().__init__(f'Insufficient balance: {available} available')
+        self.available = available
+
+
+class WriteConflict(Exception):
+    """Other writes for the same user kept winning; the client should retry"""
+
+
+def monthly_balance(user, year, month, income=None):
+    """Income plus extra income less spending for the month, including unconfirmed recurring transactions.
+
+    For an archived month the archived totals count, with the recurring
+    occurrences frozen into them, plus any rows written there since.
+    """
+    rows = list(Transaction.objects.filter(user=user, date__year=year, date__month=month)
+                .values_list('category', minor('amount'), 'recurring_rule_id', 'date'))
+    # Summed in integer minor units; only the total is converted back to Decimal
+    balance = sum(-amount if category != 'income' else amount for category, amount, _, _ in rows)
+    archived = []
+    if user.has_archive:
+        archived = list(ArchivedMonth.objects.filter(user=user, month=date(year, month, 1))
+                        .values_list('category', minor('total'), minor('recurring_total')))
+    if archived:
+        balance += sum(-(total + frozen) if category != 'income' else total + frozen
+                       for category, total, frozen in archived)
+    else:
+        confirmed = {(rule_id, on) for _, _, rule_id, on in rows if rule_id}
+        for tx in recurring.expand(recurring.rules_for_month(user, year, month), year, month, confirmed):
+            balance += -to_minor(tx.amount) if tx.category != 'income' else to_minor(tx.amount)
+    return (user.income if income is None else income) + from_minor(balance)
+
+
+def occurrence_credit(rule, on):
+    """Balance the occurrence of `rule` on `on` already takes, as a confirmed row or a virtual one"""
+    tx = (Transaction.objects.filter(recurring_rule=rule, date=on).first()
+          or recurring.VirtualTransaction(rule, on))
+    return -tx.amount if tx.category == 'income' else tx.amount
+
+
+def rule_spend(rule, year, month):
+    """What the unconfirmed occurrences of `rule` take from the month's balance (income gives)"""
+    done = set()
+    if rule.pk:
+        done = set(Transaction.objects.filter(recurring_rule_id=rule.pk, date__year=year, date__month=month)
+                   .values_list('recurring_rule_id', 'date'))
+    return sum((-tx.amount if tx.category == 'income' else tx.amount
+                for tx in recurring.expand([rule], year, month, done)), Decimal('0'))
+
+
+def first_open_month(rule, until):
+    """(year, month) of the first occurrence of `rule` not confirmed yet, looking no further than `until`'s month"""
+    confirmed = set()
+    if rule.pk:
+        confirmed = set(Transaction.objects.filter(recurring_rule_id=rule.pk).values_list('date', flat=True))
+    month = rule.start_date.replace(day=1)
+    while month < until.replace(day=1) and not set(recurring.occurrences(rule, month.year, month.month)) - confirmed:
+        month += relativedelta(months=1)
+    return month.year, month.month
+
+
+def checked_write(user, year, month, amount, write, credit=None):
+    """Call write() only if the month's balance covers spending `amount`.
+
+    `credit`, if given, is called on each attempt for the part of the
+    balance the write gives back, e.g. the old amount of an edited expense.
+    Returns write()'s result. Raises InsufficientBalance, or WriteConflict
+    after MAX_ATTEMPTS lost races; exceptions from write() roll it back.
+    """
+    config = get_ledger_settings()
+    delay = config['RETRY_DELAY']
+    for attempt in range(config['MAX_ATTEMPTS']):
+        if attempt:
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            delay *= 2
+        income, version = User.objects.filter(pk=user.pk).values_list('income', 'data_version').get()
+        available = monthly_balance(user, year, month, income)
+        if credit is not None:
+            available += credit()
+        if available - amount < Decimal('0'):
+            raise InsufficientBalance(available)
+        with transaction.atomic():
+            if User.objects.filter(pk=user.pk, data_version=version).update(data_version=version + 1):
+                result = write()
+                user.__dict__.pop('data_version', None)
+                return result
+    raise WriteConflict()
+
+
+def checked_rule_write(user, rule, write, old=None):
+    """Call write() to store `rule` (replacing `old`, its saved state) if the balance covers it.
+
+    A rule's occurrences count in the balance as soon as it exists, so an
+    expense rule is checked like an expense in the month of its first
+    occurrence not confirmed yet. Returns write()'s result; raises as
+    checked_write does.
+    """
+    if rule.category == 'income':
+        result = write()
+        user.bump_data_version()
+        return result
+    year, month = first_open_month(rule, date.today())
+    credit = None
+    if old is not None:
+        credit = lambda: rule_spend(old, year, month)
+    return checked_write(user, year, month, rule_spend(rule, year, month), write, credit)
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archive
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = "Move transactions from closed years into compressed per-user archives"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-years', type=int,
+                            help='Closed years to keep hot besides the current one; default ARCHIVE["KEEP_YEARS"]')
+        parser.add_argument('--user', metavar='PHONE', help='Only this user')
+        parser.add_argument('--rehydrate', type=int, metavar='YEAR',
+                            help="Restore the user's archived YEAR instead (requires --user)")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(phone=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with phone {options['user']}")
+
+        if options['rehydrate'] is not None:
+            if user is None:
+                raise CommandError('--rehydrate requires --user')
+            restored = archive.rehydrate(user, options['rehydrate'])
+            self.stdout.write(f"Restored {restored} transactions from {options['rehydrate']}")
+            return
+
+        if options['keep_years'] is not None and options['keep_years'] < 0:
+            raise CommandError('--keep-years must be 0 or more')
+        before = archive.cutoff_year(keep_years=options['keep_years'])
+
+        start = time.perf_counter()
+        moved = years = 0
+        pending = archive.archivable_years(before, user)
+        users = User.objects.in_bulk(list(pending))
+        for user_id, user_years in sorted(pending.items()):
+            for year in user_years:
+                moved += archive.archive_year(users[user_id], year)
+                years += 1
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f'Archived {moved} transactions in {years} user-years before {before} '
+                          f'for {len(pending)} users in {elapsed * 1000:.0f} ms')
@@ -0,0 +1,184 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+from rest_framework.renderers import JSONRenderer
+
+from core import compression, forecasting
+from core.models import Transaction, User
+from core.renderers import FastJSONRenderer, MessagePackParser, MessagePackRenderer, orjson
+from core.serializers import FastTransactionSerializer, TransactionSerializer
+
+
+def synthetic_transactions(rows):
+    """Unsaved Transaction instances shaped like a heavy user's month"""
+    categories = ['needs', 'wants', 'savings', 'income']
+    created = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        Transaction(
+            id=i + 1,
+            description=f'Transaction {i}',
+            amount=Decimal(f'{(i * 37) % 5000}.{i % 100:02d}'),
+            category=categories[i % 4],
+            date=date(2026, 1, 1) + timedelta(days=i % 28),
+            order=i,
+            created_at=created + timedelta(seconds=i),
+        )
+        for i in range(rows)
+    ]
+
+
+def best_of(func, repeat):
+    """Fastest wall time of `repeat` calls, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def dashboard_payload(transactions):
+    categories = {'needs': Decimal('0'), 'wants': Decimal('0'), 'savings': Decimal('0')}
+    for tx in transactions:
+        if tx.category in categories:
+            categories[tx.category] += tx.amount
+    history = [
+        {'month': f'Month {m}', 'year': 2026, 'month_num': m, 'total_income': Decimal('5000.00'),
+         'spent': Decimal('4123.45'), 'saved': Decimal('876.55'), 'status': 'Saved'}
+        for m in range(1, 13)
+    ]
+    return {
+        'current_date': date(2026, 1, 1),
+        'transactions': TransactionSerializer(transactions, many=True).data,
+        'total_income': Decimal('5000.00'),
+        'categories': categories,
+        'limits': {k: v * 2 for k, v in categories.items()},
+        'history': history,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmarks for response rendering and serialization hot paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suite', action='append', choices=sorted(self.suites()),
+                            help='Suite to run (repeatable); default runs all')
+        parser.add_argument('--rows', type=int, default=5000, help='Transactions in the synthetic payload')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def suites(self):
+        return {
+            'compression': self.bench_compression,
+            'forecast': self.bench_forecast,
+            'json': self.bench_json,
+            'msgpack': self.bench_msgpack,
+            'serializer': self.bench_serializer,
+        }
+
+    def handle(self, *args, **options):
+        suites = self.suites()
+        for name in options['suite'] or sorted(suites):
+            suites[name](options['rows'], options['repeat'])
+
+    def report(self, label, baseline_ms, candidate_ms, size=None):
+        line = f'  {label:<28} {baseline_ms:9.2f} ms -> {candidate_ms:9.2f} ms  ({baseline_ms / candidate_ms:5.1f}x)'
+        if size is not None:
+            line += f'  {size:,} bytes'
+        self.stdout.write(line)
+
+    def bench_json(self, rows, repeat):
+        transactions = synthetic_transactions(rows)
+        payloads = {
+            'transaction_list': TransactionSerializer(transactions, many=True).data,
+            'dashboard_summary': dashboard_payload(transactions),
+        }
+        backend = 'orjson' if orjson is not None else 'json fallback'
+        self.stdout.write(f'JSON rendering, {rows} transactions: JSONRenderer vs FastJSONRenderer ({backend})')
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+        for label, data in payloads.items():
+            baseline = best_of(lambda: stock.render(data), repeat)
+            candidate = best_of(lambda: fast.render(data), repeat)
+            self.report(label, baseline, candidate, len(fast.render(data)))
+
+    def bench_msgpack(self, rows, repeat):
+        transactions = synthetic_transactions(rows)
+        payloads = {
+            'transaction_list': TransactionSerializer(transactions, many=True).data,
+            'dashboard_summary': dashboard_payload(transactions),
+        }
+        self.stdout.write(f'MessagePack vs JSON, {rows} transactions')
+        as_json, as_msgpack, parser = FastJSONRenderer(), MessagePackRenderer(), MessagePackParser()
+        for label, data in payloads.items():
+            json_body, packed = as_json.render(data), as_msgpack.render(data)
+            self.stdout.write(f'  {label:<28} {len(json_body):>11,} bytes -> {len(packed):>11,} bytes '
+                              f'({len(packed) * 100 / len(json_body):.0f}%)')
+            self.report(f'{label} render', best_of(lambda: as_json.render(data), repeat),
+                        best_of(lambda: as_msgpack.render(data), repeat))
+            self.stdout.write(f'  {label + " decode":<28} '
+                              f'{best_of(lambda: parser.parse(io.BytesIO(packed)), repeat):9.2f} ms')
+
+    def bench_serializer(self, rows, repeat):
+        # Runs against a throwaway test database, never the configured one
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            user = User.objects.create(phone='0000000000', name='Benchmark')
+            transactions = synthetic_transactions(rows)
+            for tx in transactions:
+                tx.user = user
+            Transaction.objects.bulk_create(transactions)
+            queryset = Transaction.objects.filter(user=user).order_by('order', '-date', '-created_at')
+
+            renderer = FastJSONRenderer()
+            stock = renderer.render(TransactionSerializer(queryset.all(), many=True).data)
+            fast = renderer.render(FastTransactionSerializer(queryset.all()).data)
+            if stock != fast:
+                raise CommandError('FastTransactionSerializer output differs from TransactionSerializer')
+
+            self.stdout.write(f'Transaction serialization incl. query, {rows} rows: '
+                              f'TransactionSerializer vs FastTransactionSerializer')
+            self.report('transaction_list',
+                        best_of(lambda: TransactionSerializer(queryset.all(), many=True).data, repeat),
+                        best_of(lambda: FastTransactionSerializer(queryset.all()).data, repeat),
+                        len(fast))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    def bench_compression(self, rows, repeat):
+        body = FastJSONRenderer().render(dashboard_payload(synthetic_transactions(rows)))
+        self.stdout.write(f'Compression of the dashboard_summary payload, {rows} transactions ({len(body):,} bytes)')
+        levels = [('gzip', 'GZIP_LEVEL', level) for level in (1, 6, 9)]
+        if compression.brotli is not None:
+            levels += [('br', 'BROTLI_QUALITY', quality) for quality in (1, 5, 11)]
+        for encoding, setting, level in levels:
+            config = {**compression.get_compression_settings(), setting: level}
+            compress = lambda: compression.compress_bytes(compression.open_stream(encoding, config), body)
+            size = len(compress())
+            self.stdout.write(f'  {f"{encoding} {level}":<28} {best_of(compress, max(1, repeat // 4)):9.2f} ms  '
+                              f'{size:>11,} bytes ({size * 100 / len(body):.1f}%)')
+
+    def bench_forecast(self, rows, repeat):
+        # Runs against a throwaway test database, never the configured one
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            as_of = date(2026, 3, 10)
+            users = User.objects.bulk_create([
+                User(phone=f'1{i:09d}', name=f'Forecast {i}') for i in range(max(1, rows // 400))
+            ])
+            categories = ['needs', 'wants', 'savings', 'income']
+            Transaction.objects.bulk_create([
+                Transaction(user=users[i % len(users)], description=f'Tx {i}',
+                            amount=Decimal(f'{(i * 37) % 500}.{i % 100:02d}'), category=categories[i % 4],
+                            date=as_of - timedelta(days=(i * 7) % 395))
+                for i in range(rows)
+            ])
+            self.stdout.write(f'Month-end forecast for {len(users)} users, {rows} transactions: '
+                              f'forecast_user per user vs forecast_all')
+            self.report('forecast',
+                        best_of(lambda: [forecasting.forecast_user(user, as_of) for user in users], max(1, repeat // 4)),
+                        best_of(lambda: forecasting.forecast_all(as_of), max(1, repeat // 4)))
+        finally:
+            teardown_databases(old_config, verbosity=0)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import revocation
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked-token rows whose tokens have expired anyway'
+
+    def handle(self, *args, **options):
+        deleted = revocation.compact()
+        self.stdout.write(f'Deleted {deleted} expired revoked tokens')
@@ -0,0 +1,51 @@
+from datetime import date
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.forecasting import CATEGORIES, forecast_all
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = 'Nightly month-end spend forecast for every user, as CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Forecast as of this day (YYYY-MM-DD); default today')
+        parser.add_argument('--output', metavar='FILE', help='Write CSV here instead of stdout')
+        parser.add_argument('--over-budget', action='store_true',
+                            help='Only users projected to spend more than their income')
+
+    def handle(self, *args, **options):
+        try:
+            as_of = date.fromisoformat(options['date']) if options['date'] else date.today()
+        except ValueError:
+            raise CommandError(f"Invalid --date: {options['date']}")
+
+        start = time.perf_counter()
+        forecasts = forecast_all(as_of)
+        elapsed = time.perf_counter() - start
+        users = User.objects.in_bulk(list(forecasts))
+
+        out = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+        try:
+            writer = csv.writer(out, lineterminator='\n')
+            writer.writerow(['user_id', 'phone', 'income', 'day', 'history_months']
+                            + [f'{c}_spent' for c in CATEGORIES] + [f'{c}_projected' for c in CATEGORIES]
+                            + ['total_projected'])
+            written = 0
+            for user_id, forecast in sorted(forecasts.items()):
+                user = users[user_id]
+                if options['over_budget'] and forecast.total_projected <= user.income:
+                    continue
+                writer.writerow([user_id, user.phone, user.income, forecast.day, forecast.history_months]
+                                + [forecast.spent[c] for c in CATEGORIES]
+                                + [forecast.projected[c] for c in CATEGORIES]
+                                + [forecast.total_projected])
+                written += 1
+        finally:
+            if out is not self.stdout:
+                out.close()
+
+        self.stderr.write(f'Forecast {len(forecasts)} users as of {as_of} in {elapsed * 1000:.0f} ms; wrote {written} rows')
@@ -0,0 +1,84 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+import os
+import time
+
+from dateutil.relativedelta import relativedelta
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import statements
+
+
+class Command(BaseCommand):
+    help = 'Monthly statements for every user, built in parallel chunks and written as JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Statement month (YYYY-MM); default last month')
+        parser.add_argument('--output', metavar='DIR', help='Directory for chunk files; default statements/YYYY-MM')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users per chunk (default 500)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes; 0 builds chunks in this process')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore checkpoints from an earlier run and rebuild every chunk')
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                year, month = map(int, options['month'].split('-'))
+                date(year, month, 1)
+            except ValueError:
+                raise CommandError(f"Invalid --month: {options['month']}")
+        else:
+            last_month = date.today().replace(day=1) - relativedelta(months=1)
+            year, month = last_month.year, last_month.month
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        directory = options['output'] or os.path.join('statements', f'{year}-{month:02d}')
+
+        # Resuming keeps the original chunk boundaries so finished files stay valid
+        try:
+            chunks = None if options['restart'] else statements.load_manifest(directory, year, month)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if chunks is None:
+            chunks = statements.plan_chunks(options['chunk_size'])
+            statements.save_manifest(directory, year, month, chunks)
+            for first_id, last_id in chunks:
+                path = statements.chunk_path(directory, first_id, last_id)
+                if os.path.exists(path):
+                    os.remove(path)
+        pending = [c for c in chunks if not os.path.exists(statements.chunk_path(directory, *c))]
+        self.stderr.write(f'{year}-{month:02d}: {len(chunks)} chunks, {len(chunks) - len(pending)} already done')
+
+        started = time.perf_counter()
+        written = 0
+        for done, (users, seconds) in enumerate(self.run(pending, directory, year, month, options['workers']), 1):
+            written += users
+            elapsed = time.perf_counter() - started
+            self.stderr.write(f'[{done}/{len(pending)}] {users} users in {seconds:.2f}s; '
+                              f'{written / elapsed:.0f} users/s overall')
+
+        elapsed = time.perf_counter() - started
+        rate = written / elapsed if elapsed else 0
+        self.stdout.write(f'Wrote {written} statements to {directory} in {elapsed:.1f}s ({rate:.0f} users/s)')
+
+    def run(self, chunks, directory, year, month, workers):
+        """Yield (users, seconds) per chunk as each one finishes"""
+        if workers == 0:
+            for first_id, last_id in chunks:
+                yield statements.write_chunk(directory, first_id, last_id, year, month)
+            return
+
+        # Forked workers must not share the parent's sockets; each opens its own connection on first query
+        connections.close_all()
+        # The platform's default start method, as fork does not exist on Windows. Spawned workers start
+        # from a fresh interpreter, so Django is set up in each before any chunk (and model) is unpickled
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = [
+                pool.submit(statements.write_chunk, directory, first_id, last_id, year, month)
+                for first_id, last_id in chunks
+            ]
+            for future in as_completed(futures):
+                yield future.result()
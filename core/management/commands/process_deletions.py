@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core import deletion
+
+
+class Command(BaseCommand):
+    help = 'Process deletion requests left queued, or abandoned while running'
+
+    def handle(self, *args, **options):
+        processed = 0
+        for request in deletion.pending():
+            request = deletion.process(request)
+            if request.status == request.RUNNING:
+                continue  # Claimed by another processor in the meantime
+            self.stdout.write(f'{request.get_kind_display()} for {request.phone}: {request.status}, '
+                              f'{request.deleted} of {request.total} rows')
+            processed += 1
+        self.stdout.write(f'Processed {processed} deletion requests')
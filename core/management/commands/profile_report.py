@@ -0,0 +1,62 @@
+from collections import defaultdict
+import io
+import pstats
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import ProfileStore, get_profiling_settings
+
+
+class Command(BaseCommand):
+    help = 'List the slowest profiled endpoints, or show one profile in detail'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10, help='Number of endpoints to list')
+        parser.add_argument('--show', metavar='FILE', help='Print the hottest entries of one profile file')
+        parser.add_argument('--top', type=int, default=25, help='Entries to print with --show')
+
+    def handle(self, *args, **options):
+        config = get_profiling_settings()
+        store = ProfileStore(config['DIR'], config['MAX_FILES'])
+
+        if options['show']:
+            self.show(store, options['show'], options['top'])
+            return
+
+        by_route = defaultdict(list)
+        for route, elapsed_ms, kind, path in store.entries():
+            by_route[route].append((elapsed_ms, path))
+
+        if not by_route:
+            self.stdout.write(f'No profiles in {store.directory}')
+            return
+
+        ranked = sorted(by_route.items(), key=lambda item: max(item[1])[0], reverse=True)
+        self.stdout.write(f'{"route":<32} {"profiles":>8} {"worst ms":>9} {"mean ms":>8}  worst profile')
+        for route, samples in ranked[:options['limit']]:
+            worst_ms, worst_path = max(samples)
+            mean_ms = sum(ms for ms, _ in samples) / len(samples)
+            self.stdout.write(f'{route:<32} {len(samples):>8} {worst_ms:>9} {mean_ms:>8.0f}  {worst_path.name}')
+
+    def show(self, store, name, top):
+        path = store.directory / name
+        if not path.exists():
+            raise CommandError(f'Profile not found: {path}')
+
+        if path.suffix == '.prof':
+            out = io.StringIO()
+            stats = pstats.Stats(str(path), stream=out)
+            stats.sort_stats('cumulative').print_stats(top)
+            self.stdout.write(out.getvalue())
+            return
+
+        # Collapsed stacks: attribute samples to the innermost frame (the hot line)
+        leaves = defaultdict(int)
+        total = 0
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                leaves[stack.rsplit(';', 1)[-1]] += int(count)
+                total += int(count)
+        for frame, count in sorted(leaves.items(), key=lambda item: item[1], reverse=True)[:top]:
+            self.stdout.write(f'{count:>6} {count * 100 / total:5.1f}%  {frame}')
@@ -0,0 +1,41 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.replay import ReplayRunner, load_entries
+
+
+class Command(BaseCommand):
+    help = 'Replay requests from access logs or a JSONL capture against a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('logs', nargs='+', help='server_log.txt-style access logs and/or .jsonl captures')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=20, help='Maximum requests in flight')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Replay speed-up over captured timestamps; 0 sends as fast as possible')
+        parser.add_argument('--users', type=int, default=5, help='Synthetic users to spread traffic over')
+        parser.add_argument('--repeat', type=int, default=1, help='Replay the captured mix this many times')
+        parser.add_argument('--timeout', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        entries = load_entries(options['logs'])
+        if not entries:
+            raise CommandError('No requests found in the given logs')
+        if options['repeat'] > 1:
+            # Repeated passes have no meaningful timestamps to honour
+            entries = entries * options['repeat']
+            for entry in entries:
+                entry.timestamp = None
+
+        self.stdout.write(f'Replaying {len(entries)} requests against {options["base_url"]} '
+                          f'with {options["users"]} users, concurrency {options["concurrency"]}')
+        runner = ReplayRunner(
+            options['base_url'], entries,
+            users=options['users'],
+            concurrency=options['concurrency'],
+            speed=options['speed'],
+            timeout=options['timeout'],
+        )
+        asyncio.run(runner.run())
+        self.stdout.write(runner.report())
@@ -0,0 +1,128 @@
+"""
+Prometheus metrics for the app.
+
+With several worker processes, point PROMETHEUS_MULTIPROC_DIR at a shared,
+empty directory before the workers start; each process then writes its
+samples to mmap'd files there and /metrics aggregates them on scrape.
+
+/metrics shows traffic and login outcomes, so it answers only scrapers
+sending `Authorization: Bearer <METRICS['TOKEN']>`; without a token set
+it is not served at all.
+"""
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+import hmac
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+
+REQUESTS = Counter(
+    'wealth_http_requests_total', 'HTTP requests handled',
+    ['route', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'wealth_http_request_duration_seconds', 'HTTP request latency',
+    ['route'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUEST_QUERIES = Histogram(
+    'wealth_http_request_db_queries', 'SQL queries issued per HTTP request',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+OTP_SENT = Counter(
+    'wealth_otp_sent_total', 'OTP codes generated and sent',
+    ['channel'],
+)
+OTP_DELIVERIES = Counter(
+    'wealth_otp_deliveries_total', 'OTP SMS delivery attempts by outcome (sent, retry, failed, dropped)',
+    ['provider', 'result'],
+)
+OTP_VERIFICATIONS = Counter(
+    'wealth_otp_verifications_total', 'OTP verification attempts',
+    ['channel', 'result'],
+)
+LOGINS = Counter(
+    'wealth_logins_total', 'PIN login attempts',
+    ['channel', 'result'],
+)
+TOKEN_REVOCATION_CHECKS = Counter(
+    'wealth_token_revocation_checks_total', 'JWT revocation lookups (clear, false_positive, revoked)',
+    ['result'],
+)
+CACHE_REQUESTS = Counter(
+    'wealth_cache_requests_total', 'Application cache lookups',
+    ['cache', 'result'],
+)
+
+
+def route_label(request):
+    """URL name from core/urls.py, keeping label cardinality bounded"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or 'unnamed'
+
+
+def record_request(request, response, seconds, queries):
+    route = route_label(request)
+    REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+    REQUEST_LATENCY.labels(route).observe(seconds)
+    REQUEST_QUERIES.labels(route).observe(queries)
+
+
+def record_otp_sent(channel):
+    OTP_SENT.labels(channel).inc()
+
+
+def record_otp_delivery(provider, result):
+    OTP_DELIVERIES.labels(provider, result).inc()
+
+
+def record_otp_verification(channel, success):
+    OTP_VERIFICATIONS.labels(channel, 'success' if success else 'failure').inc()
+
+
+def record_login(channel, success):
+    LOGINS.labels(channel, 'success' if success else 'failure').inc()
+
+
+def record_token_revocation_check(result):
+    TOKEN_REVOCATION_CHECKS.labels(result).inc()
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def get_registry():
+    """Aggregate across worker processes when running in multiprocess mode"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def get_metrics_settings():
+    """METRICS settings merged over defaults"""
+    config = {
+        'TOKEN': '',  # Bearer token scrapers must send; empty disables /metrics
+    }
+    config.update(getattr(settings, 'METRICS', {}))
+    return config
+
+
+def metrics_view(request):
+    """Prometheus text exposition of all app metrics, for scrapers holding the token"""
+    token = get_metrics_settings()['TOKEN']
+    if not token:
+        raise Http404
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(credentials.encode(), token.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
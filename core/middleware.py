@@ -0,0 +1,366 @@
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse, HttpResponseNotAllowed, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import SimpleLazyObject
+from urllib.parse import urlsplit
+import cProfile
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+
+from . import compression, instrumentation, metrics, profiling, staticfiles
+from .models import User
+
+logger = logging.getLogger('core.timing')
+
+
+def get_timing_settings():
+    """REQUEST_TIMING settings merged over defaults"""
+    config = {
+        'SAMPLE_RATE': 0.0,
+        'SERVER_TIMING_HEADER': True,
+        'LOG': True,
+    }
+    config.update(getattr(settings, 'REQUEST_TIMING', {}))
+    return config
+
+
+def session_user(request):
+    """User whose id is in the session, or None"""
+    user_id = request.session.get('user_id')
+    if not user_id:
+        return None
+    return User.objects.filter(id=user_id).first()
+
+
+class WealthUserMiddleware:
+    """Attach request.wealth_user, the session's User loaded on first access.
+
+    login_required_view and get_user() both read it, so a page costs one
+    user query at most. The value is resolved once per request; views that
+    change session['user_id'] redirect instead of reading it again.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.wealth_user = SimpleLazyObject(lambda: session_user(request))
+        return self.get_response(request)
+
+
+class RequestTimingMiddleware:
+    """Measure total, DB, serializer and template time for sampled requests.
+
+    Results go into a Server-Timing header and one JSON log line on the
+    'core.timing' logger. Unsampled requests skip all instrumentation.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = get_timing_settings()
+        self.sample_rate = config['SAMPLE_RATE']
+        self.send_header = config['SERVER_TIMING_HEADER']
+        self.log = config['LOG']
+        if self.sample_rate > 0:
+            instrumentation.install_hooks()
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return self.get_response(request)
+
+        timings = instrumentation.RequestTimings()
+        request.timings = timings
+        token = instrumentation.activate(timings)
+        try:
+            with connection.execute_wrapper(timings.db_wrapper):
+                response = self.get_response(request)
+        finally:
+            instrumentation.deactivate(token)
+
+        if self.send_header:
+            response['Server-Timing'] = self.server_timing(timings, timings.total_ms())
+        if self.log:
+            if response.streaming and not response.is_async:
+                # Log once the body has been sent, so streamed work (e.g. compression) is included
+                response.streaming_content = self.log_after(response.streaming_content, request, response, timings)
+            else:
+                logger.info(json.dumps(self.log_record(request, response, timings, timings.total_ms())))
+        return response
+
+    def log_after(self, content, request, response, timings):
+        try:
+            yield from content
+        finally:
+            logger.info(json.dumps(self.log_record(request, response, timings, timings.total_ms())))
+
+    def server_timing(self, timings, total):
+        queries = timings.counters.get('db_queries', 0)
+        parts = [f'total;dur={total:.1f}']
+        for name, duration in timings.spans.items():
+            if name == 'db':
+                parts.append(f'db;dur={duration:.1f};desc="{queries} queries"')
+            else:
+                parts.append(f'{name};dur={duration:.1f}')
+        return ', '.join(parts)
+
+    def log_record(self, request, response, timings, total):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'route': match.url_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total, 2),
+        }
+        for name, duration in timings.spans.items():
+            record[f'{name}_ms'] = round(duration, 2)
+        record.update(timings.counters)
+        return record
+
+
+class MetricsMiddleware:
+    """Record request count, latency and SQL query count per route for /metrics"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            response = self.get_response(request)
+        metrics.record_request(request, response, time.perf_counter() - start, queries)
+        return response
+
+
+class ProfilingMiddleware:
+    """Capture profiles of sampled, slow or explicitly requested requests.
+
+    - a SAMPLE_RATE fraction of requests, and any request carrying the
+      X-Profile header from a staff user (or with HEADER_TOKEN), runs under
+      cProfile and is saved as a .prof file;
+    - with SLOW_REQUEST_MS set, every other request is stack-sampled and the
+      collapsed stacks are kept only when it ran over the threshold.
+
+    List the worst endpoints with `manage.py profile_report`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = profiling.get_profiling_settings()
+        self.sample_rate = config['SAMPLE_RATE']
+        self.slow_ms = config['SLOW_REQUEST_MS']
+        self.header = config['HEADER']
+        self.header_token = config['HEADER_TOKEN']
+        self.store = profiling.ProfileStore(config['DIR'], config['MAX_FILES'])
+        self.sampler = None
+        if self.slow_ms is not None:
+            self.sampler = profiling.StackSampler(config['SAMPLE_INTERVAL_MS'] / 1000)
+
+    def __call__(self, request):
+        if self.profile_requested(request) or (self.sample_rate > 0 and random.random() < self.sample_rate):
+            return self.run_cprofile(request)
+        if self.sampler is not None:
+            return self.run_sampled(request)
+        return self.get_response(request)
+
+    def profile_requested(self, request):
+        value = request.META.get(self.header) if self.header else None
+        if not value:
+            return False
+        if self.header_token:
+            return hmac.compare_digest(value, self.header_token)
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_active and user.is_staff)
+
+    def run_cprofile(self, request):
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.store.save_cprofile(profiler, metrics.route_label(request), elapsed_ms)
+        return response
+
+    def run_sampled(self, request):
+        thread_id = threading.get_ident()
+        self.sampler.start(thread_id)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            samples = self.sampler.stop(thread_id)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms >= self.slow_ms and samples:
+            self.store.save_collapsed(samples, metrics.route_label(request), elapsed_ms)
+        return response
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip, as negotiated from Accept-Encoding.
+
+    Bodies under MIN_SIZE, SKIP_TYPES content types, responses that already
+    have a Content-Encoding and `Cache-Control: no-transform` are left alone.
+    Streaming responses are compressed chunk by chunk. On sampled requests
+    the CPU time spent goes into a 'compress' timing span and the
+    compress_bytes_in / compress_bytes_saved counters.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = compression.get_compression_settings()
+        self.encodings = compression.available_encodings(self.config['ENCODINGS'])
+        self.skip_types = tuple(t.lower() for t in self.config['SKIP_TYPES'])
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING'), self.encodings)
+        if encoding is None:
+            return response
+
+        stream = compression.open_stream(encoding, self.config)
+        timings = instrumentation.current_timings()
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async(response.streaming_content, stream, timings)
+            else:
+                response.streaming_content = self.compress_sync(response.streaming_content, stream, timings)
+            del response.headers['Content-Length']
+        else:
+            content = response.content
+            start = time.thread_time()
+            compressed = compression.compress_bytes(stream, content)
+            self.account(timings, time.thread_time() - start, len(content), len(compressed))
+            if len(compressed) >= len(content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compressible(self, response):
+        if response.has_header('Content-Encoding'):
+            return False
+        if 'no-transform' in response.get('Cache-Control', '').lower():
+            return False
+        content_type = response.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        if content_type.startswith(self.skip_types):
+            return False
+        return response.streaming or len(response.content) >= self.config['MIN_SIZE']
+
+    def account(self, timings, cpu_seconds, size_in, size_out):
+        if timings is None:
+            return
+        timings.record('compress', cpu_seconds)
+        timings.incr('compress_bytes_in', size_in)
+        timings.incr('compress_bytes_saved', size_in - size_out)
+
+    def compress_sync(self, content, stream, timings):
+        cpu, size_in, size_out = 0.0, 0, 0
+        try:
+            chunk = stream.header
+            for data in content:
+                start = time.thread_time()
+                chunk += stream.compress(data)
+                cpu += time.thread_time() - start
+                size_in += len(data)
+                if chunk:
+                    size_out += len(chunk)
+                    yield chunk
+                    chunk = b''
+            start = time.thread_time()
+            chunk += stream.finish()
+            cpu += time.thread_time() - start
+            size_out += len(chunk)
+            yield chunk
+        finally:
+            self.account(timings, cpu, size_in, size_out)
+
+    async def compress_async(self, content, stream, timings):
+        cpu, size_in, size_out = 0.0, 0, 0
+        try:
+            chunk = stream.header
+            async for data in content:
+                start = time.thread_time()
+                chunk += stream.compress(data)
+                cpu += time.thread_time() - start
+                size_in += len(data)
+                if chunk:
+                    size_out += len(chunk)
+                    yield chunk
+                    chunk = b''
+            start = time.thread_time()
+            chunk += stream.finish()
+            cpu += time.thread_time() - start
+            size_out += len(chunk)
+            yield chunk
+        finally:
+            self.account(timings, cpu, size_in, size_out)
+
+
+class StaticFilesMiddleware:
+    """Serve STATIC_URL from STATIC_ROOT before the rest of the stack runs.
+
+    Picks the precompressed variant written by collectstatic that matches
+    Accept-Encoding, and marks content-hashed names immutable. Requests for
+    files that are not in STATIC_ROOT fall through to the normal handling.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + urlsplit(settings.STATIC_URL or '').path.lstrip('/')
+        self.root = settings.STATIC_ROOT
+        self.config = staticfiles.get_static_settings()
+        self.immutable = staticfiles.hashed_names()
+
+    def __call__(self, request):
+        if not self.root or self.prefix == '/' or not request.path_info.startswith(self.prefix):
+            return self.get_response(request)
+        asset = staticfiles.find_asset(self.root, request.path_info[len(self.prefix):], self.immutable)
+        if asset is None:
+            return self.get_response(request)
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+        encoding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING'), asset.encodings)
+        etag = asset.etag(encoding)
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = HttpResponseNotModified()
+        else:
+            f, size = asset.open(encoding)
+            response = FileResponse(f, content_type=asset.content_type)
+            response['Content-Length'] = size
+            response.headers.pop('Content-Disposition', None)
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = asset.last_modified
+        response['ETag'] = etag
+        if asset.immutable:
+            response['Cache-Control'] = f"public, max-age={self.config['MAX_AGE']}, immutable"
+        else:
+            response['Cache-Control'] = f"public, max-age={self.config['UNHASHED_MAX_AGE']}"
+        if asset.encodings:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Round
+
+import core.money
+
+# (model, field, extra keyword arguments of the field)
+AMOUNT_FIELDS = [
+    ('user', 'income', {'default': 0}),
+    ('transaction', 'amount', {}),
+    ('recurringrule', 'amount', {}),
+]
+
+
+def to_minor_units(apps, schema_editor):
+    for model_name, name, _ in AMOUNT_FIELDS:
+        model = apps.get_model('core', model_name)
+        model.objects.update(**{f'{name}_minor': models.ExpressionWrapper(
+            Round(models.F(name) * 100), output_field=models.BigIntegerField(),
+        )})
+
+
+def from_minor_units(apps, schema_editor):
+    for model_name, name, _ in AMOUNT_FIELDS:
+        model = apps.get_model('core', model_name)
+        model.objects.update(**{name: models.ExpressionWrapper(
+            models.F(f'{name}_minor') * models.Value(Decimal('0.01')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )})
+
+
+def copy_operations():
+    """Add a BIGINT column next to each amount, copy in one UPDATE per table, then swap it in"""
+    before, after = [], []
+    for model_name, name, extra in AMOUNT_FIELDS:
+        before += [
+            migrations.AddField(model_name, f'{name}_minor', models.BigIntegerField(default=0)),
+            # Nullable while both columns exist, so that reversing can re-add it before copying back
+            migrations.AlterField(model_name, name,
+                                  models.DecimalField(max_digits=12, decimal_places=2, null=True, **extra)),
+        ]
+        after += [
+            migrations.RemoveField(model_name, name),
+            migrations.RenameField(model_name, f'{name}_minor', name),
+            migrations.AlterField(model_name, name,
+                                  core.money.MinorUnitsField(max_digits=12, decimal_places=2, **extra)),
+        ]
+    return before + [migrations.RunPython(to_minor_units, from_minor_units)] + after
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_revoked_tokens'),
+    ]
+
+    operations = copy_operations()
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:44
+
+import core.money
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_amounts_in_minor_units'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='has_archive',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ArchivedMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('category', models.CharField(choices=[('needs', 'Needs'), ('wants', 'Wants'), ('savings', 'Savings'), ('income', 'Extra Income')], max_length=10)),
+                ('total', core.money.MinorUnitsField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('recurring_total', core.money.MinorUnitsField(decimal_places=2, default=0, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_months', to='core.user')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archives', to='core.user')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='archivedmonth',
+            constraint=models.UniqueConstraint(fields=('user', 'month', 'category'), name='unique_archived_month'),
+        ),
+        migrations.AddConstraint(
+            model_name='transactionarchive',
+            constraint=models.UniqueConstraint(fields=('user', 'year'), name='unique_archive_year'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from .money import MinorUnitsField
 import random
 import string
 from datetime import datetime, timedelta
@@ -8,7 +9,7 @@ class User(models.Model):
     """User model with phone-based authentication"""
     phone = models.CharField(max_length=15, unique=True)
     name = models.CharField(max_length=100, blank=True, default='')
-    income = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    income = MinorUnitsField(max_digits=12, decimal_places=2, default=0)  # Stored in cents/paise; see core/money.py
     currency = models.CharField(max_length=5, default='$')
     theme = models.CharField(max_length=10, default='light')
     pin = models.CharField(max_length=128, default='000000')  # Storing plain for now as requested for simplicity, or we can hash later
@@ -18,9 +19,39 @@ class User(models.Model):
     rule_wants = models.IntegerField(default=30)
     rule_savings = models.IntegerField(default=20)
     
+    # Incremented on every write to the user's data; part of cache keys for derived results
+    data_version = models.PositiveIntegerField(default=0)
+    # Set while any year is archived (core/archive.py), so other users skip the archive queries
+    has_archive = models.BooleanField(default=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    def save(self, *args, **kwargs):
+        if self.pk is None:
+            return super().save(*args, **kwargs)
+        self.data_version = models.F('data_version') + 1
+        if kwargs.get('update_fields') is None:
+            # has_archive is only written by core/archive.py; a stale copy must not clear it
+            kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name != 'has_archive']
+        kwargs['update_fields'] = {*kwargs['update_fields'], 'data_version'}
+        super().save(*args, **kwargs)
+        # Leave the new value deferred; it's loaded again only if something reads it
+        del self.data_version
+    
+    def bump_data_version(self):
+        """Invalidate cached results after writing transactions or rules for this user"""
+        version = self.__dict__.get('data_version')
+        if isinstance(version, int) and User.objects.filter(pk=self.pk, data_version=version).update(
+                data_version=version + 1):
+            # Nobody else wrote since this instance was loaded, so the new value is known: cache keys
+            # built from it later in the request don't have to load it again
+            self.data_version = version + 1
+            return
+        User.objects.filter(pk=self.pk).update(data_version=models.F('data_version') + 1)
+        self.__dict__.pop('data_version', None)
+    
     # Properties required for DRF authentication
     @property
     def is_authenticated(self):
@@ -43,6 +74,23 @@ class OTP(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_verified = models.BooleanField(default=False)
     
+    # SMS delivery, updated by the background dispatcher in core/otp_delivery.py
+    QUEUED = 'queued'
+    SENT = 'sent'
+    FAILED = 'failed'
+    DELIVERY_CHOICES = [
+        (QUEUED, 'Queued'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+    delivery_status = models.CharField(max_length=10, choices=DELIVERY_CHOICES, default=QUEUED)
+    delivery_attempts = models.PositiveSmallIntegerField(default=0)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    provider_message_id = models.CharField(max_length=100, blank=True, default='')
+    delivery_error = models.CharField(max_length=255, blank=True, default='')
+    
+    LIFETIME = timedelta(minutes=10)
+    
     @classmethod
     def generate_otp(cls, phone):
         """Generate a 6-digit OTP for a phone number"""
@@ -58,7 +106,7 @@ class OTP(models.Model):
     
     def is_valid(self):
         """Check if OTP is still valid (10 minutes expiry)"""
-        expiry_time = self.created_at + timedelta(minutes=10)
+        expiry_time = self.created_at + self.LIFETIME
         return datetime.now(self.created_at.tzinfo) < expiry_time and not self.is_verified
     
     def __str__(self):
@@ -76,16 +124,164 @@ class Transaction(models.Model):
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
     description = models.CharField(max_length=255)
-    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = MinorUnitsField(max_digits=12, decimal_places=2)
     category = models.CharField(max_length=10, choices=CATEGORY_CHOICES)
     date = models.DateField()
     order = models.IntegerField(default=0)
+    # Set when this row is a confirmed/edited occurrence of a recurring rule
+    recurring_rule = models.ForeignKey('RecurringRule', on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='transactions')
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['order', '-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['recurring_rule', 'date'], name='unique_recurring_occurrence'),
+        ]
     
     def __str__(self):
         return f"{self.description}: {self.amount} ({self.category})"
+
+
+class RecurringRule(models.Model):
+    """A transaction that repeats monthly or weekly from start_date.
+
+    Occurrences are not stored ahead of time; see core/recurring.py. Monthly
+    rules fall on start_date's day (clamped to the month's last day), weekly
+    rules on start_date's weekday.
+    """
+    MONTHLY = 'monthly'
+    WEEKLY = 'weekly'
+    FREQUENCY_CHOICES = [
+        (MONTHLY, 'Monthly'),
+        (WEEKLY, 'Weekly'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_rules')
+    description = models.CharField(max_length=255)
+    amount = MinorUnitsField(max_digits=12, decimal_places=2)
+    category = models.CharField(max_length=10, choices=Transaction.CATEGORY_CHOICES)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default=MONTHLY)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.description}: {self.amount} {self.frequency} ({self.category})"
+
+
+class TransactionArchive(models.Model):
+    """One user's transactions for one closed year, packed and compressed; see core/archive.py"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archives')
+    year = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'year'], name='unique_archive_year'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.year} ({self.count} transactions)"
+
+
+class ArchivedMonth(models.Model):
+    """Per-category totals of an archived month, kept hot for history and savings"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_months')
+    month = models.DateField()  # First day of the month
+    category = models.CharField(max_length=10, choices=Transaction.CATEGORY_CHOICES)
+    total = MinorUnitsField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+    # Unconfirmed recurring occurrences in the month, frozen when it was archived
+    recurring_total = MinorUnitsField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'category'], name='unique_archived_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.month:%Y-%m} {self.category} {self.total}"
+
+
+class RevokedToken(models.Model):
+    """A JWT, by its jti claim, that must no longer be accepted.
+
+    Rows are only needed until the token would have expired anyway; see
+    core/revocation.py and `manage.py compact_revocations`.
+    """
+    ACCESS = 'access'
+    REFRESH = 'refresh'
+    TOKEN_TYPE_CHOICES = [
+        (ACCESS, 'Access'),
+        (REFRESH, 'Refresh'),
+    ]
+
+    jti = models.CharField(max_length=64, unique=True)
+    token_type = models.CharField(max_length=10, choices=TOKEN_TYPE_CHOICES)
+    user_id = models.BigIntegerField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Revoked {self.token_type} {self.jti}"
+
+
+class DeletionRequest(models.Model):
+    """Bulk deletion of a user's data, carried out in batches by core/deletion.py"""
+    RESET = 'reset'
+    IMPORT = 'import'
+    ACCOUNT = 'account'
+    KIND_CHOICES = [
+        (RESET, 'Reset data'),
+        (IMPORT, 'Replace data on import'),
+        (ACCOUNT, 'Delete account'),
+    ]
+
+    REQUESTED = 'requested'  # Account deletion asked for without a session; waits for staff approval
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (REQUESTED, 'Requested'),
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    # Kept after the account is gone, as the record that it was deleted
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='deletion_requests')
+    phone = models.CharField(max_length=15)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    reason = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+
+    # Only rows up to these ids are deleted, so data written after the request survives (e.g. the import itself)
+    last_transaction_id = models.BigIntegerField(null=True, blank=True)
+    last_rule_id = models.BigIntegerField(null=True, blank=True)
+
+    total = models.PositiveIntegerField(default=0)    # Rows to delete, counted when processing starts
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=255, blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def progress(self):
+        """Share of rows deleted so far, 0.0 to 1.0"""
+        if self.status == self.DONE:
+            return 1.0
+        return min(1.0, self.deleted / self.total) if self.total else 0.0
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.phone} ({self.status})"
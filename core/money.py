@@ -0,0 +1,122 @@
+"""
+Money amounts stored as integer minor units.
+
+User.income and the amount columns are MinorUnitsFields: BIGINT columns
+holding amount × 10^decimal_places (cents, paise), read and written as
+Decimal. Models, querysets, forms and serializers keep seeing Decimals with
+two places, while the database stores 8-byte integers and sums, compares
+and indexes them as integers. Sum('amount') comes back as a Decimal too,
+converted once from the integer total.
+
+Code that adds up many rows in Python can fetch the raw integers with
+minor('amount') and convert the total once with from_minor().
+
+The currency is a per-user display preference that can change at any
+time, so every amount is stored at the same exponent rather than at its
+currency's. A system check makes sure that exponent covers the minor unit
+of every currency in CURRENCIES.
+"""
+from decimal import ROUND_HALF_EVEN, Decimal
+
+from django.core import checks, exceptions, validators as core_validators
+from django.db import models
+from django.db.models import lookups
+from django.utils.functional import cached_property
+from django import forms
+
+
+# (code, label, exponent of the currency's minor unit)
+CURRENCIES = [
+    ('$', 'Dollar', 2),
+    ('₹', 'Rupee', 2),
+    ('€', 'Euro', 2),
+    ('£', 'Pound', 2),
+    ('¥', 'Yen', 0),
+]
+
+
+def exponent(currency):
+    """Decimal places of the currency's minor unit; 2 for unknown codes"""
+    return next((places for code, _, places in CURRENCIES if code == currency), 2)
+
+
+def to_minor(value, decimal_places=2):
+    """Decimal (or str/int/float) amount as an integer count of minor units, rounding half-even"""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int(value.scaleb(decimal_places).quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+
+def from_minor(value, decimal_places=2):
+    """Integer minor units as a Decimal with `decimal_places` places"""
+    return Decimal(value).scaleb(-decimal_places)
+
+
+def minor(name):
+    """Expression selecting a MinorUnitsField's raw integer, skipping the Decimal conversion"""
+    return models.ExpressionWrapper(models.F(name), output_field=models.BigIntegerField())
+
+
+class MinorUnitsField(models.BigIntegerField):
+    """Decimal amount with `decimal_places` places, stored as a BIGINT of minor units"""
+    description = 'Amount stored as integer minor units'
+
+    def __init__(self, *args, max_digits=12, decimal_places=2, **kwargs):
+        self.max_digits = max_digits
+        self.decimal_places = decimal_places
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['max_digits'] = self.max_digits
+        kwargs['decimal_places'] = self.decimal_places
+        return name, path, args, kwargs
+
+    def check(self, **kwargs):
+        errors = super().check(**kwargs)
+        widest = max(places for _, _, places in CURRENCIES)
+        if self.decimal_places < widest:
+            errors.append(checks.Error(
+                f'{self.decimal_places} decimal places cannot hold amounts in every currency '
+                f'in core.money.CURRENCIES, which need {widest}.',
+                obj=self, id='core.E001',
+            ))
+        return errors
+
+    @cached_property
+    def validators(self):
+        # Limits apply to the Decimal value, as for DecimalField, not to the BIGINT range
+        return [*self.default_validators, *self._validators,
+                core_validators.DecimalValidator(self.max_digits, self.decimal_places)]
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else from_minor(value, self.decimal_places)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(str(value))
+        except ArithmeticError:
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value},
+            )
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        return to_minor(self.to_python(value), self.decimal_places)
+
+    def formfield(self, **kwargs):
+        return super(models.IntegerField, self).formfield(**{
+            'max_digits': self.max_digits,
+            'decimal_places': self.decimal_places,
+            'form_class': forms.DecimalField,
+            **kwargs,
+        })
+
+
+# Amounts compare as Decimals; IntegerField's versions of these round float arguments to whole units
+MinorUnitsField.register_lookup(lookups.GreaterThanOrEqual)
+MinorUnitsField.register_lookup(lookups.LessThan)
@@ -0,0 +1,303 @@
+"""
+OTP delivery.
+
+The send_otp views call dispatch(otp), which only puts a message on an
+in-process queue and returns. A daemon thread drains the queue in batches,
+hands each batch to the configured SMSProvider, retries retryable failures
+with exponential backoff and records the outcome on the OTP row
+(delivery_status, delivery_attempts, delivered_at, provider_message_id,
+delivery_error). Before a retry the OTP row is checked again: a code that
+has been used, has expired or was replaced by a newer one is not sent.
+With ASYNC off, delivery runs inside the request instead,
+retrying without waiting, which keeps tests deterministic.
+"""
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+import atexit
+import heapq
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from . import metrics
+from .models import OTP
+
+logger = logging.getLogger(__name__)
+
+
+def get_otp_delivery_settings():
+    """OTP_DELIVERY settings merged over defaults"""
+    config = {
+        'PROVIDER': 'core.otp_delivery.ConsoleProvider',
+        'OPTIONS': {},            # Keyword arguments for the provider class
+        'ASYNC': True,            # False delivers inside the request
+        'BATCH_SIZE': 50,         # Messages per provider call
+        'BATCH_WAIT': 0.05,       # Seconds to wait for more messages before sending a partial batch
+        'QUEUE_SIZE': 10000,
+        'MAX_ATTEMPTS': 4,
+        'BACKOFF': 1.0,           # Seconds before the first retry; doubles per attempt, with jitter
+        'BACKOFF_MAX': 60.0,
+        'SHUTDOWN_TIMEOUT': 5.0,  # Seconds spent delivering queued messages at process exit
+    }
+    config.update(getattr(settings, 'OTP_DELIVERY', {}))
+    return config
+
+
+class DeliveryError(Exception):
+    """Provider failure for one message; retryable=False gives up immediately (e.g. invalid number)"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class Message:
+    def __init__(self, otp_id, phone, text):
+        self.otp_id = otp_id
+        self.phone = phone
+        self.text = text
+        self.attempts = 0
+
+
+# ============== Providers ==============
+
+class SMSProvider:
+    """Base class for SMS gateways.
+
+    Implement send() or, for gateways that take many recipients per call,
+    send_batch(). A result is the provider's message id (or ''), or a
+    DeliveryError for that message. Any other exception fails the whole
+    batch as retryable.
+    """
+    name = 'sms'
+
+    def send(self, message):
+        raise NotImplementedError
+
+    def send_batch(self, messages):
+        results = []
+        for message in messages:
+            try:
+                results.append(self.send(message))
+            except DeliveryError as exc:
+                results.append(exc)
+        return results
+
+
+class ConsoleProvider(SMSProvider):
+    """Development stand-in: writes each message to the log and stdout"""
+    name = 'console'
+
+    def send(self, message):
+        logger.info('SMS to %s: %s', message.phone, message.text)
+        print(f"\n{'=' * 50}\n📱 SMS to {message.phone}: {message.text}\n{'=' * 50}\n")
+        return ''
+
+
+class FileProvider(SMSProvider):
+    """Development stand-in: appends each message to a JSON-lines file"""
+    name = 'file'
+
+    def __init__(self, path='otp_outbox.jsonl'):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send_batch(self, messages):
+        sent_at = timezone.now().isoformat()
+        with self.lock, open(self.path, 'a') as f:
+            for message in messages:
+                f.write(json.dumps({'phone': message.phone, 'text': message.text, 'sent_at': sent_at}) + '\n')
+        return [''] * len(messages)
+
+
+# ============== Dispatcher ==============
+
+class Dispatcher:
+    """Queue, batch and retry deliveries on one background thread per process"""
+
+    def __init__(self, config):
+        self.config = config
+        self.provider = import_string(config['PROVIDER'])(**config['OPTIONS'])
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.pending = 0
+        self.pid = None
+        self.thread = None
+
+    def submit(self, message):
+        if not self.config['ASYNC']:
+            batch = [message]
+            while batch:
+                batch = self.deliver(batch)
+            return
+        with self.lock:
+            self.ensure_worker()
+            try:
+                self.queue.put_nowait(message)
+            except queue.Full:
+                message.attempts = 1
+                full = True
+            else:
+                self.pending += 1
+                full = False
+        if full:
+            logger.error('OTP delivery queue is full; dropping message for %s', message.phone)
+            self.record(message, OTP.FAILED, delivery_error='Delivery queue full')
+
+    def ensure_worker(self):
+        """Start the worker, again in a forked child, where the parent's thread does not exist"""
+        if self.pid == os.getpid() and self.thread.is_alive():
+            return
+        self.pid = os.getpid()
+        self.queue = queue.Queue(self.config['QUEUE_SIZE'])
+        self.retries = []  # heap of (due, sequence, message); only touched by the worker
+        self.sequence = itertools.count()
+        self.pending = 0
+        self.thread = threading.Thread(target=self.run, name='otp-delivery', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                continue
+            try:
+                retry = self.deliver(batch)
+            except Exception:
+                logger.exception('OTP delivery batch failed')
+                retry = []
+            finally:
+                close_old_connections()
+            for message in retry:
+                delay = min(self.config['BACKOFF_MAX'], self.config['BACKOFF'] * 2 ** (message.attempts - 1))
+                heapq.heappush(self.retries, (time.monotonic() + delay * random.uniform(0.5, 1.0),
+                                              next(self.sequence), message))
+            with self.lock:
+                self.pending -= len(batch) - len(retry)
+                if self.pending == 0:
+                    self.idle.notify_all()
+
+    def next_batch(self):
+        """Retries that are due, topped up from the queue for up to BATCH_WAIT"""
+        size = self.config['BATCH_SIZE']
+        batch = []
+        while self.retries and self.retries[0][0] <= time.monotonic() and len(batch) < size:
+            batch.append(heapq.heappop(self.retries)[2])
+        if not batch:
+            timeout = max(0.0, self.retries[0][0] - time.monotonic()) if self.retries else None
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                return batch
+        deadline = time.monotonic() + self.config['BATCH_WAIT']
+        while len(batch) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def deliver(self, batch):
+        """Send one batch and record the outcomes; returns the messages to retry"""
+        batch = self.still_valid(batch)
+        if not batch:
+            return []
+        for message in batch:
+            message.attempts += 1
+        try:
+            results = self.provider.send_batch(batch)
+        except Exception as exc:
+            logger.warning('SMS provider %s failed: %s', self.provider.name, exc)
+            results = [DeliveryError(str(exc))] * len(batch)
+
+        retry = []
+        now = timezone.now()
+        for message, result in zip(batch, results):
+            if not isinstance(result, Exception):
+                self.record(message, OTP.SENT, delivered_at=now, provider_message_id=result or '')
+            elif getattr(result, 'retryable', True) and message.attempts < self.config['MAX_ATTEMPTS']:
+                self.record(message, OTP.QUEUED, delivery_error=str(result)[:255])
+                retry.append(message)
+            else:
+                self.record(message, OTP.FAILED, delivery_error=str(result)[:255])
+        return retry
+
+    def still_valid(self, batch):
+        """Drop retries whose code was used, expired or replaced since the last attempt"""
+        retried = [message.otp_id for message in batch if message.attempts]
+        if not retried:
+            return batch
+        valid = set(OTP.objects.filter(
+            pk__in=retried, is_verified=False, created_at__gt=timezone.now() - OTP.LIFETIME,
+        ).values_list('pk', flat=True))
+        kept = []
+        for message in batch:
+            if message.attempts and message.otp_id not in valid:
+                logger.info('Not retrying SMS to %s: the code is no longer valid', message.phone)
+                metrics.record_otp_delivery(self.provider.name, 'dropped')
+            else:
+                kept.append(message)
+        return kept
+
+    def record(self, message, status, **fields):
+        metrics.record_otp_delivery(self.provider.name, 'retry' if status == OTP.QUEUED else status)
+        updated = OTP.objects.filter(pk=message.otp_id).update(
+            delivery_status=status, delivery_attempts=message.attempts, **fields
+        )
+        if not updated:
+            logger.warning('OTP %s for %s is gone; delivery status %s not recorded',
+                           message.otp_id, message.phone, status)
+
+    def flush(self, timeout=None):
+        """Wait until every queued message is sent or has failed; False on timeout"""
+        with self.lock:
+            return self.idle.wait_for(lambda: self.pending == 0, timeout)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = Dispatcher(get_otp_delivery_settings())
+        return _dispatcher
+
+
+def dispatch(otp):
+    """Queue the SMS for `otp`; returns without waiting for the provider"""
+    text = f'{otp.code} is your Wealth Planner verification code. It expires in 10 minutes.'
+    get_dispatcher().submit(Message(otp.pk, otp.phone, text))
+
+
+def flush(timeout=None):
+    return get_dispatcher().flush(timeout)
+
+
+def _reset_dispatcher(setting, **kwargs):
+    global _dispatcher
+    if setting == 'OTP_DELIVERY':
+        with _dispatcher_lock:
+            _dispatcher = None
+
+
+setting_changed.connect(_reset_dispatcher)
+
+
+@atexit.register
+def _drain_at_exit():
+    if _dispatcher is not None and _dispatcher.thread is not None:
+        _dispatcher.flush(_dispatcher.config['SHUTDOWN_TIMEOUT'])
@@ -0,0 +1,130 @@
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+import os
+import re
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+
+def get_profiling_settings():
+    """PROFILING settings merged over defaults"""
+    config = {
+        'SAMPLE_RATE': 0.0,          # Fraction of requests to run under cProfile
+        'SLOW_REQUEST_MS': None,     # Stack-sample every request, keep the slower ones
+        'SAMPLE_INTERVAL_MS': 5,
+        'HEADER': 'HTTP_X_PROFILE',  # Staff users (or HEADER_TOKEN) can force a profile
+        'HEADER_TOKEN': '',
+        'DIR': Path(settings.BASE_DIR) / 'profiles',
+        'MAX_FILES': 200,
+    }
+    config.update(getattr(settings, 'PROFILING', {}))
+    return config
+
+
+# File names look like 20260119T101500123456-api_dashboard-842ms.prof
+PROFILE_NAME_RE = re.compile(r'^(?P<stamp>\d{8}T\d+)-(?P<route>.+)-(?P<ms>\d+)ms\.(?P<kind>prof|collapsed)$')
+
+
+class StackSampler:
+    """One daemon thread sampling the stacks of registered request threads.
+
+    Each registered thread gets a Counter of collapsed stacks
+    ("file:function:line;..." root first) that can be dumped in the format
+    flamegraph tools read.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.active = {}
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def start(self, thread_id):
+        samples = Counter()
+        with self.lock:
+            self.active[thread_id] = samples
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+        return samples
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.active.pop(thread_id, Counter())
+
+    def run(self):
+        while True:
+            with self.lock:
+                targets = dict(self.active)
+            if not targets:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            frames = sys._current_frames()
+            for thread_id, samples in targets.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[collapse(frame)] += 1
+            time.sleep(self.interval)
+
+
+def collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class ProfileStore:
+    """Write profile files into one directory, keeping the newest MAX_FILES"""
+
+    def __init__(self, directory, max_files):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    def path_for(self, route, elapsed_ms, kind):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        safe_route = re.sub(r'[^A-Za-z0-9_]', '_', route or 'unmatched')
+        return self.directory / f'{stamp}-{safe_route}-{int(elapsed_ms)}ms.{kind}'
+
+    def save_cprofile(self, profiler, route, elapsed_ms):
+        path = self.path_for(route, elapsed_ms, 'prof')
+        profiler.dump_stats(str(path))
+        self.rotate()
+        return path
+
+    def save_collapsed(self, samples, route, elapsed_ms):
+        path = self.path_for(route, elapsed_ms, 'collapsed')
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        self.rotate()
+        return path
+
+    def entries(self):
+        """Parsed (route, elapsed_ms, kind, path) for every stored profile"""
+        if not self.directory.exists():
+            return []
+        result = []
+        for path in self.directory.iterdir():
+            match = PROFILE_NAME_RE.match(path.name)
+            if match:
+                result.append((match['route'], int(match['ms']), match['kind'], path))
+        return result
+
+    def rotate(self):
+        files = sorted(p for p in self.directory.iterdir() if PROFILE_NAME_RE.match(p.name))
+        for path in files[:max(0, len(files) - self.max_files)]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
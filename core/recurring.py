@@ -0,0 +1,142 @@
+"""
+Lazy expansion of recurring transaction rules.
+
+Rules are never copied into the Transaction table ahead of time. For the
+month being looked at, the rule's occurrences are produced as
+VirtualTransaction objects, minus any occurrence that already has a real row.
+An occurrence becomes a real Transaction (linked back through
+Transaction.recurring_rule) only when the user confirms or edits it.
+"""
+from datetime import date, timedelta
+import calendar
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F, Q
+from dateutil.relativedelta import relativedelta
+
+from .models import RecurringRule, Transaction
+
+
+class VirtualTransaction:
+    """Unsaved occurrence of a rule, shaped like a Transaction for aggregates and templates"""
+    id = None
+    is_virtual = True
+
+    def __init__(self, rule, on):
+        self.rule = rule
+        self.rule_id = rule.id
+        self.recurring_rule_id = rule.id
+        self.description = rule.description
+        self.amount = rule.amount
+        self.category = rule.category
+        self.date = on
+
+    @property
+    def key(self):
+        """Stable identifier used by confirm/edit requests, e.g. '12:2026-01-05'"""
+        return f'{self.rule_id}:{self.date.isoformat()}'
+
+
+def parse_key(key):
+    """(rule_id, date) from a VirtualTransaction key; ValueError if malformed"""
+    rule_id, _, on = (key or '').partition(':')
+    return int(rule_id), date.fromisoformat(on)
+
+
+def month_bounds(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def occurrences(rule, year, month):
+    """Dates on which `rule` falls in the given month"""
+    first, last = month_bounds(year, month)
+    start = max(first, rule.start_date)
+    end = min(last, rule.end_date) if rule.end_date else last
+    if start > end:
+        return []
+    if rule.frequency == RecurringRule.WEEKLY:
+        day = start + timedelta(days=(rule.start_date.weekday() - start.weekday()) % 7)
+        result = []
+        while day <= end:
+            result.append(day)
+            day += timedelta(days=7)
+        return result
+    day = date(year, month, min(rule.start_date.day, last.day))
+    return [day] if start <= day <= end else []
+
+
+def rules_for_month(user, year, month):
+    first, last = month_bounds(year, month)
+    return RecurringRule.objects.filter(user=user, start_date__lte=last).filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=first)
+    )
+
+
+def materialized(transactions):
+    """(rule_id, date) pairs already stored as real rows"""
+    return {(tx.recurring_rule_id, tx.date) for tx in transactions if tx.recurring_rule_id}
+
+
+def expand(rules, year, month, done=frozenset()):
+    """VirtualTransactions for `rules` in one month, skipping (rule_id, date) pairs in `done`"""
+    return [
+        VirtualTransaction(rule, on)
+        for rule in rules
+        for on in occurrences(rule, year, month)
+        if (rule.id, on) not in done
+    ]
+
+
+def virtual_transactions(user, year, month, transactions):
+    """Unconfirmed occurrences for the month; `transactions` are its real rows"""
+    return expand(rules_for_month(user, year, month), year, month, materialized(transactions))
+
+
+def virtual_history(rules, transactions, until):
+    """Unconfirmed occurrences of `rules` in every month up to and including `until`'s.
+
+    `transactions` must include all of the user's real rows in that range.
+    """
+    rules = [rule for rule in rules if rule.start_date <= until]
+    if not rules:
+        return []
+    done = materialized(transactions)
+    month = min(rule.start_date for rule in rules).replace(day=1)
+    result = []
+    while month <= until:
+        result.extend(expand(rules, month.year, month.month, done))
+        month += relativedelta(months=1)
+    return result
+
+
+def materialize(rule, on, **changes):
+    """Store the occurrence of `rule` on `on` as a real Transaction, optionally edited.
+
+    Confirming an occurrence twice returns the existing row (with `changes`
+    applied). Raises ValueError if the rule does not fall on that date.
+    """
+    if on not in occurrences(rule, on.year, on.month):
+        raise ValueError(f'{rule.description} does not occur on {on.isoformat()}')
+    changes = {k: v for k, v in changes.items() if v is not None}
+
+    existing = Transaction.objects.filter(recurring_rule=rule, date=on).first()
+    if existing is None:
+        try:
+            with db_transaction.atomic():
+                # Shift existing orders down to make room at top, as add_transaction does
+                Transaction.objects.filter(
+                    user_id=rule.user_id, date__year=on.year, date__month=on.month
+                ).update(order=F('order') + 1)
+                fields = {'description': rule.description, 'amount': rule.amount, 'category': rule.category}
+                fields.update(changes)
+                return Transaction.objects.create(
+                    user_id=rule.user_id, recurring_rule=rule, date=on, order=0, **fields
+                )
+        except IntegrityError:
+            existing = Transaction.objects.get(recurring_rule=rule, date=on)
+
+    if changes:
+        for name, value in changes.items():
+            setattr(existing, name, value)
+        existing.save()
+    return existing
@@ -0,0 +1,174 @@
+from decimal import Decimal
+
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+import msgpack
+
+try:
+    import orjson
+except ImportError:  # Pure-Python fallback: DRF's own json-based classes
+    orjson = None
+
+
+_encoder = JSONEncoder()
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson when it is installed.
+
+    Decimal (as a number), date and datetime values are serialized directly,
+    so views can pass model values through without converting them by hand.
+    Output matches DRF's JSONRenderer: compact, UTF-8, 'Z' for UTC and
+    U+2028/U+2029 escaped. Indented output (e.g. the browsable API) falls
+    back to the stock renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser backed by orjson for UTF-8 request bodies"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+# ============== MessagePack ==============
+
+# Serializer output lists are packed as ExtType(TABLE_EXT_TYPE, [columns, scales, rows]):
+# `columns` come from the serializer definition (so the layout is the same
+# even for an empty list), each row is a positional array, and a column with
+# a non-null scale holds a DecimalField as a fixed-point integer
+# (1234.50 with scale 2 is sent as 123450).
+TABLE_EXT_TYPE = 1
+# Any other Decimal is packed as ExtType(DECIMAL_EXT_TYPE, [fixed-point integer, scale]),
+# the same exact encoding, so money never becomes a binary float
+DECIMAL_EXT_TYPE = 2
+
+
+def _fixed_point(value, scale):
+    if value is None:
+        return None
+    return int(Decimal(value).scaleb(scale).to_integral_value())
+
+
+def _decimal(value, scale=None):
+    """ExtType for a Decimal, at `scale` places or as many as it has"""
+    value = Decimal(value)
+    if scale is None:
+        scale = max(0, -value.as_tuple().exponent)
+    return msgpack.ExtType(DECIMAL_EXT_TYPE, _packb([_fixed_point(value, scale), scale]))
+
+
+def _table(data, child):
+    fields = [f for f in child.fields.values() if not f.write_only]
+    columns = [f.field_name for f in fields]
+    scales = [f.decimal_places if isinstance(f, serializers.DecimalField) else None for f in fields]
+    rows = [
+        [row[name] if scale is None else _fixed_point(row[name], scale)
+         for name, scale in zip(columns, scales)]
+        for row in data
+    ]
+    return msgpack.ExtType(TABLE_EXT_TYPE, _packb([columns, scales, rows]))
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, ReturnList):
+        child = getattr(obj.serializer, 'child', None)
+        if isinstance(child, serializers.Serializer):
+            return _table(obj, child)
+        return list(obj)
+    if isinstance(obj, ReturnDict):
+        result = dict(obj)
+        for name, field in obj.serializer.fields.items():
+            # serializer.errors is a ReturnDict too, with lists of messages as values
+            if isinstance(field, serializers.DecimalField) and isinstance(result.get(name), (str, Decimal)):
+                result[name] = _decimal(result[name], field.decimal_places)
+        return result
+    if isinstance(obj, dict):
+        return dict(obj)
+    if isinstance(obj, (list, tuple)):
+        return list(obj)
+    if isinstance(obj, Decimal):
+        return _decimal(obj)
+    # Subclasses of scalars (e.g. DRF's ErrorDetail) aren't packed natively under strict_types
+    if isinstance(obj, str):
+        return str(obj)
+    if isinstance(obj, float):
+        return float(obj)
+    if isinstance(obj, int):
+        return int(obj)
+    return _encoder.default(obj)
+
+
+def _packb(data):
+    # strict_types routes list/dict subclasses (ReturnList/ReturnDict) through the default hook
+    return msgpack.packb(data, default=_msgpack_default, strict_types=True, use_bin_type=True)
+
+
+def _ext_hook(code, data):
+    if code == DECIMAL_EXT_TYPE:
+        value, scale = _unpackb(data)
+        return Decimal(value).scaleb(-scale)
+    if code != TABLE_EXT_TYPE:
+        return msgpack.ExtType(code, data)
+    columns, scales, rows = _unpackb(data)
+    return [
+        {name: value if scale is None or value is None else Decimal(value).scaleb(-scale)
+         for name, scale, value in zip(columns, scales, row)}
+        for row in rows
+    ]
+
+
+def _unpackb(data):
+    return msgpack.unpackb(data, raw=False, ext_hook=_ext_hook, strict_map_key=False)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Compact binary responses for clients sending `Accept: application/msgpack`"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return _packb(data)
+
+
+class MessagePackParser(BaseParser):
+    """Request bodies sent with `Content-Type: application/msgpack`"""
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return _unpackb(stream.read())
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
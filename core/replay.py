@@ -0,0 +1,293 @@
+"""
+Replay captured traffic against a running server.
+
+Reads Django dev-server access logs (server_log.txt / server_error.txt) or a
+JSONL capture, logs in a pool of synthetic users, and replays the request
+mix with bounded concurrency. Used by `manage.py replay_traffic`.
+"""
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+import asyncio
+import json
+import random
+import re
+import time
+
+from django.urls import Resolver404, resolve, reverse
+import httpx
+
+
+ACCESS_LOG_RE = re.compile(
+    r'(?:\[(?P<ts>\d{2}/\w{3}/\d{4} \d{2}:\d{2}:\d{2})\] )?'
+    r'"(?P<method>[A-Z]+) (?P<path>\S+) HTTP/[\d.]+" (?P<status>\d{3})'
+)
+
+SYNTHETIC_PIN = '246810'
+
+
+class LogEntry:
+    """One captured request"""
+
+    def __init__(self, method, path, timestamp=None, body=None):
+        self.method = method
+        self.path = path
+        self.timestamp = timestamp
+        self.body = body
+
+
+def read_text(path):
+    """Dev-server logs may be UTF-8, UTF-16 or a mix of both after restarts"""
+    raw = Path(path).read_bytes()
+    if raw[:2] in (b'\xff\xfe', b'\xfe\xff'):
+        return raw.decode('utf-16', errors='replace')
+    return raw.replace(b'\x00', b'').decode('utf-8', errors='replace')
+
+
+def parse_access_log(path):
+    entries = []
+    for line in read_text(path).splitlines():
+        match = ACCESS_LOG_RE.search(line)
+        if not match:
+            continue
+        timestamp = None
+        if match['ts']:
+            timestamp = datetime.strptime(match['ts'], '%d/%b/%Y %H:%M:%S').timestamp()
+        entries.append(LogEntry(match['method'], match['path'], timestamp))
+    return entries
+
+
+def parse_jsonl(path):
+    """Lines like {"method": "POST", "path": "/api/transactions/", "timestamp": 1736150000.5, "body": {...}}
+
+    `timestamp` may be epoch seconds or an ISO string; lines without
+    method/path (e.g. other JSONL files) are skipped.
+    """
+    entries = []
+    for line in read_text(path).splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(record, dict) or 'path' not in record:
+            continue
+        timestamp = record.get('timestamp')
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp).timestamp()
+        entries.append(LogEntry(record.get('method', 'GET').upper(), record['path'], timestamp, record.get('body')))
+    return entries
+
+
+def load_entries(paths):
+    entries = []
+    for path in paths:
+        parser = parse_jsonl if str(path).endswith('.jsonl') else parse_access_log
+        entries.extend(parser(path))
+    timed = [e for e in entries if e.timestamp is not None]
+    if len(timed) == len(entries):
+        entries.sort(key=lambda e: e.timestamp)
+    return entries
+
+
+def route_name(path):
+    try:
+        return resolve(path.split('?', 1)[0]).url_name or 'unnamed'
+    except Resolver404:
+        return 'unmatched'
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class SyntheticUser:
+    """A registered user with JWTs, a web session and a few transactions"""
+
+    def __init__(self, phone, client):
+        self.phone = phone
+        self.client = client
+        self.access = None
+        self.refresh = None
+        self.tx_ids = []
+
+    @property
+    def csrf_token(self):
+        return self.client.cookies.get('csrftoken', '')
+
+    async def setup(self):
+        response = await self.client.post('/api/auth/register/', json={
+            'phone': self.phone, 'pin': SYNTHETIC_PIN, 'name': 'Replay',
+        })
+        response.raise_for_status()
+        tokens = response.json()['tokens']
+        self.access, self.refresh = tokens['access'], tokens['refresh']
+
+        headers = self.api_headers()
+        today = datetime.now().date().isoformat()
+        seed = [('Replay salary', '5000', 'income'), ('Replay rent', '100', 'needs'),
+                ('Replay coffee', '5', 'wants'), ('Replay fund', '50', 'savings')]
+        for description, amount, category in seed:
+            response = await self.client.post('/api/transactions/', headers=headers, json={
+                'description': description, 'amount': amount, 'category': category, 'date': today,
+            })
+            if response.status_code == 201:
+                self.tx_ids.append(response.json()['id'])
+
+        # Web session for the server-rendered pages
+        await self.client.get('/')
+        await self.client.post('/check-user/', data={
+            'phone': self.phone, 'csrfmiddlewaretoken': self.csrf_token,
+        })
+        await self.client.post('/login-pin/', data={
+            'pin': SYNTHETIC_PIN, 'csrfmiddlewaretoken': self.csrf_token,
+        })
+
+    def api_headers(self):
+        return {'Authorization': f'Bearer {self.access}'}
+
+
+def request_body(name, user):
+    """Plausible payload for a replayed write, since access logs carry no bodies"""
+    today = datetime.now()
+    bodies = {
+        'api_send_otp': {'phone': user.phone},
+        'api_verify_otp': {'phone': user.phone, 'otp': '000000'},
+        'api_check_status': {'phone': user.phone},
+        'api_register': {'phone': f'6{random.randrange(10 ** 9):09d}', 'pin': SYNTHETIC_PIN},
+        'api_login_pin': {'phone': user.phone, 'pin': SYNTHETIC_PIN},
+        'token_refresh': {'refresh': user.refresh},
+        'api_user_profile': {'name': 'Replay'},
+        'api_setup_user': {'name': 'Replay'},
+        'api_transaction_list': {'description': 'Replay', 'amount': '1.00', 'category': 'needs',
+                                 'date': today.date().isoformat()},
+        'api_transaction_detail': {'description': 'Replay edit'},
+        'api_reorder_transactions': {'order': user.tx_ids or [0]},
+        'check_user': {'phone': user.phone},
+        'login_pin': {'pin': SYNTHETIC_PIN},
+        'add_transaction': {'description': 'Replay', 'amount': '1', 'category': 'needs',
+                            'year': today.year, 'month': today.month},
+    }
+    return bodies.get(name)
+
+
+def rewrite_path(name, path, user):
+    """Point per-object URLs at one of the synthetic user's own transactions"""
+    kwarg = {'api_transaction_detail': 'pk', 'delete_transaction': 'tx_id'}.get(name)
+    if kwarg is None or not user.tx_ids:
+        return path
+    _, _, query = path.partition('?')
+    new_path = reverse(name, kwargs={kwarg: random.choice(user.tx_ids)})
+    return f'{new_path}?{query}' if query else new_path
+
+
+class RouteStats:
+    def __init__(self):
+        self.sent = 0
+        self.latencies = []
+        self.client_errors = 0
+        self.errors = 0
+
+
+class ReplayRunner:
+    """Replay entries with at most `concurrency` requests in flight.
+
+    Captured timestamps are honoured, compressed by `speed` (2.0 = twice as
+    fast); a speed of 0 sends everything as fast as concurrency allows.
+    """
+
+    def __init__(self, base_url, entries, users=5, concurrency=20, speed=1.0, timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.entries = entries
+        self.user_count = users
+        self.concurrency = concurrency
+        self.speed = speed
+        self.timeout = timeout
+        self.stats = defaultdict(RouteStats)
+        self.elapsed = 0.0
+
+    def new_client(self):
+        return httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, follow_redirects=False)
+
+    async def create_users(self):
+        prefix = random.randrange(1000, 10000)
+        users = [SyntheticUser(f'7{prefix}{i:05d}', self.new_client()) for i in range(self.user_count)]
+        await asyncio.gather(*(user.setup() for user in users))
+        return users
+
+    async def send(self, entry, user, semaphore):
+        name = route_name(entry.path)
+        path = rewrite_path(name, entry.path, user)
+        body = entry.body
+        if body is None and entry.method in ('POST', 'PUT', 'PATCH'):
+            body = request_body(name, user)
+
+        kwargs = {}
+        if path.startswith('/api/'):
+            kwargs['headers'] = user.api_headers()
+            if body is not None:
+                kwargs['json'] = body
+        else:
+            kwargs['headers'] = {'X-CSRFToken': user.csrf_token}
+            if body is not None:
+                kwargs['data'] = body
+
+        stats = self.stats[name]
+        async with semaphore:
+            stats.sent += 1
+            start = time.perf_counter()
+            try:
+                response = await user.client.request(entry.method, path, **kwargs)
+            except httpx.HTTPError:
+                stats.errors += 1
+                return
+            stats.latencies.append(time.perf_counter() - start)
+        if response.status_code >= 500:
+            stats.errors += 1
+        elif response.status_code >= 400:
+            stats.client_errors += 1
+
+    async def run(self):
+        users = await self.create_users()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        origin = next((e.timestamp for e in self.entries if e.timestamp is not None), None)
+
+        tasks = []
+        start = time.perf_counter()
+        try:
+            for index, entry in enumerate(self.entries):
+                if self.speed > 0 and origin is not None and entry.timestamp is not None:
+                    delay = (entry.timestamp - origin) / self.speed - (time.perf_counter() - start)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                user = users[index % len(users)]
+                tasks.append(asyncio.create_task(self.send(entry, user, semaphore)))
+            await asyncio.gather(*tasks)
+        finally:
+            self.elapsed = time.perf_counter() - start
+            await asyncio.gather(*(user.client.aclose() for user in users))
+        return self.stats
+
+    def report(self):
+        """Throughput, latency percentiles (ms) and error rates per route"""
+        lines = [
+            f'{"route":<28} {"reqs":>6} {"req/s":>7} {"p50":>8} {"p90":>8} {"p99":>8} {"4xx":>5} {"errors":>6} {"err%":>6}'
+        ]
+        total = 0
+        elapsed = max(self.elapsed, 1e-9)
+        for name, stats in sorted(self.stats.items(), key=lambda item: -item[1].sent):
+            total += stats.sent
+            ms = [value * 1000 for value in stats.latencies]
+            lines.append(
+                f'{name:<28} {stats.sent:>6} {stats.sent / elapsed:>7.1f} '
+                f'{percentile(ms, 50):>8.1f} {percentile(ms, 90):>8.1f} {percentile(ms, 99):>8.1f} '
+                f'{stats.client_errors:>5} {stats.errors:>6} {stats.errors * 100 / max(stats.sent, 1):>5.1f}%'
+            )
+        lines.append(f'\n{total} requests in {self.elapsed:.2f}s ({total / elapsed:.1f} req/s)')
+        return '\n'.join(lines)
@@ -0,0 +1,198 @@
+"""
+JWT revocation.
+
+Revoked tokens are stored by jti in RevokedToken until they would have
+expired. Every authenticated API request and every refresh has to ask
+"is this jti revoked?", and almost always the answer is no, so each process
+keeps a Bloom filter of the revoked jtis in memory. A miss in the filter is
+definitive and costs no query; a hit (a revoked token, or a rare false
+positive) is confirmed against the table.
+
+The filter picks up revocations made by other processes with a cheap
+"rows after the last id I have" query every SYNC_INTERVAL seconds. Ids are
+handed out at insert but rows become visible at commit, so a lower id can
+appear after a higher one; each sync therefore also reads the rows revoked
+in the last SYNC_OVERLAP seconds again. The filter is rebuilt from the
+unexpired rows every REBUILD_INTERVAL seconds, or sooner once it holds more
+entries than it was sized for. Rebuilding is also what drops expired jtis
+from the filter; `manage.py compact_revocations` deletes their rows.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from . import metrics
+from .models import RevokedToken
+
+
+def get_revocation_settings():
+    """TOKEN_REVOCATION settings merged over defaults"""
+    config = {
+        'FALSE_POSITIVE_RATE': 0.001,  # Share of unrevoked tokens that still cost a confirming query
+        'MIN_CAPACITY': 1024,          # Entries the filter is sized for, at least
+        'SYNC_INTERVAL': 5,            # Seconds before revocations by other processes are seen
+        'SYNC_OVERLAP': 60,            # Seconds of recent revocations each sync reads again, for late commits
+        'REBUILD_INTERVAL': 60 * 60,   # Seconds between full rebuilds, which drop expired jtis
+    }
+    config.update(getattr(settings, 'TOKEN_REVOCATION', {}))
+    return config
+
+
+class BloomFilter:
+    """Fixed-size set membership with false positives but no false negatives"""
+
+    def __init__(self, capacity, false_positive_rate):
+        self.capacity = capacity
+        bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        self.size = max(8, bits)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item):
+        # Double hashing: two 64-bit halves of one digest give all k positions
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+
+class RevocationFilter:
+    """This process's Bloom filter of revoked jtis, kept in step with RevokedToken"""
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.last_id = 0
+        self.built_at = self.synced_at = 0.0
+
+    def rebuild(self):
+        rows = list(
+            RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list('id', 'jti')
+        )
+        capacity = max(self.config['MIN_CAPACITY'], 2 * len(rows))
+        bloom = BloomFilter(capacity, self.config['FALSE_POSITIVE_RATE'])
+        for _, jti in rows:
+            bloom.add(jti)
+        self.bloom = bloom
+        self.last_id = max((pk for pk, _ in rows), default=self.last_id)
+        self.built_at = self.synced_at = time.monotonic()
+
+    def sync(self):
+        recent = timezone.now() - timedelta(seconds=self.config['SYNC_OVERLAP'])
+        rows = RevokedToken.objects.filter(Q(id__gt=self.last_id) | Q(revoked_at__gte=recent)).values_list('id', 'jti')
+        for pk, jti in rows:
+            # Rows read again are in already; a false positive here is still confirmed by query
+            if jti not in self.bloom:
+                self.bloom.add(jti)
+            self.last_id = max(self.last_id, pk)
+        self.synced_at = time.monotonic()
+
+    def refresh(self):
+        now = time.monotonic()
+        if (self.bloom is None or self.bloom.count > self.bloom.capacity
+                or now - self.built_at >= self.config['REBUILD_INTERVAL']):
+            self.rebuild()
+        elif now - self.synced_at >= self.config['SYNC_INTERVAL']:
+            self.sync()
+
+    def might_contain(self, jti):
+        with self.lock:
+            self.refresh()
+            return jti in self.bloom
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+
+_filter = None
+_filter_lock = threading.Lock()
+
+
+def get_filter():
+    global _filter
+    with _filter_lock:
+        if _filter is None:
+            _filter = RevocationFilter(get_revocation_settings())
+        return _filter
+
+
+def is_revoked(jti):
+    """True if the token with this jti has been revoked; usually answered without a query"""
+    if not jti:
+        return False
+    if not get_filter().might_contain(jti):
+        metrics.record_token_revocation_check('clear')
+        return False
+    revoked = RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+    metrics.record_token_revocation_check('revoked' if revoked else 'false_positive')
+    return revoked
+
+
+def _row(token):
+    return RevokedToken(
+        jti=token[api_settings.JTI_CLAIM],
+        token_type=token[api_settings.TOKEN_TYPE_CLAIM],
+        user_id=token.get('user_id'),
+        expires_at=datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc),
+    )
+
+
+def revoke(token):
+    """Revoke a validated simplejwt token; False if it was already revoked.
+
+    The insert is the check: of two requests revoking the same token (two
+    refreshes racing with one refresh token), exactly one gets True.
+    """
+    row = _row(token)
+    try:
+        with transaction.atomic():
+            row.save()
+    except IntegrityError:
+        return False
+    get_filter().add(row.jti)
+    return True
+
+
+def revoke_all(tokens):
+    """Revoke several tokens in one insert, ignoring any already revoked"""
+    rows = [_row(token) for token in tokens]
+    RevokedToken.objects.bulk_create(rows, ignore_conflicts=True)
+    for row in rows:
+        get_filter().add(row.jti)
+
+
+def compact():
+    """Delete rows for tokens that have expired anyway; returns the number deleted"""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def _reset_filter(setting, **kwargs):
+    global _filter
+    if setting == 'TOKEN_REVOCATION':
+        with _filter_lock:
+            _filter = None
+
+
+setting_changed.connect(_reset_filter)
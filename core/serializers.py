@@ -1,8 +1,38 @@
-from rest_framework import serializers
-from .models import User, OTP, Transaction
+from datetime import date
+from decimal import Decimal
+from functools import partial
+import decimal
 
+from django.conf import settings as django_settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.validators import DecimalValidator
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from rest_framework.utils.serializer_helpers import ReturnList
+from .instrumentation import timed
+from .money import MinorUnitsField
+from .models import User, OTP, Transaction, RecurringRule
 
-class UserSerializer(serializers.ModelSerializer):
+
+class ModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer that shows MinorUnitsFields as DecimalFields, as before they were stored as integers"""
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        MinorUnitsField: serializers.DecimalField,
+    }
+
+    def build_standard_field(self, field_name, model_field):
+        field_class, kwargs = super().build_standard_field(field_name, model_field)
+        if isinstance(model_field, MinorUnitsField):
+            # DecimalField checks max_digits itself, as DRF arranges for models.DecimalField
+            validators = [v for v in kwargs.pop('validators', []) if not isinstance(v, DecimalValidator)]
+            if validators:
+                kwargs['validators'] = validators
+        return field_class, kwargs
+
+
+class UserSerializer(ModelSerializer):
     """Serializer for User model"""
     class Meta:
         model = User
@@ -11,7 +41,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'phone', 'created_at']
 
 
-class UserProfileUpdateSerializer(serializers.ModelSerializer):
+class UserProfileUpdateSerializer(ModelSerializer):
     """Serializer for updating user profile/settings"""
     class Meta:
         model = User
@@ -40,15 +70,134 @@ class OTPVerifySerializer(serializers.Serializer):
     otp = serializers.CharField(max_length=6)
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(ModelSerializer):
     """Serializer for Transaction model"""
+    # Rule this row was confirmed from, if any
+    recurring_rule = serializers.IntegerField(source='recurring_rule_id', read_only=True, allow_null=True)
+
     class Meta:
         model = Transaction
-        fields = ['id', 'description', 'amount', 'category', 'date', 'order', 'created_at']
+        fields = ['id', 'description', 'amount', 'category', 'date', 'order', 'recurring_rule', 'created_at']
         read_only_fields = ['id', 'order', 'created_at']
 
 
-class TransactionCreateSerializer(serializers.ModelSerializer):
+def _iso_datetime(tz, value):
+    if tz is not None:
+        value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _converter_factory(field):
+    """Return make(tz) -> converter for one serializer field.
+
+    Common field types get a specialised converter equivalent to their
+    to_representation(); anything else falls back to the field itself. The
+    current timezone and decimal context are resolved once per call to
+    make(), not once per row.
+    """
+    if type(field) is serializers.CharField:
+        return lambda tz: str
+    if type(field) is serializers.IntegerField:
+        return lambda tz: int
+    if (isinstance(field, serializers.DateTimeField)
+            and getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601
+            and not hasattr(field, 'timezone')):
+        return lambda tz: partial(_iso_datetime, tz)
+    if (isinstance(field, serializers.DateField) and not isinstance(field, serializers.DateTimeField)
+            and getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601):
+        return lambda tz: date.isoformat
+    if (isinstance(field, serializers.DecimalField) and field.max_digits is not None and not field.localize
+            and getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)):
+        exponent = Decimal('.1') ** field.decimal_places
+
+        def make(tz):
+            context = decimal.getcontext().copy()
+            context.prec = field.max_digits
+            return lambda value: '{:f}'.format(
+                (value if isinstance(value, Decimal) else Decimal(str(value).strip()))
+                .quantize(exponent, rounding=field.rounding, context=context)
+            )
+        return make
+    return lambda tz: field.to_representation
+
+
+class FastReadListSerializer:
+    """Read-only stand-in for `serializer_class(queryset, many=True).data`.
+
+    Rows are fetched with values_list() and each column goes through a
+    converter compiled once from the serializer's own fields, skipping model
+    instantiation and per-field serializer dispatch. Output is identical to
+    the wrapped serializer. Only plain model-attribute fields are supported.
+    A list of instances (e.g. archived transactions) is read attribute by
+    attribute instead.
+    """
+    serializer_class = None
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self._rows = None
+
+    @classmethod
+    def compiled(cls):
+        """(child serializer, field names, values_list paths, converter factories), built once per class"""
+        if '_compiled' not in cls.__dict__:
+            child = cls.serializer_class()
+            names, paths, factories = [], [], []
+            for field in child.fields.values():
+                if field.write_only:
+                    continue
+                if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+                    raise ImproperlyConfigured(f'{cls.__name__} cannot read field {field.field_name!r} from values_list()')
+                names.append(field.field_name)
+                paths.append('__'.join(field.source_attrs))
+                factories.append(_converter_factory(field))
+            cls._compiled = (child, names, paths, factories)
+        return cls._compiled
+
+    @property
+    def child(self):
+        return self.compiled()[0]
+
+    @property
+    def rows(self):
+        """Raw values_list() tuples, fetched once"""
+        if self._rows is None:
+            paths = self.compiled()[2]
+            if isinstance(self.queryset, list):
+                self._rows = [tuple(getattr(obj, path) for path in paths) for obj in self.queryset]
+            else:
+                self._rows = list(self.queryset.values_list(*paths))
+        return self._rows
+
+    def index(self, name):
+        """Position of a serializer field in `rows`"""
+        return self.compiled()[1].index(name)
+
+    def to_representation(self, rows):
+        _, names, _, factories = self.compiled()
+        tz = timezone.get_current_timezone() if django_settings.USE_TZ else None
+        converters = [make(tz) for make in factories]
+        with timed('serialize'):
+            return ReturnList([
+                {name: None if value is None else convert(value)
+                 for name, convert, value in zip(names, converters, row)}
+                for row in rows
+            ], serializer=self)
+
+    @property
+    def data(self):
+        return self.to_representation(self.rows)
+
+
+class FastTransactionSerializer(FastReadListSerializer):
+    """values_list()-based equivalent of TransactionSerializer(many=True)"""
+    serializer_class = TransactionSerializer
+
+
+class TransactionCreateSerializer(ModelSerializer):
     """Serializer for creating/updating transactions"""
     class Meta:
         model = Transaction
@@ -68,6 +217,58 @@ class TransactionReorderSerializer(serializers.Serializer):
     )
 
 
+class RecurringRuleSerializer(ModelSerializer):
+    """Serializer for RecurringRule model"""
+    class Meta:
+        model = RecurringRule
+        fields = ['id', 'description', 'amount', 'category', 'frequency', 'start_date', 'end_date', 'created_at']
+        read_only_fields = ['id', 'created_at']
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Amount must be positive")
+        return value
+
+    def validate(self, data):
+        start_date = data.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = data.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': 'End date cannot be before start date'})
+        if self.instance is not None:
+            # Confirmed occurrences keep their dates, so a new schedule would count those months twice
+            moved = [name for name in ('start_date', 'frequency')
+                     if name in data and data[name] != getattr(self.instance, name)]
+            if moved and self.instance.transactions.exists():
+                raise serializers.ValidationError({
+                    name: 'Occurrences have been confirmed; end this rule and add a new one to change its schedule'
+                    for name in moved
+                })
+        return data
+
+
+class RecurringOccurrenceSerializer(serializers.Serializer):
+    """Unconfirmed occurrence of a recurring rule (recurring.VirtualTransaction)"""
+    key = serializers.CharField()
+    rule = serializers.IntegerField(source='rule_id')
+    description = serializers.CharField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    category = serializers.CharField()
+    date = serializers.DateField()
+
+
+class RecurringConfirmSerializer(serializers.Serializer):
+    """Serializer for confirming (and optionally editing) one occurrence"""
+    date = serializers.DateField()
+    description = serializers.CharField(max_length=255, required=False)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    category = serializers.ChoiceField(choices=Transaction.CATEGORY_CHOICES, required=False)
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Amount must be positive")
+        return value
+
+
 class DashboardSummarySerializer(serializers.Serializer):
     """Serializer for dashboard summary data"""
     total_income = serializers.DecimalField(max_digits=12, decimal_places=2)
@@ -0,0 +1,161 @@
+"""
+Monthly statements for many users at once.
+
+Users are split into contiguous id ranges ("chunks"). Each chunk is built
+with four set-based queries: the users, per-month category totals summed in
+the database, recurring rules and their confirmed occurrences. The result is
+written as one JSON-lines file per chunk. The file is renamed into place only
+when it is complete, so an existing chunk file is the checkpoint that lets an
+interrupted run resume.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+import json
+import os
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from dateutil.relativedelta import relativedelta
+
+from . import recurring
+from .models import RecurringRule, Transaction, User
+
+
+HISTORY_MONTHS = 12
+CATEGORIES = ('needs', 'wants', 'savings')
+MANIFEST = 'manifest.json'
+
+
+def plan_chunks(chunk_size):
+    """[(first_id, last_id), ...] covering every user, `chunk_size` users each"""
+    ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    return [(chunk[0], chunk[-1]) for chunk in (ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size))]
+
+
+def chunk_path(directory, first_id, last_id):
+    return os.path.join(directory, f'users-{first_id:08d}-{last_id:08d}.jsonl')
+
+
+def load_manifest(directory, year, month):
+    """Chunk plan saved by an earlier run for the same month, or None"""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if manifest['month'] != f'{year}-{month:02d}':
+        raise ValueError(f"{directory} holds statements for {manifest['month']}")
+    return [tuple(chunk) for chunk in manifest['chunks']]
+
+
+def save_manifest(directory, year, month, chunks):
+    os.makedirs(directory, exist_ok=True)
+    _write_atomic(os.path.join(directory, MANIFEST),
+                  json.dumps({'month': f'{year}-{month:02d}', 'chunks': chunks}))
+
+
+def _write_atomic(path, text):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _month_key(day):
+    return f'{day.year}-{day.month:02d}'
+
+
+def build_statements(first_id, last_id, year, month):
+    """Statements for users with first_id <= id <= last_id, ordered by user id"""
+    end = date(year, month, 1) + relativedelta(months=1) - relativedelta(days=1)
+    start = date(year, month, 1) - relativedelta(months=HISTORY_MONTHS - 1)
+    users = list(User.objects.filter(id__gte=first_id, id__lte=last_id).order_by('id'))
+    in_chunk = {'user_id__gte': first_id, 'user_id__lte': last_id}
+
+    # {user_id: {'YYYY-MM': {category: total}}}
+    totals = defaultdict(lambda: defaultdict(lambda: defaultdict(Decimal)))
+    monthly = (
+        Transaction.objects.filter(date__gte=start, date__lte=end, **in_chunk)
+        .annotate(month=TruncMonth('date'))
+        .values_list('user_id', 'month', 'category')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    for user_id, day, category, total in monthly:
+        totals[user_id][_month_key(day)][category] += total  # Integer SUM, converted to Decimal cents once
+
+    # Recurring occurrences nobody has confirmed yet count like the views count them
+    rules = defaultdict(list)
+    for rule in RecurringRule.objects.filter(start_date__lte=end, **in_chunk):
+        rules[rule.user_id].append(rule)
+    done = set(
+        Transaction.objects.filter(date__gte=start, date__lte=end, recurring_rule__isnull=False, **in_chunk)
+        .values_list('recurring_rule_id', 'date')
+        .order_by()
+    )
+    month_start = start
+    while month_start <= end:
+        for user_id, user_rules in rules.items():
+            for tx in recurring.expand(user_rules, month_start.year, month_start.month, done):
+                totals[user_id][_month_key(tx.date)][tx.category] += tx.amount
+        month_start += relativedelta(months=1)
+
+    return [statement(user, totals[user.id], year, month) for user in users]
+
+
+def statement(user, months, year, month):
+    """One user's statement from {'YYYY-MM': {category: total}}"""
+    key = f'{year}-{month:02d}'
+    current = months.get(key, {})
+    extra_income = current.get('income', Decimal('0.00'))
+    total_income = user.income + extra_income
+    total_spent = sum((v for c, v in current.items() if c != 'income'), Decimal('0.00'))
+
+    categories = {}
+    for category in CATEGORIES:
+        rule = getattr(user, f'rule_{category}')
+        limit = total_income * Decimal(rule) / 100
+        spent = current.get(category, Decimal('0.00'))
+        categories[category] = {'spent': spent, 'rule': rule, 'limit': limit, 'over': spent > limit}
+
+    history = []
+    for month_key in sorted((k for k in months if k <= key), reverse=True):
+        data = months[month_key]
+        hist_income = user.income + data.get('income', Decimal('0.00'))
+        spent = sum((v for c, v in data.items() if c != 'income'), Decimal('0.00'))
+        saved = hist_income - spent
+        history.append({
+            'month': month_key,
+            'total_income': hist_income,
+            'spent': spent,
+            'saved': saved,
+            'status': 'Saved' if saved >= 0 else 'Over',
+        })
+
+    return {
+        'user_id': user.id,
+        'name': user.name,
+        'phone': user.phone,
+        'currency': user.currency,
+        'month': key,
+        'income': user.income,
+        'extra_income': extra_income,
+        'total_income': total_income,
+        'total_spent': total_spent,
+        'balance': total_income - total_spent,
+        'categories': categories,
+        'history': history,
+    }
+
+
+def write_chunk(directory, first_id, last_id, year, month):
+    """Build and write one chunk; returns (users written, seconds)"""
+    started = time.perf_counter()
+    statements = build_statements(first_id, last_id, year, month)
+    _write_atomic(chunk_path(directory, first_id, last_id), ''.join(
+        json.dumps(s, cls=DjangoJSONEncoder) + '\n' for s in statements
+    ))
+    return len(statements), time.perf_counter() - started
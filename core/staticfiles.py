@@ -0,0 +1,147 @@
+"""
+Fingerprinted, precompressed static files served by the app itself.
+
+`collectstatic` writes every file under STATIC_ROOT with a content hash in
+its name (ManifestStaticFilesStorage) and, for compressible types, .br and
+.gz siblings built at maximum compression. StaticFilesMiddleware then
+serves STATIC_URL straight from STATIC_ROOT: it picks the variant matching
+Accept-Encoding, and marks hashed names immutable for a year, since their
+content can never change under that URL.
+"""
+from email.utils import formatdate
+import logging
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+from . import compression
+
+logger = logging.getLogger(__name__)
+
+
+def get_static_settings():
+    """STATIC_ASSETS settings merged over defaults"""
+    config = {
+        'MAX_AGE': 60 * 60 * 24 * 365,  # Seconds, for content-hashed names (sent with `immutable`)
+        'UNHASHED_MAX_AGE': 60,         # Seconds, for names without a hash
+        'MIN_SIZE': 860,                # Bytes; smaller files get no compressed variants
+        'GZIP_LEVEL': 9,
+        'BROTLI_QUALITY': 11,
+    }
+    config.update(getattr(settings, 'STATIC_ASSETS', {}))
+    return config
+
+
+# Suffix of each precompressed variant, by Content-Encoding
+VARIANTS = {'br': '.br', 'gzip': '.gz'}
+
+
+def is_compressible(path):
+    content_type, encoding = mimetypes.guess_type(path)
+    if content_type is None or encoding is not None:
+        return False
+    return not content_type.startswith(tuple(compression.get_compression_settings()['SKIP_TYPES']))
+
+
+def write_variants(path, config):
+    """Write .br/.gz next to `path` when they are smaller; returns the encodings written"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = []
+    if len(data) < config['MIN_SIZE']:
+        return written
+    for encoding in compression.available_encodings(('br', 'gzip')):
+        if encoding == 'br':
+            stream = compression.BrotliStream(config['BROTLI_QUALITY'])
+        else:
+            stream = compression.GzipStream(config['GZIP_LEVEL'])
+        compressed = compression.compress_bytes(stream, data)
+        variant = path + VARIANTS[encoding]
+        if len(compressed) < len(data):
+            with open(variant, 'wb') as f:
+                f.write(compressed)
+            written.append(encoding)
+        elif os.path.exists(variant):
+            os.remove(variant)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes precompressed variants.
+
+    Before collectstatic has produced a manifest, names are served unhashed
+    (with the short UNHASHED_MAX_AGE, never immutable). That is expected
+    under DEBUG; otherwise it means a deploy skipped collectstatic, which is
+    logged as an error once per process.
+    """
+    missing_manifest_logged = False
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            if not settings.DEBUG and not self.missing_manifest_logged:
+                logger.error('No staticfiles manifest in %s: serving unhashed names, run collectstatic',
+                             self.location)
+                self.missing_manifest_logged = True
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        config = get_static_settings()
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if is_compressible(name) and self.exists(name):
+                write_variants(self.path(name), config)
+
+
+class StaticAsset:
+    """One file under STATIC_ROOT and its precompressed variants"""
+
+    def __init__(self, path, stat, immutable):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.immutable = immutable
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.encodings = [e for e in VARIANTS if os.path.isfile(path + VARIANTS[e])]
+
+    @property
+    def last_modified(self):
+        return formatdate(self.mtime, usegmt=True)
+
+    def etag(self, encoding=None):
+        tag = f'{int(self.mtime):x}-{self.size:x}'
+        return f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+
+    def open(self, encoding=None):
+        """(file object, size) for the given variant"""
+        path = self.path + VARIANTS[encoding] if encoding else self.path
+        return open(path, 'rb'), os.path.getsize(path)
+
+
+def hashed_names():
+    """Set of content-hashed names from the collectstatic manifest"""
+    from django.contrib.staticfiles.storage import staticfiles_storage
+    return set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def find_asset(root, name, immutable_names):
+    """StaticAsset for `name` under `root`, or None if missing, outside it or a precompressed variant"""
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, name))
+    if not path.startswith(root + os.sep):
+        return None
+    # Variants are only sent for their original, with a Content-Encoding; on their own they'd pass as plain text
+    if path.endswith(tuple(VARIANTS.values())) and os.path.isfile(os.path.splitext(path)[0]):
+        return None
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not os.path.isfile(path):
+        return None
+    return StaticAsset(path, stat, name in immutable_names)
@@ -1,3 +1,1829 @@
-from django.test import TestCase
+import difflib
+import gzip
+import json
+import re
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from dateutil.relativedelta import relativedelta
+
+from . import advisor, otp_delivery, recurring, revocation, urls as core_urls, views
+from .api_views import get_tokens_for_user
+from .models import User, OTP, Transaction, RecurringRule, RevokedToken, DeletionRequest
+
+
+# ============== Query Budgets ==============
+
+# Maximum number of SQL queries per URL name. Every named route in
+# core/urls.py must have an entry, and the count must not depend on how many
+# transactions the user has.
+QUERY_BUDGETS = {
+    # Authentication
+    'login': 0,
+    'check_user': 1,
+    'login_pin': 1,
+    'create_pin': 2,
+    'send_otp': 3,
+    'verify_otp': 3,
+    'setup': 1,
+    'logout': 0,
+    'privacy_policy': 0,
+    'delete_account': 0,
+
+    # Main views
+    'dashboard': 9,
+    'savings': 4,
+    'transactions': 3,
+    'history': 3,
+    'advisor': 4,
+    'settings': 1,
+    'save_settings': 2,
+
+    # Transaction operations
+    'add_transaction': 9,  # Balance check and write are one versioned transaction
+    'delete_transaction': 6,
+    'reorder_transactions': 5,
+    'confirm_recurring': 14,
+    'delete_recurring': 5,
+
+    # Data operations; deletions are only queued here (the default, ASYNC); see test_deletion_processor
+    'export_data': 3,
+    'import_data': 7,
+    'reset_data': 5,
+
+    # Theme toggle
+    'toggle_theme': 2,
+
+    # Auth API
+    'api_send_otp': 3,
+    'api_verify_otp': 3,
+    'api_check_status': 1,
+    'api_register': 2,
+    'api_login_pin': 1,
+    'api_logout': 2,
+    'token_refresh': 4,  # Includes the savepoint around the single-use insert
+
+    # User API
+    'api_user_profile': 1,
+    'api_setup_user': 2,
+
+    # Transaction API
+    'api_transaction_list': 2,
+    'api_transaction_detail': 2,
+    'api_reorder_transactions': 5,
+
+    # Recurring Transaction API
+    'api_recurring_list': 2,
+    'api_recurring_detail': 2,
+    'api_recurring_confirm': 14,
+
+    # Dashboard / Savings / Settings API
+    'api_dashboard': 5,
+    'api_bootstrap': 7,
+    'api_savings': 3,
+    'api_reset_data': 5,
+    'api_deletion_status': 2,
+    'api_toggle_theme': 2,
+
+    # Monitoring
+    'metrics': 0,
+}
+
+SMALL_DATASET = 3
+LARGE_DATASET = 240
+
+PHONE = '9876543210'
+
+
+def log_in(client, user, **values):
+    """Give `client` a web session for `user`.
+
+    Signed-cookie sessions change key on every save, so the cookie is set
+    from the saved store rather than through client.session.
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session['user_id'] = user.id
+    session.update(values)
+    session.save()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+
+# Deliver OTPs inline so their status updates are counted with the request
+MEMORY_OTP_DELIVERY = {'PROVIDER': 'core.tests.MemoryProvider', 'ASYNC': False}
+
+
+# Keep the revocation filter from syncing mid-test, so it adds no queries
+QUIET_REVOCATION = {'SYNC_INTERVAL': 60 * 60, 'REBUILD_INTERVAL': 60 * 60}
+
+
+# Process deletion requests inside the request that makes them
+INLINE_DELETION = {'ASYNC': False, 'PAUSE': 0}
+
+
+# Compute bootstrap sections on the test's own connection, which can see its uncommitted rows
+SEQUENTIAL_BOOTSTRAP = {'CONCURRENT': False}
+
+
+@override_settings(REQUEST_TIMING={'SAMPLE_RATE': 0.0}, OTP_DELIVERY=MEMORY_OTP_DELIVERY,
+                   TOKEN_REVOCATION=QUIET_REVOCATION, BOOTSTRAP=SEQUENTIAL_BOOTSTRAP)
+class QueryBudgetTests(TestCase):
+    """Fix the number of SQL queries each endpoint may issue"""
+
+    def seed(self, count):
+        """Create a user with `count` transactions spread over recent months, plus recurring rules"""
+        user = User.objects.create(phone=PHONE, name='Budget', pin='123456', income=Decimal('100000'))
+        today = date.today()
+        categories = ['needs', 'wants', 'savings', 'income']
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=user,
+                description=f'Tx {i}',
+                amount=Decimal('10.00'),
+                category=categories[i % len(categories)],
+                date=today - timedelta(days=(i * 3) % 720),
+                order=i,
+            )
+            for i in range(count)
+        ])
+        start = today - timedelta(days=400)
+        rules = RecurringRule.objects.bulk_create([
+            RecurringRule(user=user, description=f'Rule {i}', amount=Decimal('5.00'),
+                          category=categories[i % len(categories)],
+                          frequency=RecurringRule.WEEKLY if i % 2 else RecurringRule.MONTHLY,
+                          start_date=start + timedelta(days=i))
+            for i in range(max(1, count // 20))
+        ])
+        # Confirm the first occurrence of each rule
+        Transaction.objects.bulk_create([
+            Transaction(user=user, description=rule.description, amount=rule.amount, category=rule.category,
+                        date=rule.start_date, recurring_rule=rule)
+            for rule in rules
+        ])
+        OTP.objects.create(phone=PHONE, code='111111')
+        return user
+
+    def login_session(self, user):
+        log_in(self.client, user, pending_phone=user.phone)
+
+    def api_auth(self, user):
+        tokens = get_tokens_for_user(user)
+        return {'HTTP_AUTHORIZATION': f"Bearer {tokens['access']}"}, tokens
+
+    def request_for(self, name, user):
+        """Build (method, path, kwargs) for a URL name against a seeded user"""
+        today = date.today()
+        month_qs = f'?year={today.year}&month={today.month}'
+        # Reorder payloads are capped so their size doesn't vary with the dataset
+        tx_ids = list(
+            Transaction.objects.filter(user=user).order_by('id').values_list('id', flat=True)[:SMALL_DATASET]
+        )
+        headers, tokens = self.api_auth(user)
+
+        if name in ('login', 'privacy_policy', 'delete_account', 'logout', 'metrics'):
+            return 'get', reverse(name), {}
+        if name == 'check_user':
+            return 'post', reverse(name), {'data': {'phone': PHONE}}
+        if name == 'login_pin':
+            return 'post', reverse(name), {'data': {'pin': '123456'}}
+        if name == 'create_pin':
+            return 'post', reverse(name), {'data': {'pin': '654321', 'confirm_pin': '654321'}}
+        if name == 'send_otp':
+            return 'post', reverse(name), {}
+        if name == 'verify_otp':
+            return 'post', reverse(name), {'data': {'otp': '111111'}}
+        if name in ('setup', 'savings', 'history', 'advisor', 'settings', 'export_data', 'toggle_theme'):
+            return 'get', reverse(name), {}
+        if name in ('dashboard', 'transactions'):
+            return 'get', reverse(name) + month_qs, {}
+        if name == 'save_settings':
+            data = {'income': '5000', 'currency': '$', 'rule_needs': '50',
+                    'rule_wants': '30', 'rule_savings': '20', 'theme': 'dark'}
+            return 'post', reverse(name), {'data': data}
+        if name == 'add_transaction':
+            data = {'description': 'Coffee', 'amount': '5', 'category': 'wants',
+                    'year': today.year, 'month': today.month}
+            return 'post', reverse(name), {'data': data}
+        if name == 'delete_transaction':
+            return 'get', reverse(name, args=[tx_ids[0]]) + month_qs, {}
+        if name == 'confirm_recurring':
+            return 'post', reverse(name), {'data': {'occurrence': self.unconfirmed_key(user)}}
+        if name == 'delete_recurring':
+            rule = RecurringRule.objects.filter(user=user).order_by('id').first()
+            return 'get', reverse(name, args=[rule.id]) + month_qs, {}
+        if name == 'reorder_transactions':
+            body = json.dumps({'order': tx_ids})
+            return 'post', reverse(name), {'data': body, 'content_type': 'application/json'}
+        if name == 'import_data':
+            payload = json.dumps({'income': 100, 'txs': [
+                {'desc': 'Imported', 'amt': 1, 'cat': 'needs', 'date': today.isoformat(), 'order': 0},
+            ]}).encode()
+            upload = SimpleUploadedFile('backup.json', payload, content_type='application/json')
+            return 'post', reverse(name), {'data': {'file': upload}}
+        if name == 'reset_data':
+            return 'post', reverse(name), {}
+
+        json_kwargs = {'content_type': 'application/json'}
+        if name == 'api_send_otp':
+            return 'post', reverse(name), {'data': {'phone': PHONE}, **json_kwargs}
+        if name == 'api_verify_otp':
+            return 'post', reverse(name), {'data': {'phone': PHONE, 'otp': '111111'}, **json_kwargs}
+        if name == 'api_check_status':
+            return 'post', reverse(name), {'data': {'phone': PHONE}, **json_kwargs}
+        if name == 'api_register':
+            return 'post', reverse(name), {'data': {'phone': '9000000001', 'pin': '123456'}, **json_kwargs}
+        if name == 'api_login_pin':
+            return 'post', reverse(name), {'data': {'phone': PHONE, 'pin': '123456'}, **json_kwargs}
+        if name == 'token_refresh':
+            return 'post', reverse(name), {'data': {'refresh': tokens['refresh']}, **json_kwargs}
+        if name == 'api_logout':
+            return 'post', reverse(name), {'data': {'refresh': tokens['refresh']}, **json_kwargs, **headers}
+        if name in ('api_user_profile', 'api_savings'):
+            return 'get', reverse(name), headers
+        if name == 'api_setup_user':
+            return 'post', reverse(name), {'data': {'name': 'Budget', 'income': '100'}, **json_kwargs, **headers}
+        if name == 'api_bootstrap':
+            return 'get', reverse(name), headers
+        if name in ('api_transaction_list', 'api_dashboard'):
+            return 'get', reverse(name) + month_qs, headers
+        if name == 'api_transaction_detail':
+            return 'get', reverse(name, args=[tx_ids[0]]), headers
+        if name == 'api_reorder_transactions':
+            return 'post', reverse(name), {'data': {'order': tx_ids}, **json_kwargs, **headers}
+        if name == 'api_recurring_list':
+            return 'get', reverse(name), headers
+        if name in ('api_recurring_detail', 'api_recurring_confirm'):
+            rule_id, on = recurring.parse_key(self.unconfirmed_key(user))
+            if name == 'api_recurring_detail':
+                return 'get', reverse(name, args=[rule_id]), headers
+            return 'post', reverse(name, args=[rule_id]), {'data': {'date': on.isoformat()}, **json_kwargs, **headers}
+        if name in ('api_reset_data', 'api_toggle_theme'):
+            return 'post', reverse(name), headers
+        if name == 'api_deletion_status':
+            wipe = DeletionRequest.objects.create(user=user, phone=user.phone, kind=DeletionRequest.RESET)
+            return 'get', reverse(name, args=[wipe.id]), headers
+        raise AssertionError(f'No request recipe for URL name {name!r}')
+
+    def unconfirmed_key(self, user):
+        """Key of an occurrence of the user's first rule that is still virtual"""
+        rule = RecurringRule.objects.filter(user=user).order_by('id').first()
+        on = rule.start_date + relativedelta(months=1) if rule.frequency == RecurringRule.MONTHLY else rule.start_date + timedelta(days=7)
+        return recurring.VirtualTransaction(rule, on).key
+
+    def capture(self, name, size):
+        """Run one request for `name` against a fresh dataset of `size` rows"""
+        Transaction.objects.all().delete()
+        User.objects.all().delete()
+        OTP.objects.all().delete()
+        RevokedToken.objects.all().delete()
+        self.client.cookies.clear()
+        cache.clear()
+        revocation.get_filter().might_contain('warm-up')
+
+        user = self.seed(size)
+        self.login_session(user)
+        method, path, kwargs = self.request_for(name, user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(path, **kwargs)
+        self.assertLess(response.status_code, 500, f'{name} returned {response.status_code}')
+        return [q['sql'] for q in ctx.captured_queries]
+
+    def format_failure(self, name, budget, small, large):
+        diff = '\n'.join(difflib.unified_diff(
+            small, large,
+            fromfile=f'{name} ({SMALL_DATASET} transactions)',
+            tofile=f'{name} ({LARGE_DATASET} transactions)',
+            lineterm='',
+        ))
+        listing = '\n'.join(f'  {i}. {sql}' for i, sql in enumerate(large, 1))
+        return (
+            f'\n{name}: budget {budget}, small={len(small)}, large={len(large)} queries\n'
+            f'{diff or "(same SQL at both sizes)"}\n'
+            f'Queries at large size:\n{listing}'
+        )
+
+    def test_every_url_has_a_budget(self):
+        names = {p.name for p in core_urls.urlpatterns if p.name}
+        self.assertEqual(names - set(QUERY_BUDGETS), set(), 'URL names without a query budget')
+        self.assertEqual(set(QUERY_BUDGETS) - names, set(), 'Query budgets for unknown URL names')
+
+    def test_query_budgets(self):
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(url=name):
+                small = self.capture(name, SMALL_DATASET)
+                large = self.capture(name, LARGE_DATASET)
+                message = self.format_failure(name, budget, small, large)
+                self.assertEqual(len(small), len(large), message)
+                self.assertLessEqual(len(large), budget, message)
+
+    def test_deletion_processor(self):
+        """The background half of reset: a fixed number of statements per batch, not per row"""
+        from . import deletion
+        counts = {}
+        for size in (SMALL_DATASET, LARGE_DATASET):
+            User.objects.all().delete()
+            user = self.seed(size)
+            wipe = deletion.schedule(user, DeletionRequest.RESET)  # Queued on commit, which TestCase never runs
+            with override_settings(DELETION={**INLINE_DELETION, 'BATCH_SIZE': 100}):
+                with CaptureQueriesContext(connection) as ctx:
+                    deletion.process(wipe)
+            self.assertEqual(wipe.status, DeletionRequest.DONE)
+            self.assertFalse(Transaction.objects.filter(user=user).exists())
+            counts[size] = len(ctx.captured_queries)
+        # Claim, reload progress, two counts, store total; per batch: select ids, savepoint, delete,
+        # progress, release; detaching the rules' occurrences; bump data_version and finish
+        per_request = 5 + 1 + 2
+        seeded = LARGE_DATASET + LARGE_DATASET // 20  # Plus one confirmed occurrence per rule
+        transaction_batches = -(-seeded // 100)
+        self.assertEqual(counts[SMALL_DATASET], per_request + 2 * 5)
+        self.assertEqual(counts[LARGE_DATASET], per_request + (transaction_batches + 1) * 5)
+
+
+@override_settings(REQUEST_TIMING={'SAMPLE_RATE': 1.0, 'SERVER_TIMING_HEADER': True, 'LOG': True})
+class RequestTimingTests(TestCase):
+    """Server-Timing header and structured log line"""
+
+    def setUp(self):
+        self.user = User.objects.create(phone=PHONE, name='Timing', pin='123456', income=Decimal('1000'))
+        Transaction.objects.create(user=self.user, description='Rent', amount=Decimal('100'),
+                                   category='needs', date=date.today())
+
+    def test_api_request_reports_db_and_serializer_time(self):
+        tokens = get_tokens_for_user(self.user)
+        with self.assertLogs('core.timing', level='INFO') as logs:
+            response = self.client.get(reverse('api_transaction_list'),
+                                       HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        header = response['Server-Timing']
+        self.assertIn('total;dur=', header)
+        self.assertIn('db;dur=', header)
+        self.assertIn('serialize;dur=', header)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['route'], 'api_transaction_list')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['db_queries'], 0)
+
+    def test_page_request_reports_template_time(self):
+        log_in(self.client, self.user)
+        with self.assertLogs('core.timing', level='INFO'):
+            response = self.client.get(reverse('history'))
+        self.assertIn('template;dur=', response['Server-Timing'])
+
+    @override_settings(REQUEST_TIMING={'SAMPLE_RATE': 0.0})
+    def test_unsampled_request_has_no_header(self):
+        response = self.client.get(reverse('privacy_policy'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class MetricsEndpointTests(TestCase):
+    """Prometheus text exposition at /metrics"""
+
+    def test_exposes_route_latency_and_login_counters(self):
+        User.objects.create(phone=PHONE, name='Metrics', pin='123456')
+        self.client.post(reverse('api_login_pin'), {'phone': PHONE, 'pin': '000001'},
+                         content_type='application/json')
+
+        with override_settings(METRICS={'TOKEN': 's3cret'}):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('wealth_http_request_duration_seconds_bucket{le="0.005",route="api_login_pin"}', body)
+        self.assertIn('wealth_http_request_db_queries_count{route="api_login_pin"}', body)
+        self.assertIn('wealth_logins_total{channel="api",result="failure"}', body)
+
+    def test_requires_the_scrape_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        with override_settings(METRICS={'TOKEN': 's3cret'}):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer guess').status_code, 403)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Profiles for sampled and slow requests, with rotation"""
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def profile_files(self):
+        from pathlib import Path
+        return sorted(p.name for p in Path(self.tmp.name).iterdir())
+
+    def test_sampled_requests_write_rotated_prof_files(self):
+        with override_settings(PROFILING={'SAMPLE_RATE': 1.0, 'DIR': self.tmp.name, 'MAX_FILES': 2}):
+            for _ in range(3):
+                self.client.get(reverse('privacy_policy'))
+        files = self.profile_files()
+        self.assertEqual(len(files), 2)
+        self.assertTrue(all(f.endswith('.prof') and '-privacy_policy-' in f for f in files))
+
+    def test_slow_threshold_keeps_collapsed_stacks(self):
+        import time
+        from unittest import mock
+        from . import views
+
+        def slow_render(*args, **kwargs):
+            time.sleep(0.05)
+            return render(*args, **kwargs)
+
+        render = views.render
+        config = {'SLOW_REQUEST_MS': 20, 'SAMPLE_INTERVAL_MS': 1, 'DIR': self.tmp.name}
+        with override_settings(PROFILING=config), mock.patch.object(views, 'render', slow_render):
+            self.client.get(reverse('privacy_policy'))
+            self.client.get(reverse('logout'))
+        files = self.profile_files()
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].endswith('.collapsed'))
+        self.assertIn('-privacy_policy-', files[0])
+
+    def test_header_ignored_without_staff_or_token(self):
+        with override_settings(PROFILING={'DIR': self.tmp.name}):
+            self.client.get(reverse('privacy_policy'), HTTP_X_PROFILE='1')
+        self.assertEqual(self.profile_files(), [])
+
+
+class ReplayParserTests(TestCase):
+    """Access log and JSONL parsing for replay_traffic"""
+
+    def test_parses_dev_server_log_and_jsonl_capture(self):
+        import tempfile
+        from pathlib import Path
+        from .replay import load_entries, route_name
+
+        with tempfile.TemporaryDirectory() as tmp:
+            log = Path(tmp) / 'server_log.txt'
+            log.write_bytes(
+                b'Watching for file changes with StatReloader\r\n'
+                b'[06/Jan/2026 14:19:14] "POST /api/auth/check-status/ HTTP/1.1" 200 15\r\n'
+                b'Unauthorized: /api/auth/login-pin/\r\n'
+                b'[06/Jan/2026 14:19:21] "POST /api/auth/login-pin/ HTTP/1.1" 401 23\r\n'
+            )
+            capture = Path(tmp) / 'capture.jsonl'
+            capture.write_text(
+                '{"method": "get", "path": "/api/dashboard/?year=2026&month=1", "timestamp": "2026-01-06T14:19:15"}\n'
+                '{"request_id": "not-a-request"}\n'
+            )
+            entries = load_entries([log, capture])
+
+        self.assertEqual([(e.method, route_name(e.path)) for e in entries], [
+            ('POST', 'api_check_status'),
+            ('GET', 'api_dashboard'),
+            ('POST', 'api_login_pin'),
+        ])
+
+
+class FastJSONRendererTests(TestCase):
+    """orjson-backed renderer must match DRF's JSONRenderer byte for byte"""
+
+    def test_matches_stock_renderer(self):
+        from datetime import datetime, timezone as dt_timezone
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import FastJSONRenderer
+
+        data = {
+            'amount': Decimal('1234.50'),
+            'when': date(2026, 1, 6),
+            'created_at': datetime(2026, 1, 6, 8, 30, 1, 123456, tzinfo=dt_timezone.utc),
+            'text': 'Rent ₹ line break',
+            'by_month': {1: Decimal('0'), 2: 3.5},
+            'items': [None, True, 0, 'x'],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_parser_round_trip(self):
+        import io
+        from .renderers import FastJSONParser
+
+        parsed = FastJSONParser().parse(io.BytesIO('{"a": [1, "₹"]}'.encode()))
+        self.assertEqual(parsed, {'a': [1, '₹']})
+
+
+class MessagePackNegotiationTests(TestCase):
+    """Accept/Content-Type negotiation of application/msgpack on the API"""
+
+    def setUp(self):
+        self.user = User.objects.create(phone=PHONE, name='Pack', pin='123456', income=Decimal('2500.00'))
+        Transaction.objects.create(user=self.user, description='Rent', amount=Decimal('1234.50'),
+                                   category='needs', date=date.today())
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(self.user)['access']}"}
+
+    def unpack(self, response):
+        from .renderers import MessagePackParser
+        import io
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        return MessagePackParser().parse(io.BytesIO(response.content))
+
+    def test_transaction_list_matches_json(self):
+        url = reverse('api_transaction_list')
+        as_json = self.client.get(url, **self.auth).json()
+        packed = self.client.get(url, HTTP_ACCEPT='application/msgpack', **self.auth)
+
+        rows = self.unpack(packed)
+        self.assertEqual(rows[0]['amount'], Decimal('1234.50'))
+        self.assertEqual([{**row, 'amount': str(row['amount'])} for row in rows], as_json)
+        self.assertLess(len(packed.content), len(json.dumps(as_json)))
+
+    def test_empty_list_keeps_column_layout(self):
+        from .renderers import TABLE_EXT_TYPE
+        import msgpack
+
+        response = self.client.get(reverse('api_transaction_list') + '?year=2001&month=1',
+                                   HTTP_ACCEPT='application/msgpack', **self.auth)
+        ext = msgpack.unpackb(response.content)
+        self.assertEqual(ext.code, TABLE_EXT_TYPE)
+        columns, scales, rows = msgpack.unpackb(ext.data)
+        self.assertEqual(columns, ['id', 'description', 'amount', 'category', 'date', 'order', 'recurring_rule', 'created_at'])
+        self.assertEqual(scales[2], 2)
+        self.assertEqual(rows, [])
+
+    def test_dashboard_and_msgpack_request_body(self):
+        import msgpack
+
+        body = msgpack.packb({'description': 'Coffee', 'amount': 4.5, 'category': 'wants',
+                              'date': date.today().isoformat()})
+        created = self.client.post(reverse('api_transaction_list'), body, content_type='application/msgpack',
+                                   HTTP_ACCEPT='application/msgpack', **self.auth)
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(self.unpack(created)['amount'], Decimal('4.50'))
+
+        summary = self.unpack(self.client.get(reverse('api_dashboard'), HTTP_ACCEPT='application/msgpack', **self.auth))
+        self.assertEqual(summary['total_spent'], Decimal('1239.00'))
+        self.assertEqual(summary['user']['income'], Decimal('2500.00'))
+        self.assertEqual(len(summary['transactions']), 2)
+
+    def test_decimals_are_exact_in_every_shape(self):
+        import io
+        from .renderers import MessagePackParser, MessagePackRenderer
+
+        tx = Transaction.objects.create(user=self.user, description='Gum', amount=Decimal('0.10'),
+                                        category='wants', date=date.today())
+        single = self.unpack(self.client.get(reverse('api_transaction_detail', args=[tx.pk]),
+                                             HTTP_ACCEPT='application/msgpack', **self.auth))
+        rows = self.unpack(self.client.get(reverse('api_transaction_list'), HTTP_ACCEPT='application/msgpack',
+                                           **self.auth))
+        self.assertEqual(repr(single['amount']), "Decimal('0.10')")
+        self.assertIn(single, rows)
+
+        values = {'a': Decimal('0.10'), 'b': Decimal('0.2'), 'c': Decimal('-70.30'), 'd': Decimal('1E+3')}
+        parsed = MessagePackParser().parse(io.BytesIO(MessagePackRenderer().render(values)))
+        self.assertEqual({k: repr(v) for k, v in parsed.items()},
+                         {'a': "Decimal('0.10')", 'b': "Decimal('0.2')", 'c': "Decimal('-70.30')", 'd': "Decimal('1000')"})
+
+
+    def test_error_responses(self):
+        invalid = self.client.post(reverse('api_transaction_list'), {'description': 'Coffee', 'amount': 'lots'},
+                                   content_type='application/json', HTTP_ACCEPT='application/msgpack', **self.auth)
+        self.assertEqual(invalid.status_code, 400)
+        self.assertIn('amount', self.unpack(invalid))
+
+        missing = self.client.get(reverse('api_transaction_detail', args=[999999]), HTTP_ACCEPT='application/msgpack',
+                                  **self.auth)
+        self.assertEqual(missing.status_code, 404)
+        unauthenticated = self.client.get(reverse('api_transaction_list'), HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(unauthenticated.status_code, 401)
+        self.assertIsInstance(self.unpack(unauthenticated)['detail'], str)
+
+
+class FastTransactionSerializerTests(TestCase):
+    """values_list()-based serializer must match TransactionSerializer exactly"""
+
+    def test_output_is_byte_identical(self):
+        from datetime import datetime, timezone as dt_timezone
+        from .renderers import FastJSONRenderer
+        from .serializers import FastTransactionSerializer, TransactionSerializer
+
+        user = User.objects.create(phone=PHONE, name='Parity')
+        amounts = ['0.01', '5', '1234.50', '9999999999.99', '70.10']
+        for i, amount in enumerate(amounts):
+            tx = Transaction.objects.create(user=user, description=f'Tx ₹ "{i}"', amount=Decimal(amount),
+                                            category=['needs', 'wants', 'savings', 'income', 'needs'][i],
+                                            date=date(2026, 1, i + 1), order=i)
+        # created_at across a UTC day boundary, rendered in the local TIME_ZONE
+        Transaction.objects.filter(pk=tx.pk).update(created_at=datetime(2026, 1, 5, 23, 59, 59, 5, tzinfo=dt_timezone.utc))
+
+        queryset = Transaction.objects.filter(user=user).order_by('order')
+        stock = TransactionSerializer(queryset.all(), many=True).data
+        fast = FastTransactionSerializer(queryset.all()).data
+        self.assertEqual(fast, stock)
+        self.assertEqual(FastJSONRenderer().render(fast), FastJSONRenderer().render(stock))
+
+
+class CompressionMiddlewareTests(TestCase):
+    """Accept-Encoding negotiation, thresholds and streaming"""
+
+    def setUp(self):
+        self.user = User.objects.create(phone=PHONE, name='Compress', pin='123456', income=Decimal('5000'))
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, description=f'Groceries {i}', amount=Decimal('12.50'),
+                        category='needs', date=date.today(), order=i)
+            for i in range(60)
+        ])
+        tokens = get_tokens_for_user(self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {tokens['access']}"}
+
+    @override_settings(REQUEST_TIMING={'SAMPLE_RATE': 1.0})
+    def test_gzip_round_trip_and_timing_counters(self):
+        import gzip
+        plain = self.client.get(reverse('api_transaction_list'), **self.auth)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        with self.assertLogs('core.timing', level='INFO') as logs:
+            response = self.client.get(reverse('api_transaction_list'), HTTP_ACCEPT_ENCODING='gzip, br;q=0', **self.auth)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(json.loads(gzip.decompress(response.content)), plain.json())
+        self.assertIn('compress;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertGreater(record['compress_bytes_saved'], 0)
+
+    def test_brotli_preferred_when_installed(self):
+        from . import compression
+        if compression.brotli is None:
+            self.skipTest('brotli not installed')
+        response = self.client.get(reverse('api_transaction_list'), HTTP_ACCEPT_ENCODING='gzip, deflate, br', **self.auth)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(len(json.loads(compression.brotli.decompress(response.content))), 60)
+
+    def test_small_and_precompressed_responses_untouched(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .middleware import CompressionMiddleware
+
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        small = CompressionMiddleware(lambda r: HttpResponse('ok'))(request)
+        self.assertNotIn('Content-Encoding', small)
+        image = CompressionMiddleware(lambda r: HttpResponse(b'\x89PNG' * 1000, content_type='image/png'))(request)
+        self.assertNotIn('Content-Encoding', image)
+
+    def test_streaming_response_is_compressed_incrementally(self):
+        import gzip
+        from django.http import StreamingHttpResponse
+        from django.test import RequestFactory
+        from .middleware import CompressionMiddleware
+
+        rows = [f'{{"row": {i}}}\n'.encode() for i in range(500)]
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = CompressionMiddleware(lambda r: StreamingHttpResponse(iter(rows)))(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(rows))
+
+
+class RecurringTransactionTests(TestCase):
+    """Rules expand into virtual rows per month and are stored only when confirmed or edited"""
+
+    def setUp(self):
+        self.user = User.objects.create(phone=PHONE, name='Recurring', pin='123456', income=Decimal('1000'))
+        tokens = get_tokens_for_user(self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {tokens['access']}"}
+
+    def test_occurrences_clamp_to_month_end_and_respect_bounds(self):
+        monthly = RecurringRule(description='Rent', amount=Decimal('1'), category='needs',
+                                frequency=RecurringRule.MONTHLY, start_date=date(2026, 1, 31))
+        self.assertEqual(recurring.occurrences(monthly, 2026, 2), [date(2026, 2, 28)])
+        self.assertEqual(recurring.occurrences(monthly, 2025, 12), [])
+
+        weekly = RecurringRule(description='Gym', amount=Decimal('1'), category='wants',
+                               frequency=RecurringRule.WEEKLY, start_date=date(2026, 3, 10),
+                               end_date=date(2026, 3, 24))
+        self.assertEqual(recurring.occurrences(weekly, 2026, 3), [date(2026, 3, 10), date(2026, 3, 17), date(2026, 3, 24)])
+
+    def test_dashboard_counts_virtual_rows_until_confirmed(self):
+        today = date.today()
+        rule = RecurringRule.objects.create(user=self.user, description='Rent', amount=Decimal('300'),
+                                            category='needs', start_date=today.replace(day=1))
+        url = reverse('api_dashboard') + f'?year={today.year}&month={today.month}'
+
+        before = self.client.get(url, **self.auth).json()
+        self.assertEqual(before['transactions'], [])
+        self.assertEqual([r['key'] for r in before['recurring']], [f'{rule.id}:{today.replace(day=1).isoformat()}'])
+        self.assertEqual(before['balance'], 700)
+        self.assertFalse(Transaction.objects.exists())
+
+        response = self.client.post(reverse('api_recurring_confirm', args=[rule.id]),
+                                    {'date': today.replace(day=1).isoformat()}, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['recurring_rule'], rule.id)
+
+        after = self.client.get(url, **self.auth).json()
+        self.assertEqual(after['recurring'], [])
+        self.assertEqual(len(after['transactions']), 1)
+        self.assertEqual(after['balance'], 700)
+
+    def test_web_add_repeat_and_edit_occurrence(self):
+        log_in(self.client, self.user)
+        today = date.today()
+        form = {'description': 'Netflix', 'amount': '15', 'category': 'wants', 'year': today.year, 'month': today.month}
+
+        self.client.post(reverse('add_transaction'), {**form, 'repeat': 'monthly'})
+        rule = RecurringRule.objects.get(user=self.user)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(views.calculate_monthly_balance(self.user, today.year, today.month), Decimal('985'))
+
+        key = recurring.VirtualTransaction(rule, today).key
+        self.client.post(reverse('add_transaction'), {**form, 'amount': '18', 'occurrence': key})
+        tx = Transaction.objects.get(recurring_rule=rule)
+        self.assertEqual((tx.date, tx.amount), (today, Decimal('18')))
+        self.assertEqual(views.calculate_monthly_balance(self.user, today.year, today.month), Decimal('982'))
+
+        # Next month still shows the rule's own amount
+        next_month = today + relativedelta(months=1)
+        self.assertEqual(views.calculate_monthly_balance(self.user, next_month.year, next_month.month), Decimal('985'))
+
+    def test_schedule_is_fixed_once_occurrences_are_confirmed(self):
+        first = date.today().replace(day=1)
+        rule = RecurringRule.objects.create(user=self.user, description='Rent', amount=Decimal('300'),
+                                            category='needs', start_date=first)
+        url = reverse('api_recurring_detail', args=[rule.id])
+        put = lambda data: self.client.put(url, data, content_type='application/json', **self.auth)
+        self.assertEqual(put({'start_date': (first + timedelta(days=1)).isoformat()}).status_code, 200)
+
+        rule.refresh_from_db()
+        recurring.materialize(rule, first + timedelta(days=1))
+        moved = put({'start_date': (first + timedelta(days=2)).isoformat(), 'frequency': 'weekly'})
+        self.assertEqual(moved.status_code, 400)
+        self.assertEqual(set(moved.json()), {'start_date', 'frequency'})
+        self.assertEqual(put({'amount': '250.00', 'end_date': (first + timedelta(days=40)).isoformat()}).status_code, 200)
+        self.assertEqual(views.calculate_monthly_balance(self.user, first.year, first.month), Decimal('700'))
+
+
+class ForecastingTests(TestCase):
+    """Month-end projections from past daily spend curves"""
+
+    def add(self, user, on, category, amount):
+        Transaction.objects.create(user=user, description='Tx', amount=Decimal(amount), category=category, date=on)
+
+    def test_projection_follows_past_spending_curve(self):
+        from . import forecasting
+
+        user = User.objects.create(phone=PHONE, name='Curve', income=Decimal('3000'))
+        # February: rent on the 1st, groceries every day
+        self.add(user, date(2026, 2, 1), 'needs', '1000')
+        for day in range(1, 29):
+            self.add(user, date(2026, 2, day), 'wants', '10')
+        # March so far: rent paid, ten days of groceries
+        self.add(user, date(2026, 3, 1), 'needs', '1000')
+        for day in range(1, 11):
+            self.add(user, date(2026, 3, day), 'wants', '10')
+
+        forecast = forecasting.forecast_user(user, date(2026, 3, 10))
+        self.assertEqual(forecast.history_months, 1)
+        self.assertEqual(forecast.spent, {'needs': Decimal('1000.00'), 'wants': Decimal('100.00'), 'savings': Decimal('0.00')})
+        self.assertEqual(forecast.projected['needs'], Decimal('1000.00'))  # rent doesn't recur later in the month
+        self.assertEqual(forecast.projected['wants'], Decimal('280.00'))   # 100 so far + 18 more days seen in February
+
+        newcomer = User.objects.create(phone='9000000002', name='New', income=Decimal('3000'))
+        self.add(newcomer, date(2026, 3, 5), 'wants', '50')
+        linear = forecasting.forecast_user(newcomer, date(2026, 3, 10))
+        self.assertEqual(linear.projected['wants'], Decimal('155.00'))  # 50 over 10 of 31 days
+
+        batch = forecasting.forecast_all(date(2026, 3, 10))
+        self.assertEqual(set(batch), {user.id, newcomer.id})
+        self.assertEqual(batch[user.id].projected, forecast.projected)
+        self.assertEqual(batch[newcomer.id].projected, linear.projected)
+
+    def test_unconfirmed_occurrences_count_as_spend(self):
+        from . import forecasting
+
+        user = User.objects.create(phone=PHONE, name='Rent', income=Decimal('3000'))
+        rule = RecurringRule.objects.create(user=user, description='Rent', amount=Decimal('900'),
+                                            category='needs', start_date=date(2026, 2, 5))
+        recurring.materialize(rule, date(2026, 2, 5))   # February confirmed, March not yet
+
+        forecast = forecasting.forecast_user(user, date(2026, 3, 10))
+        self.assertEqual(forecast.history_months, 1)
+        self.assertEqual(forecast.spent['needs'], Decimal('900.00'))
+        self.assertEqual(forecast.projected['needs'], Decimal('900.00'))
+        self.assertEqual(forecasting.forecast_all(date(2026, 3, 10))[user.id].projected, forecast.projected)
+
+    def test_forecast_report_command(self):
+        import io
+        from django.core.management import call_command
+
+        user = User.objects.create(phone=PHONE, name='Report', income=Decimal('100'))
+        self.add(user, date(2026, 3, 2), 'wants', '60')
+        out, err = io.StringIO(), io.StringIO()
+        call_command('forecast_report', '--date', '2026-03-10', '--over-budget', stdout=out, stderr=err)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{user.id},{PHONE},100.00,10,0,'))
+
+
+class AdvisorEngineTests(TestCase):
+    """Advice rules run over shared aggregates and are cached per data version"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(phone=PHONE, name='Advisor', income=Decimal('1000'))
+        self.today = date.today()
+        Transaction.objects.create(user=self.user, description='Shoes', amount=Decimal('600'),
+                                   category='wants', date=self.today)
+
+    def titles(self, result):
+        return [a['title'] for a in result.advice]
+
+    def test_registered_rule_runs_without_view_changes(self):
+        calls = []
+
+        @advisor.aggregate('test_calls')
+        def counted(ctx):
+            calls.append(ctx.month)
+            return len(calls)
+
+        @advisor.rule('month_totals', 'test_calls')
+        def big_spender(ctx, month_totals, test_calls):
+            if month_totals.categories['wants'] > 500:
+                return {'type': 'info', 'title': 'Big Spender', 'text': 'Test rule'}
+
+        @advisor.rule('test_calls')
+        def second(ctx, test_calls):
+            return None
+
+        try:
+            result = advisor.advise(self.user, self.today.year, self.today.month, use_cache=False)
+            self.assertIn('Big Spender', self.titles(result))
+            self.assertIn('⚠️ Wants Alert', self.titles(result))
+            self.assertEqual(len(calls), 1)  # computed once for both rules
+        finally:
+            advisor.RULES[:] = [r for r in advisor.RULES if r[0] not in (big_spender, second)]
+            del advisor.AGGREGATES['test_calls']
+
+    def test_setup_rule_stops_evaluation(self):
+        self.user.income = Decimal('0')
+        result = advisor.advise(self.user, self.today.year, self.today.month, use_cache=False)
+        self.assertEqual(self.titles(result), ['⚠️ Setup Required'])
+
+    def test_cache_follows_data_version(self):
+        first = advisor.advise(self.user, self.today.year, self.today.month)
+        self.assertIn('💡 Savings Tip', self.titles(first))
+        Transaction.objects.create(user=self.user, description='Pension', amount=Decimal('100'),
+                                   category='savings', date=self.today)
+
+        stale = advisor.advise(self.user, self.today.year, self.today.month)
+        self.assertEqual(self.titles(stale), self.titles(first))
+
+        self.user.bump_data_version()
+        # The bump keeps the new version, so: forecast daily totals and rules, month totals,
+        # confirmed occurrences and rules
+        with self.assertNumQueries(5):
+            fresh = advisor.advise(self.user, self.today.year, self.today.month)
+        self.assertNotIn('💡 Savings Tip', self.titles(fresh))
+
+
+class StatementTests(TestCase):
+    """generate_statements builds chunked, resumable statement files"""
+
+    def test_chunks_match_views_and_resume(self):
+        import io
+        import os
+        import tempfile
+        from django.core.management import call_command
+
+        month = date(2026, 3, 1)
+        users = []
+        for i in range(5):
+            user = User.objects.create(phone=f'90000000{i:02d}', name=f'User {i}', income=Decimal('1000'))
+            Transaction.objects.create(user=user, description='Rent', amount=Decimal('400') + i,
+                                       category='needs', date=month)
+            Transaction.objects.create(user=user, description='Bonus', amount=Decimal('50'),
+                                       category='income', date=month - relativedelta(months=1))
+            users.append(user)
+        RecurringRule.objects.create(user=users[0], description='Gym', amount=Decimal('30'), category='wants',
+                                     frequency=RecurringRule.MONTHLY, start_date=date(2026, 1, 15))
+
+        with tempfile.TemporaryDirectory() as directory:
+            args = ['--month', '2026-03', '--output', directory, '--chunk-size', '2', '--workers', '0']
+            call_command('generate_statements', *args, stdout=io.StringIO(), stderr=io.StringIO())
+            files = sorted(f for f in os.listdir(directory) if f.endswith('.jsonl'))
+            self.assertEqual(len(files), 3)
+
+            rows = []
+            for name in files:
+                with open(os.path.join(directory, name)) as f:
+                    rows.extend(json.loads(line) for line in f)
+            self.assertEqual([r['user_id'] for r in rows], [u.id for u in users])
+            for user, row in zip(users, rows):
+                self.assertEqual(Decimal(row['balance']), views.calculate_monthly_balance(user, 2026, 3))
+            self.assertEqual(rows[0]['categories']['wants']['spent'], '30.00')
+            self.assertEqual([h['month'] for h in rows[0]['history']], ['2026-03', '2026-02', '2026-01'])
+
+            # An interrupted run only rebuilds the missing chunk
+            os.remove(os.path.join(directory, files[1]))
+            err = io.StringIO()
+            call_command('generate_statements', *args, stdout=io.StringIO(), stderr=err)
+            self.assertIn('3 chunks, 2 already done', err.getvalue())
+            self.assertEqual(len([f for f in os.listdir(directory) if f.endswith('.jsonl')]), 3)
+
+
+class FragmentCacheTests(TestCase):
+    """Cached page sections skip their queries until the user's data changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(phone=PHONE, name='Fragments', income=Decimal('1000'))
+        Transaction.objects.create(user=self.user, description='Rent', amount=Decimal('400'),
+                                   category='needs', date=date.today())
+        log_in(self.client, self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # CSRF tokens are re-masked on every render
+        return len(ctx.captured_queries), re.sub(r'value="[\w-]{64}"', '', response.content.decode())
+
+    def test_hits_skip_queries_and_writes_invalidate(self):
+        for name in ('history', 'savings', 'transactions'):
+            with self.subTest(page=name):
+                cold, first = self.count_queries(reverse(name))
+                warm, second = self.count_queries(reverse(name))
+                self.assertLess(warm, cold)
+                self.assertEqual(first, second)
+
+        _, before = self.count_queries(reverse('history'))
+        self.assertIn('$600.00', before)
+        today = date.today()
+        self.client.post(reverse('add_transaction'), {'description': 'Bonus', 'amount': '250', 'category': 'income',
+                                                      'year': today.year, 'month': today.month})
+        _, after = self.count_queries(reverse('history'))
+        self.assertIn('$1,250.00', after)
+        self.assertIn('$850.00', after)
+
+
+class StaticFilesTests(TestCase):
+    """collectstatic output is served precompressed with far-future caching"""
+
+    def test_hashed_precompressed_assets(self):
+        import io
+        import os
+        import tempfile
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        from django.core.management import call_command
+
+        fast = {'GZIP_LEVEL': 1, 'BROTLI_QUALITY': 1}
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root, STATIC_ASSETS=fast):
+            call_command('collectstatic', interactive=False, verbosity=0, stdout=io.StringIO())
+            hashed = staticfiles_storage.stored_name('css/style.css')
+            self.assertNotEqual(hashed, 'css/style.css')
+            self.assertTrue(os.path.exists(os.path.join(root, hashed + '.gz')))
+
+            response = self.client.get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+            body = b''.join(response.streaming_content)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+            self.assertEqual(int(response['Content-Length']), len(body))
+            with open(os.path.join(root, hashed), 'rb') as f:
+                self.assertEqual(gzip.decompress(body), f.read())
+
+            revalidate = self.client.get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip',
+                                         HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(revalidate.status_code, 304)
+
+            self.assertEqual(self.client.get(f'/static/{hashed}.gz').status_code, 404)
+
+            plain = self.client.get('/static/css/style.css')
+            plain.close()
+            self.assertNotIn('Content-Encoding', plain)
+            self.assertEqual(plain['Cache-Control'], 'public, max-age=60')
+
+    def test_missing_manifest_is_logged_outside_debug(self):
+        import tempfile
+        from .staticfiles import CompressedManifestStaticFilesStorage
+
+        with tempfile.TemporaryDirectory() as root:
+            with self.settings(DEBUG=True), self.assertNoLogs('core.staticfiles'):
+                self.assertEqual(CompressedManifestStaticFilesStorage(location=root).stored_name('app.js'), 'app.js')
+            storage = CompressedManifestStaticFilesStorage(location=root)
+            with self.assertLogs('core.staticfiles', level='ERROR') as logs:
+                self.assertEqual(storage.stored_name('app.js'), 'app.js')
+                storage.stored_name('app.css')
+            self.assertEqual(len(logs.records), 1)
+
+
+class WealthUserMiddlewareTests(TestCase):
+    """Web pages read the session from a cookie and load the user once"""
+
+    def test_one_user_query_and_stale_sessions_redirect(self):
+        user = User.objects.create(phone=PHONE, name='Cookie', income=Decimal('1000'))
+        log_in(self.client, user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('settings'))
+        self.assertEqual(response.status_code, 200)
+        user_queries = [q['sql'] for q in ctx.captured_queries if 'FROM "core_user"' in q['sql']]
+        self.assertEqual(len(user_queries), 1)
+        self.assertFalse(any('django_session' in q['sql'] for q in ctx.captured_queries))
+
+        user.delete()
+        self.assertRedirects(self.client.get(reverse('history')), reverse('login'), fetch_redirect_response=False)
+
+
+class MemoryProvider(otp_delivery.SMSProvider):
+    """Sent messages are kept in MemoryProvider.outbox"""
+    name = 'memory'
+    outbox = []
+
+    def send(self, message):
+        self.outbox.append(message)
+        return f'memory-{len(self.outbox)}'
+
+
+class TimeoutProvider(otp_delivery.SMSProvider):
+    """Gateway that delivers, so the user verifies the code, but then times out"""
+    name = 'timeout'
+    calls = 0
+
+    def send(self, message):
+        TimeoutProvider.calls += 1
+        OTP.objects.filter(pk=message.otp_id).update(is_verified=True)
+        raise otp_delivery.DeliveryError('gateway timeout')
+
+
+class FlakyProvider(otp_delivery.SMSProvider):
+    """Slow gateway that fails each number's first attempt"""
+    name = 'flaky'
+    seen = set()
+    sent = []
+
+    def send(self, message):
+        time.sleep(0.2)
+        if message.phone not in self.seen:
+            self.seen.add(message.phone)
+            raise otp_delivery.DeliveryError('gateway timeout')
+        if message.phone.endswith('0000'):
+            raise otp_delivery.DeliveryError('invalid number', retryable=False)
+        self.sent.append(message)
+        return f'flaky-{len(self.sent)}'
+
+
+class OTPDeliveryTests(TransactionTestCase):
+    """send_otp queues the SMS; a background worker sends, retries and records status"""
+
+    @override_settings(OTP_DELIVERY={'PROVIDER': 'core.tests.FlakyProvider', 'BACKOFF': 0.01, 'BATCH_WAIT': 0.01})
+    def test_send_otp_returns_before_slow_provider(self):
+        FlakyProvider.seen.clear()
+        FlakyProvider.sent.clear()
+        started = time.perf_counter()
+        response = self.client.post(reverse('api_send_otp'), {'phone': PHONE}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.perf_counter() - started, 0.2)
+        self.assertEqual(OTP.objects.get(phone=PHONE).delivery_status, OTP.QUEUED)
+
+        self.client.post(reverse('api_send_otp'), {'phone': '9999990000'}, content_type='application/json')
+        self.assertTrue(otp_delivery.flush(timeout=5))
+
+        sent = OTP.objects.get(phone=PHONE)
+        self.assertEqual((sent.delivery_status, sent.delivery_attempts), (OTP.SENT, 2))
+        self.assertEqual(sent.provider_message_id, 'flaky-1')
+        self.assertIn(sent.code, FlakyProvider.sent[0].text)
+        failed = OTP.objects.get(phone='9999990000')
+        self.assertEqual((failed.delivery_status, failed.delivery_attempts), (OTP.FAILED, 2))
+        self.assertEqual(failed.delivery_error, 'invalid number')
+
+    @override_settings(OTP_DELIVERY=MEMORY_OTP_DELIVERY)
+    def test_inline_delivery_uses_memory_outbox(self):
+        MemoryProvider.outbox.clear()
+        otp = OTP.generate_otp(PHONE)
+        otp_delivery.dispatch(otp)
+        otp.refresh_from_db()
+        self.assertEqual(otp.delivery_status, OTP.SENT)
+        self.assertEqual([m.phone for m in MemoryProvider.outbox], [PHONE])
+
+    @override_settings(OTP_DELIVERY={'PROVIDER': 'core.tests.TimeoutProvider', 'ASYNC': False})
+    def test_used_code_is_not_retried(self):
+        TimeoutProvider.calls = 0
+        otp = OTP.generate_otp(PHONE)
+        otp_delivery.dispatch(otp)
+        self.assertEqual(TimeoutProvider.calls, 1)
+        otp.refresh_from_db()
+        self.assertEqual((otp.delivery_status, otp.delivery_attempts), (OTP.QUEUED, 1))
+
+
+@override_settings(TOKEN_REVOCATION=QUIET_REVOCATION)
+class TokenRevocationTests(TestCase):
+    """Refresh rotation and logout revoke tokens; unrevoked ones are cleared by the Bloom filter"""
+
+    def setUp(self):
+        self.user = User.objects.create(phone=PHONE, name='Revoke', pin='123456', income=Decimal('1000'))
+        self.tokens = get_tokens_for_user(self.user)
+
+    def refresh(self, token):
+        return self.client.post(reverse('token_refresh'), {'refresh': token}, content_type='application/json')
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = revocation.BloomFilter(1000, 0.01)
+        members = [f'jti-{i}' for i in range(1000)]
+        for jti in members:
+            bloom.add(jti)
+        self.assertTrue(all(jti in bloom for jti in members))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_refresh_token_is_single_use(self):
+        response = self.refresh(self.tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(response.json()['refresh']).status_code, 200)
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {self.tokens['access']}"}
+        self.assertEqual(self.client.get(reverse('api_user_profile'), **auth).status_code, 200)
+        response = self.client.post(reverse('api_logout'), {'refresh': self.tokens['refresh']},
+                                    content_type='application/json', **auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(RevokedToken.objects.count(), 2)
+        self.assertEqual(self.client.get(reverse('api_user_profile'), **auth).status_code, 401)
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+
+    def test_unrevoked_check_costs_no_query(self):
+        revocation.get_filter().might_contain('warm-up')
+        with self.assertNumQueries(0):
+            self.assertFalse(revocation.is_revoked('never-revoked'))
+
+    def test_other_processes_revocations_are_synced(self):
+        from django.utils import timezone
+        from rest_framework_simplejwt.tokens import RefreshToken
+        revocation.get_filter().might_contain('warm-up')
+        token = RefreshToken(self.tokens['refresh'])
+        # As if revoked by another worker: in the table but not this process's filter
+        RevokedToken.objects.create(jti=token['jti'], token_type='refresh', expires_at=timezone.now() + timedelta(days=1))
+        self.assertFalse(revocation.get_filter().might_contain(token['jti']))
+        with override_settings(TOKEN_REVOCATION={'SYNC_INTERVAL': 0}):
+            self.assertTrue(revocation.is_revoked(token['jti']))
+
+    def test_rows_committed_out_of_id_order_are_synced(self):
+        from django.utils import timezone
+        expires_at = timezone.now() + timedelta(days=1)
+        bloom_filter = revocation.get_filter()
+        bloom_filter.might_contain('warm-up')
+        late = RevokedToken.objects.create(jti='late', token_type='access', expires_at=expires_at)
+        seen = RevokedToken.objects.create(jti='seen', token_type='access', expires_at=expires_at)
+        # A sync ran after `seen` committed but before `late`, which has the lower id, did
+        bloom_filter.bloom.add('seen')
+        bloom_filter.last_id = seen.id
+        bloom_filter.sync()
+        self.assertIn(late.jti, bloom_filter.bloom)
+
+    def test_compaction_drops_expired_rows(self):
+        from django.core.management import call_command
+        from django.utils import timezone
+        import io
+        now = timezone.now()
+        RevokedToken.objects.create(jti='expired', token_type='access', expires_at=now - timedelta(seconds=1))
+        RevokedToken.objects.create(jti='live', token_type='access', expires_at=now + timedelta(days=1))
+        out = io.StringIO()
+        call_command('compact_revocations', stdout=out)
+        self.assertIn('Deleted 1', out.getvalue())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+        revocation.get_filter().rebuild()
+        self.assertFalse(revocation.is_revoked('expired'))
+        self.assertTrue(revocation.is_revoked('live'))
+
+
+class IdempotencyKeyTests(TestCase):
+    """POSTs with an Idempotency-Key run once; replays get the stored response"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(phone=PHONE, name='Idem', pin='123456', income=Decimal('1000'))
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(self.user)['access']}"}
+
+    def post(self, data, key):
+        data = {'date': date.today().isoformat(), **data}
+        return self.client.post(reverse('api_transaction_list'), data, content_type='application/json',
+                                HTTP_IDEMPOTENCY_KEY=key, **self.auth)
+
+    def test_replay_returns_first_response_without_rerunning(self):
+        data = {'description': 'Rent', 'amount': '100.00', 'category': 'needs'}
+        first = self.post(data, 'key-1')
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(1):  # Authentication only
+            replay = self.post(data, 'key-1')
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+        self.assertEqual(self.post(data, 'key-2').status_code, 201)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+
+    def test_key_reused_for_different_request_is_rejected(self):
+        self.post({'description': 'Rent', 'amount': '100.00', 'category': 'needs'}, 'key-1')
+        response = self.post({'description': 'Food', 'amount': '5.00', 'category': 'needs'}, 'key-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+    def test_errors_are_replayed_but_not_server_errors(self):
+        too_much = {'description': 'TV', 'amount': '5000.00', 'category': 'wants'}
+        self.assertEqual(self.post(too_much, 'key-1').status_code, 400)
+        self.assertEqual(self.post(too_much, 'key-1')['Idempotent-Replayed'], 'true')
+
+    def test_anonymous_keys_are_scoped_by_phone_and_short_lived(self):
+        from unittest import mock
+        from django.core.cache import caches
+        register = lambda phone: self.client.post(reverse('api_register'), {'phone': phone, 'pin': '654321'},
+                                                  content_type='application/json', HTTP_IDEMPOTENCY_KEY='key-1')
+        store = caches['default']
+        with mock.patch.object(store, 'set', wraps=store.set) as store_set:
+            first = register('9000000001')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(store_set.call_args.args[2], 5 * 60)
+        second = register('9000000002')
+        self.assertNotIn('Idempotent-Replayed', second)
+        self.assertNotEqual(second.json()['tokens'], first.json()['tokens'])
+        self.assertEqual(register('9000000001')['Idempotent-Replayed'], 'true')
+
+    def test_duplicate_waits_for_in_flight_request(self):
+        from . import idempotency
+        from unittest import mock
+        import threading
+        request = mock.Mock(auth={'user_id': self.user.id})
+        key = idempotency.cache_key(request, 'key-1')
+        config = {**idempotency.get_idempotency_settings(), 'WAIT_TIMEOUT': 2, 'POLL_INTERVAL': 0.01}
+
+        _, token = idempotency.claim_or_wait(cache, key, config)
+        self.assertIsNotNone(token)
+        # The first request finishes while the duplicate is waiting
+        finish = threading.Timer(0.1, cache.set, (key, ('digest', 201, {'id': 1}), 60))
+        finish.start()
+        entry, token = idempotency.claim_or_wait(cache, key, config)
+        finish.join()
+        self.assertEqual((entry, token), (('digest', 201, {'id': 1}), None))
+
+    def test_duplicate_gives_up_after_wait_timeout(self):
+        from . import idempotency
+        from unittest import mock
+        with override_settings(IDEMPOTENCY={'WAIT_TIMEOUT': 0.05}):
+            request = mock.Mock(auth={'user_id': self.user.id})
+            cache.add(idempotency.cache_key(request, 'key-1'), ('pending', 'other'), 60)
+            response = self.post({'description': 'Rent', 'amount': '1.00', 'category': 'needs'}, 'key-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Transaction.objects.exists())
+
+
+@override_settings(LEDGER={'RETRY_DELAY': 0})
+class LedgerTests(TestCase):
+    """Expense writes re-check the balance when another write for the user gets in first"""
+
+    def setUp(self):
+        self.user = User.objects.create(phone=PHONE, name='Ledger', income=Decimal('100'))
+        self.today = date.today()
+
+    def expense(self, amount):
+        return lambda: Transaction.objects.create(user=self.user, description='Spend', amount=Decimal(amount),
+                                                  category='needs', date=self.today)
+
+    def concurrent(self, amount):
+        """credit() hook that lands another expense between the balance check and the write"""
+        def credit():
+            self.expense(amount)()
+            self.user.bump_data_version()
+            return Decimal('0')
+        return credit
+
+    def test_refuses_expense_beyond_balance(self):
+        from . import ledger
+        ledger.checked_write(self.user, self.today.year, self.today.month, Decimal('60'), self.expense('60'))
+        with self.assertRaises(ledger.InsufficientBalance) as ctx:
+            ledger.checked_write(self.user, self.today.year, self.today.month, Decimal('60'), self.expense('60'))
+        self.assertEqual(ctx.exception.available, Decimal('40'))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_lost_race_rechecks_against_new_balance(self):
+        from . import ledger
+        racing = self.concurrent('80')
+        calls = []
+
+        def credit():
+            calls.append(1)
+            return racing() if len(calls) == 1 else Decimal('0')
+
+        with self.assertRaises(ledger.InsufficientBalance) as ctx:
+            ledger.checked_write(self.user, self.today.year, self.today.month, Decimal('80'), self.expense('80'), credit)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(ctx.exception.available, Decimal('20'))
+        self.assertEqual(ledger.monthly_balance(self.user, self.today.year, self.today.month), Decimal('20'))
+
+    def test_gives_up_after_max_attempts(self):
+        from . import ledger
+        with override_settings(LEDGER={'MAX_ATTEMPTS': 3, 'RETRY_DELAY': 0}):
+            with self.assertRaises(ledger.WriteConflict):
+                ledger.checked_write(self.user, self.today.year, self.today.month, Decimal('1'),
+                                     self.expense('1'), self.concurrent('1'))
+        # Only the three racing writes landed
+        self.assertEqual(Transaction.objects.count(), 3)
+
+    def test_api_rejects_overdraft(self):
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(self.user)['access']}"}
+        data = {'description': 'TV', 'amount': '70.00', 'category': 'wants', 'date': self.today.isoformat()}
+        post = lambda: self.client.post(reverse('api_transaction_list'), data, content_type='application/json', **auth)
+        self.assertEqual(post().status_code, 201)
+        response = post()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Available: $30.00', response.json()['error'])
+
+    def test_api_edit_counts_the_old_amount_back(self):
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(self.user)['access']}"}
+        data = {'description': 'TV', 'amount': '70.00', 'category': 'wants', 'date': self.today.isoformat()}
+        tx = self.client.post(reverse('api_transaction_list'), data, content_type='application/json', **auth).json()
+        put = lambda amount: self.client.put(reverse('api_transaction_detail', args=[tx['id']]), {'amount': amount},
+                                             content_type='application/json', **auth)
+        self.assertEqual(put('90.00').status_code, 200)
+        response = put('120.00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Available: $100.00', response.json()['error'])
+        self.assertEqual(Transaction.objects.get(id=tx['id']).amount, Decimal('90'))
+
+    def test_confirming_an_occurrence_is_balance_checked(self):
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(self.user)['access']}"}
+        rule = RecurringRule.objects.create(user=self.user, description='Gym', amount=Decimal('50'),
+                                            category='wants', start_date=self.today.replace(day=1))
+        confirm = lambda amount: self.client.post(reverse('api_recurring_confirm', args=[rule.id]),
+                                                  {'date': rule.start_date.isoformat(), 'amount': amount},
+                                                  content_type='application/json', **auth)
+        response = confirm('150.00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Available: $100.00', response.json()['error'])
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(confirm('80.00').status_code, 201)
+
+
+    def test_deleting_income_fails_a_concurrent_expense(self):
+        from django.db.models.signals import post_delete
+        from . import ledger
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(self.user)['access']}"}
+        bonus = Transaction.objects.create(user=self.user, description='Bonus', amount=Decimal('50'),
+                                           category='income', date=self.today)
+        versions = []
+
+        def deleted(sender, instance, **kwargs):
+            versions.append(User.objects.filter(pk=self.user.pk).values_list('data_version', flat=True).get())
+
+        def credit():
+            # The expense has read the balance with the bonus in it; the bonus goes now
+            if not versions:
+                version = User.objects.filter(pk=self.user.pk).values_list('data_version', flat=True).get()
+                self.client.delete(reverse('api_transaction_detail', args=[bonus.id]), **auth)
+                self.assertEqual(versions, [version + 1])   # bumped before the row went
+            return Decimal('0')
+
+        post_delete.connect(deleted, sender=Transaction)
+        self.addCleanup(post_delete.disconnect, deleted, sender=Transaction)
+        with self.assertRaises(ledger.InsufficientBalance) as ctx:
+            ledger.checked_write(self.user, self.today.year, self.today.month, Decimal('120'), self.expense('120'),
+                                 credit)
+        self.assertEqual(ctx.exception.available, Decimal('100'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_expense_rules_are_balance_checked(self):
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(self.user)['access']}"}
+        data = {'description': 'Gym', 'amount': '150.00', 'category': 'wants',
+                'start_date': self.today.replace(day=1).isoformat()}
+        create = lambda: self.client.post(reverse('api_recurring_list'), data, content_type='application/json', **auth)
+        response = create()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Available: $100.00', response.json()['error'])
+        data['amount'] = '60.00'
+        rule = create().json()
+
+        put = lambda amount: self.client.put(reverse('api_recurring_detail', args=[rule['id']]), {'amount': amount},
+                                             content_type='application/json', **auth)
+        response = put('120.00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Available: $100.00', response.json()['error'])
+        self.assertEqual(put('90.00').status_code, 200)
+        self.assertEqual(RecurringRule.objects.get(id=rule['id']).amount, Decimal('90'))
+
+    def test_web_confirmation_is_balance_checked(self):
+        rule = RecurringRule.objects.create(user=self.user, description='Gym', amount=Decimal('50'),
+                                            category='wants', start_date=self.today.replace(day=1))
+        self.expense('80')()  # written around the check, leaving the month overdrawn
+        log_in(self.client, self.user)
+        response = self.client.post(reverse('confirm_recurring'),
+                                    {'occurrence': f'{rule.id}:{rule.start_date.isoformat()}'}, follow=True)
+        self.assertIn('Insufficient balance', response.content.decode())
+        self.assertFalse(Transaction.objects.filter(recurring_rule=rule).exists())
+
+
+class MinorUnitsTests(TestCase):
+    """Amounts are BIGINT minor units in the database and Decimals everywhere else"""
+
+    def setUp(self):
+        self.user = User.objects.create(phone=PHONE, name='Cents', income=Decimal('1234.56'))
+        self.tx = Transaction.objects.create(user=self.user, description='Tea', amount=Decimal('0.29'),
+                                             category='needs', date=date.today())
+
+    def test_stored_as_integer_minor_units(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT amount FROM core_transaction WHERE id = %s', [self.tx.id])
+            self.assertEqual(cursor.fetchone()[0], 29)
+            cursor.execute('SELECT income FROM core_user WHERE id = %s', [self.user.id])
+            self.assertEqual(cursor.fetchone()[0], 123456)
+
+    def test_reads_lookups_and_sums_are_decimals(self):
+        from django.db.models import Sum
+        from .money import minor
+        Transaction.objects.create(user=self.user, description='Cake', amount='1.5', category='wants', date=date.today())
+        self.assertEqual(str(Transaction.objects.get(id=self.tx.id).amount), '0.29')
+        self.assertEqual(str(Transaction.objects.aggregate(total=Sum('amount'))['total']), '1.79')
+        self.assertEqual(Transaction.objects.filter(amount__gte=0.3).count(), 1)
+        self.assertEqual(Transaction.objects.filter(amount__lt=Decimal('1.50')).count(), 1)
+        self.assertEqual(sorted(Transaction.objects.values_list(minor('amount'), flat=True)), [29, 150])
+
+    def test_api_representation_unchanged(self):
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(self.user)['access']}"}
+        rows = self.client.get(reverse('api_transaction_list'), **auth).json()
+        self.assertEqual(rows[0]['amount'], '0.29')
+        self.assertEqual(self.client.get(reverse('api_user_profile'), **auth).json()['income'], '1234.56')
+
+    def test_rounds_half_even_to_the_stored_exponent(self):
+        from .money import exponent, to_minor
+        self.assertEqual((to_minor(Decimal('0.125')), to_minor(Decimal('0.135'))), (12, 14))
+        self.assertEqual((exponent('¥'), exponent('₹')), (0, 2))
+
+
+@override_settings(DELETION=INLINE_DELETION)
+class ArchiveTests(TestCase):
+    """Closed years move into compressed archives without changing what the user sees"""
+
+    def setUp(self):
+        self.user = User.objects.create(phone=PHONE, name='Archive', income=Decimal('1000'))
+        self.year = date.today().year - 4
+        self.rule = RecurringRule.objects.create(user=self.user, description='Rent', amount=Decimal('300'),
+                                                 category='needs', frequency=RecurringRule.MONTHLY,
+                                                 start_date=date(self.year, 1, 1))
+        for month, category, amount in [(1, 'needs', '12.34'), (1, 'savings', '100'), (3, 'income', '50.05'),
+                                        (7, 'savings', '200.50'), (12, 'wants', '0.01')]:
+            Transaction.objects.create(user=self.user, description=f'{category} {month}', amount=Decimal(amount),
+                                       category=category, date=date(self.year, month, 15))
+        Transaction.objects.create(user=self.user, description='Rent', amount=Decimal('300'), category='needs',
+                                   date=date(self.year, 2, 1), recurring_rule=self.rule)
+        Transaction.objects.create(user=self.user, description='Recent', amount=Decimal('5'), category='savings',
+                                   date=date.today())
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(self.user)['access']}"}
+
+    def snapshot(self):
+        self.user.refresh_from_db()
+        savings = self.client.get(reverse('api_savings'), {'year': self.year}, **self.auth).json()
+        return (views.monthly_history(self.user, list(self.user.recurring_rules.all())),
+                savings['total_saved_all_time'], savings['total_saved_year'], savings['chart_values'],
+                savings['savings_rate'])
+
+    def archive(self):
+        from . import archive
+        return archive.archive_year(self.user, self.year)
+
+    def test_archiving_moves_rows_and_keeps_totals(self):
+        from .models import ArchivedMonth, TransactionArchive
+        before = self.snapshot()
+        self.assertEqual(self.archive(), 6)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(TransactionArchive.objects.get(user=self.user, year=self.year).count, 6)
+        # Unconfirmed rent is frozen into the month totals
+        december = ArchivedMonth.objects.get(user=self.user, month=date(self.year, 12, 1), category='needs')
+        self.assertEqual((december.total, december.recurring_total), (Decimal('0'), Decimal('300')))
+        self.assertEqual(self.snapshot(), before)
+
+    def test_export_includes_archived_rows(self):
+        self.archive()
+        log_in(self.client, self.user)
+        txs = self.client.get(reverse('export_data')).json()['txs']
+        self.assertEqual(len(txs), 7)
+        self.assertIn({'desc': 'Rent', 'amt': 300.0, 'cat': 'needs', 'date': f'{self.year}-02-01',
+                       'order': 0, 'rec': 0}, txs)
+
+    def test_rehydrate_restores_rows_exactly(self):
+        from . import archive
+        columns = ('id', 'description', 'amount', 'category', 'date', 'order', 'recurring_rule_id',
+                   'created_at', 'updated_at')
+        before = list(Transaction.objects.order_by('id').values_list(*columns))
+        self.archive()
+        self.assertEqual(archive.rehydrate(self.user, self.year), 6)
+        self.assertEqual(list(Transaction.objects.order_by('id').values_list(*columns)), before)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.has_archive)
+
+    def test_archived_month_is_read_in_place(self):
+        from .models import TransactionArchive
+        month = {'year': self.year, 'month': 1}
+        before = [self.client.get(reverse(name), month, **self.auth).json()
+                  for name in ('api_transaction_list', 'api_dashboard')]
+        self.archive()
+        after = [self.client.get(reverse(name), month, **self.auth).json()
+                 for name in ('api_transaction_list', 'api_dashboard')]
+        self.assertEqual(after, before)
+        self.assertEqual(len(after[0]), 2)
+        detail = self.client.get(reverse('api_transaction_detail', args=[after[0][0]['id']]), **self.auth)
+        self.assertEqual(detail.json(), after[0][0])
+        log_in(self.client, self.user)
+        for name in ('dashboard', 'transactions'):
+            self.assertContains(self.client.get(reverse(name), month), 'needs 1')
+        self.assertEqual(self.client.get(reverse('advisor'), month).status_code, 200)
+        self.assertTrue(TransactionArchive.objects.filter(user=self.user, year=self.year).exists())
+
+    def test_balance_of_an_archived_month_is_unchanged(self):
+        from . import ledger
+        before = [ledger.monthly_balance(self.user, self.year, month) for month in (1, 2, 3, 12)]
+        self.archive()
+        self.assertEqual([ledger.monthly_balance(self.user, self.year, month) for month in (1, 2, 3, 12)], before)
+
+    def test_changing_an_archived_row_rehydrates_its_year(self):
+        from .models import TransactionArchive
+        self.archive()
+        rows = self.client.get(reverse('api_transaction_list'), {'year': self.year, 'month': 1}, **self.auth).json()
+        response = self.client.delete(reverse('api_transaction_detail', args=[rows[0]['id']]), **self.auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(TransactionArchive.objects.filter(user=self.user).exists())
+        self.assertEqual(Transaction.objects.filter(user=self.user, date__year=self.year).count(), 5)
+
+    def test_reset_discards_archives(self):
+        from .models import ArchivedMonth, TransactionArchive
+        self.archive()
+        self.client.post(reverse('api_reset_data'), **self.auth)
+        self.assertFalse(TransactionArchive.objects.exists() or ArchivedMonth.objects.exists())
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.has_archive)
+
+    def test_command_archives_years_before_the_horizon(self):
+        import io
+        from django.core.management import call_command
+        out = io.StringIO()
+        call_command('archive_transactions', keep_years=2, stdout=out)
+        self.assertIn('Archived 6 transactions in 1 user-years', out.getvalue())
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_years_archived_inside_the_horizon_are_still_read(self):
+        import io
+        from django.core.management import call_command
+        from . import archive
+        last_year = date.today().year - 1
+        Transaction.objects.create(user=self.user, description='Last March', amount=Decimal('40'), category='wants',
+                                   date=date(last_year, 3, 15))
+        call_command('archive_transactions', keep_years=0, stdout=io.StringIO())
+        self.user.refresh_from_db()
+        self.assertEqual([tx.description for tx in archive.month_transactions(self.user, last_year, 3)],
+                         ['Last March'])
+
+        archive.ensure_hot(self.user, last_year)
+        self.assertTrue(Transaction.objects.filter(user=self.user, date__year=last_year).exists())
+
+
+@override_settings(DELETION={**INLINE_DELETION, 'BATCH_SIZE': 4})
+class DeletionTests(TestCase):
+    """Reset, import and account deletion delete in bounded batches and record their progress"""
+
+    def setUp(self):
+        self.user = User.objects.create(phone=PHONE, name='Deleter', income=Decimal('100'))
+        self.rule = RecurringRule.objects.create(user=self.user, description='Gym', amount=Decimal('20'),
+                                                 category='wants', start_date=date.today())
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, description=f'Tx {i}', amount=Decimal('1'), category='needs',
+                        date=date.today(), recurring_rule=self.rule if i == 0 else None)
+            for i in range(10)
+        ])
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(self.user)['access']}"}
+
+    def test_reset_deletes_in_batches_and_reports_progress(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('api_reset_data'), **self.auth)
+        wipe = response.json()['deletion']
+        self.assertEqual((wipe['status'], wipe['total'], wipe['deleted'], wipe['progress']), ('done', 11, 11, 1.0))
+        deletes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('DELETE FROM "core_transaction"')]
+        self.assertEqual(len(deletes), 3)
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+        status = self.client.get(reverse('api_deletion_status', args=[wipe['id']]), **self.auth).json()
+        self.assertEqual(status['status'], 'done')
+
+    def test_reset_in_background_is_accepted_not_done(self):
+        with override_settings(DELETION={'ASYNC': True}):
+            response = self.client.post(reverse('api_reset_data'), **self.auth)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['deletion']['status'], 'queued')
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 10)
+
+    def test_rows_written_after_the_request_survive(self):
+        from . import deletion
+        with override_settings(DELETION={'ASYNC': True}):
+            # Queued for after commit, which never comes inside TestCase, so nothing runs yet
+            wipe = deletion.schedule(self.user, DeletionRequest.IMPORT)
+        later = Transaction.objects.create(user=self.user, description='Imported', amount=Decimal('5'),
+                                           category='needs', date=date.today() + timedelta(days=31),
+                                           recurring_rule=self.rule)
+        self.assertEqual(deletion.process(wipe).status, DeletionRequest.DONE)
+        later.refresh_from_db()
+        self.assertIsNone(later.recurring_rule_id)
+        self.assertEqual(list(Transaction.objects.values_list('id', flat=True)), [later.id])
+
+    def test_public_account_request_waits_for_approval(self):
+        from . import deletion
+        self.client.post(reverse('delete_account'), {'phone': PHONE, 'reason': 'Done with it'})
+        wipe = DeletionRequest.objects.get()
+        self.assertEqual((wipe.kind, wipe.status), (DeletionRequest.ACCOUNT, DeletionRequest.REQUESTED))
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+        self.assertEqual(deletion.approve(DeletionRequest.objects.all()), 1)
+        wipe.refresh_from_db()
+        self.assertEqual((wipe.status, wipe.user_id, wipe.phone), (DeletionRequest.DONE, None, PHONE))
+        self.assertFalse(User.objects.exists() or Transaction.objects.exists() or RecurringRule.objects.exists())
+
+    def test_signed_in_owner_deletes_right_away(self):
+        log_in(self.client, self.user)
+        self.client.post(reverse('delete_account'), {'phone': PHONE})
+        self.assertEqual(DeletionRequest.objects.get().status, DeletionRequest.DONE)
+        self.assertFalse(User.objects.exists())
+
+    def running(self, started_minutes_ago):
+        from django.utils import timezone
+        return DeletionRequest.objects.create(
+            user=self.user, phone=PHONE, kind=DeletionRequest.RESET, status=DeletionRequest.RUNNING, deleted=3,
+            started_at=timezone.now() - timedelta(minutes=started_minutes_ago),
+            last_transaction_id=Transaction.objects.latest('id').id, last_rule_id=self.rule.id,
+        )
+
+    def test_command_resumes_abandoned_requests_only(self):
+        import io
+        from django.core.management import call_command
+        active = self.running(1)
+        out = io.StringIO()
+        call_command('process_deletions', stdout=out)
+        self.assertIn('Processed 0 deletion requests', out.getvalue())
+        self.assertEqual(Transaction.objects.count(), 10)
+
+        abandoned = self.running(60)
+        call_command('process_deletions', stdout=out)
+        abandoned.refresh_from_db()
+        self.assertEqual((abandoned.status, abandoned.total, abandoned.deleted), (DeletionRequest.DONE, 14, 14))
+        self.assertIn('Processed 1 deletion requests', out.getvalue())
+        active.refresh_from_db()
+        self.assertEqual(active.status, DeletionRequest.RUNNING)
+
+    def test_request_is_processed_once(self):
+        from . import deletion
+        with override_settings(DELETION={'ASYNC': True}):
+            wipe = deletion.schedule(self.user, DeletionRequest.RESET)
+        stale_copy = DeletionRequest.objects.get(pk=wipe.pk)
+        self.assertEqual(deletion.process(wipe).status, DeletionRequest.DONE)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(deletion.process(stale_copy).status, DeletionRequest.QUEUED)
+        self.assertEqual(len(ctx.captured_queries), 1)  # Only the failed claim
+        wipe.refresh_from_db()
+        self.assertEqual((wipe.total, wipe.deleted), (11, 11))
+
+    def test_status_is_private_to_the_user(self):
+        other = User.objects.create(phone='9000000002')
+        wipe = DeletionRequest.objects.create(user=other, phone=other.phone, kind=DeletionRequest.RESET)
+        response = self.client.get(reverse('api_deletion_status', args=[wipe.id]), **self.auth)
+        self.assertEqual(response.status_code, 404)
+
+
+class AdminTests(TestCase):
+    """Admin change lists stay cheap however many users and transactions there are"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        staff = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(staff)
+        self.user = User.objects.create(phone=PHONE, name='Admin')
+        self.next_phone = 9000000000
+
+    def seed(self, users, per_user):
+        for _ in range(users):
+            self.next_phone += 1
+            user = User.objects.create(phone=str(self.next_phone))
+            Transaction.objects.bulk_create([
+                Transaction(user=user, description=f'Tx {n}', amount=Decimal('1.50'), category='needs',
+                            date=date.today())
+                for n in range(per_user)
+            ])
+
+    def changelist_queries(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin:core_transaction_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_transaction_changelist_does_not_grow_with_table(self):
+        self.seed(2, 2)
+        _, small = self.changelist_queries()
+        self.seed(30, 5)
+        response, large = self.changelist_queries()
+        self.assertEqual(small, large)
+        # Users are filtered by typing a phone, not listed in the sidebar
+        self.assertContains(response, 'name="phone"')
+        self.assertNotContains(response, f'user__id__exact={self.user.pk}')
+
+    def test_digits_search_matches_phone_exactly(self):
+        self.seed(3, 2)
+        Transaction.objects.create(user=self.user, description='Mine', amount=Decimal('1'), category='needs',
+                                   date=date.today())
+        response, _ = self.changelist_queries(q=PHONE)
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response, _ = self.changelist_queries(phone=PHONE)
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+        Transaction.objects.create(user=self.user, description='Invoice 20417', amount=Decimal('1'),
+                                   category='needs', date=date.today())
+        response, _ = self.changelist_queries(q='20417')
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_count_is_capped(self):
+        from unittest import mock
+        from .admin import EstimatedCountPaginator
+        self.seed(1, 12)
+        with mock.patch.object(EstimatedCountPaginator, 'COUNT_LIMIT', 5):
+            response, _ = self.changelist_queries()
+        self.assertEqual(response.context['cl'].result_count, 5)
+
+    def test_export_csv_streams_selected_rows(self):
+        self.seed(2, 3)
+        response = self.client.post(reverse('admin:core_transaction_changelist'), {
+            'action': 'export_csv', 'select_across': '1', 'index': '0',
+            '_selected_action': list(Transaction.objects.values_list('pk', flat=True)),
+        })
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,user__phone,description,amount,category,date,order,recurring_rule_id,'
+                                   'created_at,updated_at')
+        self.assertEqual(len(lines), 7)
+        self.assertIn(',Tx 0,1.50,needs,', lines[1])
+
+    def test_user_links_to_their_transactions(self):
+        self.seed(2, 2)
+        response = self.client.get(reverse('admin:core_user_changelist'), {'q': PHONE})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertContains(response, f'?user__id__exact={self.user.pk}')
+        response, _ = self.changelist_queries(user__id__exact=self.user.pk)
+        self.assertEqual(response.context['cl'].result_count, 0)
+        autocomplete = self.client.get(reverse('admin:autocomplete'), {
+            'term': PHONE, 'app_label': 'core', 'model_name': 'transaction', 'field_name': 'user',
+        })
+        self.assertEqual([row['id'] for row in autocomplete.json()['results']], [str(self.user.pk)])
+
+
+class BootstrapTests(TransactionTestCase):
+    """/api/bootstrap/ matches the endpoints it replaces, with sections computed on pool threads"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(phone=PHONE, name='Boot', pin='123456', income=Decimal('1000'))
+        today = date.today()
+        RecurringRule.objects.create(user=self.user, description='Rent', amount=Decimal('300'), category='needs',
+                                     start_date=today.replace(day=1))
+        for category, amount in [('needs', '40'), ('savings', '150'), ('income', '75.50')]:
+            Transaction.objects.create(user=self.user, description=category, amount=Decimal(amount),
+                                       category=category, date=today)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(self.user)['access']}"}
+
+    def get(self, name):
+        response = self.client.get(reverse(name), **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_sections_match_separate_endpoints(self):
+        from unittest import mock
+        from . import bootstrap
+        with override_settings(BOOTSTRAP={'CONCURRENT': True, 'WORKERS': 2}):
+            with mock.patch.object(bootstrap, '_in_thread', wraps=bootstrap._in_thread) as in_thread:
+                data = self.get('api_bootstrap')
+        # The first section runs in the request thread
+        self.assertEqual(in_thread.call_count, 1)
+
+        dashboard, savings = self.get('api_dashboard'), self.get('api_savings')
+        self.assertEqual(data['user'], dashboard.pop('user'))
+        savings.pop('user')
+        self.assertEqual(data['dashboard'], dashboard)
+        self.assertEqual(data['savings'], savings)
+        self.assertTrue(data['pin_set'])
+
+    def test_busy_pool_runs_sections_in_the_request(self):
+        from unittest import mock
+        from . import bootstrap
+        with override_settings(BOOTSTRAP={'CONCURRENT': True, 'WORKERS': 1}):
+            _, idle = bootstrap.get_executor(bootstrap.get_bootstrap_settings())
+            idle.acquire()  # Another request's section
+            try:
+                with mock.patch.object(bootstrap, '_in_thread', wraps=bootstrap._in_thread) as in_thread:
+                    data = self.get('api_bootstrap')
+            finally:
+                idle.release()
+        self.assertEqual(in_thread.call_count, 0)
+        self.assertEqual(set(data), {'user', 'pin_set', 'dashboard', 'savings', 'sync'})
+
+    def test_sync_cursor_is_the_data_version_before_computing(self):
+        self.user.refresh_from_db()
+        data = self.get('api_bootstrap')
+        self.assertEqual(data['sync']['cursor'], self.user.data_version)
@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
 from . import api_views
+from . import metrics
 
 urlpatterns = [
     # Authentication
@@ -29,6 +30,8 @@ urlpatterns = [
     path('transaction/add/', views.add_transaction, name='add_transaction'),
     path('transaction/delete/<int:tx_id>/', views.delete_transaction, name='delete_transaction'),
     path('transaction/reorder/', views.reorder_transactions, name='reorder_transactions'),
+    path('recurring/confirm/', views.confirm_recurring, name='confirm_recurring'),
+    path('recurring/delete/<int:rule_id>/', views.delete_recurring, name='delete_recurring'),
     
     # Data operations
     path('export/', views.export_data, name='export_data'),
@@ -45,6 +48,7 @@ urlpatterns = [
     path('api/auth/check-status/', api_views.check_user_status, name='api_check_status'),
     path('api/auth/register/', api_views.register_with_pin, name='api_register'),
     path('api/auth/login-pin/', api_views.login_with_pin, name='api_login_pin'),
+    path('api/auth/logout/', api_views.logout, name='api_logout'),
     path('api/token/refresh/', api_views.token_refresh, name='token_refresh'),
     
     # User API
@@ -56,14 +60,26 @@ urlpatterns = [
     path('api/transactions/<int:pk>/', api_views.transaction_detail, name='api_transaction_detail'),
     path('api/transactions/reorder/', api_views.reorder_transactions, name='api_reorder_transactions'),
     
+    # Recurring Transaction API
+    path('api/recurring/', api_views.recurring_list, name='api_recurring_list'),
+    path('api/recurring/<int:pk>/', api_views.recurring_detail, name='api_recurring_detail'),
+    path('api/recurring/<int:pk>/confirm/', api_views.recurring_confirm, name='api_recurring_confirm'),
+    
     # Dashboard API
     path('api/dashboard/', api_views.dashboard_summary, name='api_dashboard'),
     
+    # App launch: profile, dashboard and savings in one request
+    path('api/bootstrap/', api_views.bootstrap_data, name='api_bootstrap'),
+    
     # Savings API
     path('api/savings/', api_views.savings_summary, name='api_savings'),
     
     # Settings API
     path('api/settings/reset/', api_views.reset_data, name='api_reset_data'),
+    path('api/settings/deletions/<int:pk>/', api_views.deletion_status, name='api_deletion_status'),
     path('api/settings/toggle-theme/', api_views.toggle_theme, name='api_toggle_theme'),
+    
+    # Monitoring
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
 
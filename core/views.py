@@ -3,9 +3,13 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
-from .models import User, OTP, Transaction
+from .models import User, OTP, Transaction, RecurringRule, DeletionRequest
+from . import advisor, archive, deletion, fragments, ledger, metrics, money, otp_delivery, recurring
+from .middleware import session_user
+from django.db import transaction
 from django.db.models import F
 from datetime import datetime, date, timedelta
+from itertools import chain
 from dateutil.relativedelta import relativedelta
 from decimal import Decimal
 import json
@@ -62,6 +66,7 @@ def login_pin(request):
         try:
             user = User.objects.get(phone=phone)
             if user.pin == pin:
+                metrics.record_login('web', True)
                 request.session['user_id'] = user.id
                 # Don't delete pending_phone yet in case we need it elsewhere? 
                 # Actually we can delete it now.
@@ -69,8 +74,10 @@ def login_pin(request):
                 messages.success(request, f'Welcome back, {user.name or "friend"}!')
                 return redirect('dashboard')
             else:
+                metrics.record_login('web', False)
                 messages.error(request, 'Invalid PIN')
         except User.DoesNotExist:
+            metrics.record_login('web', False)
             return redirect('login')
             
     return render(request, 'core/login_pin.html', {'phone': phone})
@@ -150,16 +157,10 @@ def send_otp(request):
         # Check reset flag - if resetting, might want to ignore existing PIN check?
         # But send_otp is usually called when we KNOW we want an OTP.
         
-        # Generate OTP
+        # Generate OTP and queue the SMS; delivery happens off the request thread
         otp = OTP.generate_otp(phone)
-        
-        # Log OTP to console (for development)
-        logger.info(f"=" * 50)
-        logger.info(f"OTP for {phone}: {otp.code}")
-        logger.info(f"=" * 50)
-        print(f"\n{'=' * 50}")
-        print(f"📱 OTP for {phone}: {otp.code}")
-        print(f"{'=' * 50}\n")
+        metrics.record_otp_sent('web')
+        otp_delivery.dispatch(otp)
         
         return redirect('verify_otp')
     
@@ -169,8 +170,8 @@ def send_otp(request):
     if phone:
         # Re-send logic
         otp = OTP.generate_otp(phone)
-        logger.info(f"Resent OTP for {phone}: {otp.code}")
-        print(f"📱 Resent OTP for {phone}: {otp.code}")
+        metrics.record_otp_sent('web')
+        otp_delivery.dispatch(otp)
         messages.info(request, 'OTP sent successfully')
         return redirect('verify_otp')
         
@@ -194,6 +195,7 @@ def verify_otp_view(request):
             if otp.code == code and otp.is_valid():
                 otp.is_verified = True
                 otp.save()
+                metrics.record_otp_verification('web', True)
                 
                 # Get or create user
                 user, created = User.objects.get_or_create(phone=phone)
@@ -213,8 +215,10 @@ def verify_otp_view(request):
                     # Yes, redirect to create_pin to set new PIN.
                     return redirect('create_pin')
             else:
+                metrics.record_otp_verification('web', False)
                 messages.error(request, 'Invalid or expired OTP. Please try again.')
         except OTP.DoesNotExist:
+            metrics.record_otp_verification('web', False)
             messages.error(request, 'OTP not found. Please request a new one.')
             return redirect('login')
     
@@ -244,33 +248,26 @@ def delete_account_view(request):
         if not phone or len(phone) < 10:
             messages.error(request, 'Please enter a valid phone number')
         else:
-            # Log the deletion request (in production, save to DB or send email)
-            logger.info(f"Account deletion request for {phone}. Reason: {reason}")
-            print(f"\n{'=' * 50}")
-            print(f"🗑️ ACCOUNT DELETION REQUEST")
-            print(f"Phone: {phone}")
-            print(f"Reason: {reason or 'Not provided'}")
-            print(f"{'=' * 50}\n")
+            # Processed right away for the signed-in owner of the number, otherwise after staff approval
+            wipe = deletion.request_account_deletion(phone, reason, session_user(request))
+            logger.info(f"Account deletion request {wipe.pk} for {phone} ({wipe.status}). Reason: {reason}")
             request_submitted = True
     
     return render(request, 'core/delete_account.html', {'request_submitted': request_submitted})
 
 
 def get_user(request):
-    """Helper to get current user"""
-    user_id = request.session.get('user_id')
-    if not user_id:
-        return None
-    try:
-        return User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        return None
+    """Helper to get current user, memoized per request by WealthUserMiddleware"""
+    user = getattr(request, 'wealth_user', None)
+    if user is None:
+        return session_user(request)
+    return user if user else None
 
 
 def login_required_view(view_func):
     """Decorator for login required views"""
     def wrapper(request, *args, **kwargs):
-        if not request.session.get('user_id'):
+        if not get_user(request):
             return redirect('login')
         return view_func(request, *args, **kwargs)
     return wrapper
@@ -299,12 +296,41 @@ def setup_view(request):
     return render(request, 'core/setup.html')
 
 
+def monthly_history(user, rules):
+    """Income, spend and savings per month, newest first, counting unconfirmed recurring transactions"""
+    transactions = Transaction.objects.filter(user=user).order_by('-date')
+    monthly_data = {}
+    for tx in archive.history_rows(user, rules, transactions, date.today()):
+        key = tx.date.strftime('%Y-%m')
+        if key not in monthly_data:
+            monthly_data[key] = {'spent': Decimal('0'), 'extra_income': Decimal('0')}
+        
+        if tx.category == 'income':
+            monthly_data[key]['extra_income'] += tx.amount
+        else:
+            monthly_data[key]['spent'] += tx.amount
+    
+    history = []
+    for key in sorted(monthly_data.keys(), reverse=True):
+        year, month = key.split('-')
+        month_name = date(int(year), int(month), 1).strftime('%B %Y')
+        data = monthly_data[key]
+        total_income = user.income + data['extra_income']
+        saved = total_income - data['spent']
+        
+        history.append({
+            'month': month_name,
+            'total_income': total_income,
+            'spent': data['spent'],
+            'saved': saved,
+            'status': 'Saved' if saved >= 0 else 'Over'
+        })
+    return history
+
+
 def calculate_monthly_balance(user, year, month):
-    """Calculate balance for a specific month"""
-    txs = Transaction.objects.filter(user=user, date__year=year, date__month=month)
-    spent = sum(tx.amount for tx in txs if tx.category != 'income')
-    extra_income = sum(tx.amount for tx in txs if tx.category == 'income')
-    return (user.income + extra_income) - spent
+    """Calculate balance for a specific month, including unconfirmed recurring transactions"""
+    return ledger.monthly_balance(user, year, month)
 
 
 @login_required_view
@@ -339,6 +365,7 @@ def dashboard(request):
                 amount=past_balance,
                 order=999
             )
+            user.bump_data_version()
             messages.info(request, f'💰 Saved {user.currency}{past_balance:g} from last month!')
     
     # Get current month from query params or default to today
@@ -349,23 +376,34 @@ def dashboard(request):
     # Get filter
     filter_category = request.GET.get('filter', 'all')
     
-    # Get transactions for current month
-    transactions = Transaction.objects.filter(
-        user=user,
-        date__year=year,
-        date__month=month
-    ).order_by('order', '-date', '-created_at')
+    # Get transactions for current month; an archived month is read from its archive
+    archived = archive.month_transactions(user, year, month)
+    if archived is None:
+        transactions = Transaction.objects.filter(
+            user=user,
+            date__year=year,
+            date__month=month
+        ).order_by('order', '-date', '-created_at')
+    else:
+        transactions = archived
+    recurring_rules = list(user.recurring_rules.all())
+    recurring_transactions = recurring.expand(recurring_rules, year, month, recurring.materialized(transactions))
     
     # Apply category filter
     if filter_category != 'all':
-        filtered_transactions = transactions.filter(category=filter_category)
+        if archived is None:
+            filtered_transactions = transactions.filter(category=filter_category)
+        else:
+            filtered_transactions = [tx for tx in transactions if tx.category == filter_category]
+        filtered_recurring = [tx for tx in recurring_transactions if tx.category == filter_category]
     else:
         filtered_transactions = transactions
+        filtered_recurring = recurring_transactions
     
     # Pagination
     page = int(request.GET.get('page', 1))
     items_per_page = 5
-    total_items = filtered_transactions.count()
+    total_items = filtered_transactions.count() if archived is None else len(filtered_transactions)
     total_pages = max(1, (total_items + items_per_page - 1) // items_per_page)
     page = min(max(1, page), total_pages)
     
@@ -374,20 +412,14 @@ def dashboard(request):
     paged_transactions = filtered_transactions[start_idx:end_idx]
     
     # Calculate finances
-    total_spent = Decimal('0')
-    extra_income = Decimal('0')
-    categories = {'needs': Decimal('0'), 'wants': Decimal('0'), 'savings': Decimal('0')}
+    totals = advisor.MonthTotals(user.income)
+    for tx in chain(transactions, recurring_transactions):
+        totals.add(tx.category, tx.amount)
     
-    for tx in transactions:
-        if tx.category == 'income':
-            extra_income += tx.amount
-        else:
-            total_spent += tx.amount
-            if tx.category in categories:
-                categories[tx.category] += tx.amount
-    
-    total_income = user.income + extra_income
-    balance = total_income - total_spent
+    total_spent = totals.total_spent
+    categories = totals.categories
+    total_income = totals.total_income
+    balance = totals.balance
     
     # Budget limits
     limits = {
@@ -401,78 +433,19 @@ def dashboard(request):
     next_month = current_date + relativedelta(months=1)
     
     # --- HISTORY DATA ---
-    all_transactions = Transaction.objects.filter(user=user).order_by('-date')
-    monthly_data = {}
-    for tx in all_transactions:
-        key = tx.date.strftime('%Y-%m')
-        if key not in monthly_data:
-            monthly_data[key] = {'spent': Decimal('0'), 'extra_income': Decimal('0')}
-        
-        if tx.category == 'income':
-            monthly_data[key]['extra_income'] += tx.amount
-        else:
-            monthly_data[key]['spent'] += tx.amount
-    
-    history = []
-    for key in sorted(monthly_data.keys(), reverse=True):
-        y, m = key.split('-')
-        month_name = date(int(y), int(m), 1).strftime('%B %Y')
-        data = monthly_data[key]
-        hist_total_income = user.income + data['extra_income']
-        saved = hist_total_income - data['spent']
-        
-        history.append({
-            'month': month_name,
-            'total_income': hist_total_income,
-            'spent': data['spent'],
-            'saved': saved,
-            'status': 'Saved' if saved >= 0 else 'Over'
-        })
+    # Only computed when the cached history fragment has to be rendered
+    history = fragments.lazy(monthly_history, user, recurring_rules)
     
     # --- ADVISOR DATA ---
-    advice = []
-    if user.income == 0:
-        advice.append({
-            'type': 'warning',
-            'title': '⚠️ Setup Required',
-            'text': 'Please go to Settings and set your Monthly Income.'
-        })
-    else:
-        income_base = total_income if total_income > 0 else Decimal('1')
-        total_pct = (total_spent / income_base) * 100
-        wants_pct = (categories['wants'] / income_base) * 100
-        
-        if total_pct > 100:
-            advice.append({
-                'type': 'warning',
-                'title': '🚨 Over Budget',
-                'text': f'You are spending {total_pct:.1f}% of your income!'
-            })
-        elif total_pct < 85:
-            advice.append({
-                'type': 'good',
-                'title': '✅ Good Status',
-                'text': f'You are under budget ({total_pct:.1f}%).'
-            })
-        
-        if wants_pct > user.rule_wants:
-            advice.append({
-                'type': 'warning',
-                'title': '⚠️ Wants Alert',
-                'text': 'You exceeded your "Wants" limit.'
-            })
-        
-        if categories['savings'] == 0 and total_spent > 0:
-            advice.append({
-                'type': 'info',
-                'title': '💡 Savings Tip',
-                'text': 'No money allocated to Savings yet.'
-            })
+    # From the month totals at hand, so nothing to fetch or cache; the month-end
+    # forecast needs a year of history and is left to the advisor page
+    advice = advisor.advise(user, year, month, use_cache=False, month_totals=totals, forecast=None).advice
     
     context = {
         'user': user,
         'current_date': current_date,
         'transactions': paged_transactions,
+        'recurring_transactions': filtered_recurring,
         'all_transactions': transactions,
         'filter_category': filter_category,
         'page': page,
@@ -502,6 +475,8 @@ def add_transaction(request):
         amount = request.POST.get('amount', '')
         category = request.POST.get('category', 'needs')
         tx_id = request.POST.get('tx_id', '')
+        occurrence = request.POST.get('occurrence', '')  # Editing an unconfirmed recurring transaction
+        repeat = request.POST.get('repeat', '')
         year = int(request.POST.get('year', date.today().year))
         month = int(request.POST.get('month', date.today().month))
         
@@ -509,6 +484,15 @@ def add_transaction(request):
             messages.error(request, 'Please fill all fields')
             return redirect(f'/dashboard/?year={year}&month={month}')
         
+        rule = None
+        if occurrence and not tx_id:
+            try:
+                rule_id, occurrence_date = recurring.parse_key(occurrence)
+                rule = RecurringRule.objects.get(id=rule_id, user=user)
+            except (ValueError, RecurringRule.DoesNotExist):
+                messages.error(request, 'Recurring transaction not found')
+                return redirect(f'/dashboard/?year={year}&month={month}')
+        
         try:
             amount = Decimal(amount)
             if amount <= 0:
@@ -523,39 +507,47 @@ def add_transaction(request):
             tx_date = today
         else:
             tx_date = date(year, month, 1)
+        # Writes to an archived year need its rows back in the table
+        archive.ensure_hot(user, year)
 
-        # Negative Balance Check
-        if category != 'income':
-            # Calculate projected balance
-            current_bal = calculate_monthly_balance(user, year, month)
-            
-            # Adjust for edit
+        def credit():
+            """Balance an edit gives back: the edited row is already counted"""
             if tx_id:
-                try:
-                    old_tx = Transaction.objects.get(id=tx_id, user=user)
-                    if old_tx.category == 'income':
-                        current_bal -= old_tx.amount
-                    else:
-                        current_bal += old_tx.amount
-                except Transaction.DoesNotExist:
-                    pass
-            
-            if (current_bal - amount) < 0:
-                messages.error(request, f'Insufficient balance! Available: {user.currency}{current_bal:g}')
-                return redirect(f'/dashboard/?year={year}&month={month}')
+                old_tx = Transaction.objects.filter(id=tx_id, user=user).first()
+            elif rule is not None:
+                # The occurrence is already counted, either as a confirmed row or a virtual one
+                old_tx = (Transaction.objects.filter(recurring_rule=rule, date=occurrence_date).first()
+                          or recurring.VirtualTransaction(rule, occurrence_date))
+            else:
+                return Decimal('0')
+            if old_tx is None:
+                return Decimal('0')
+            return -old_tx.amount if old_tx.category == 'income' else old_tx.amount
         
-        if tx_id:
-            # Edit existing transaction
-            try:
+        def write():
+            if rule is not None:
+                # Editing a recurring occurrence stores it as a real transaction
+                recurring.materialize(rule, occurrence_date, description=description, amount=amount, category=category)
+                return 'Transaction updated!'
+            if tx_id:
+                # Edit existing transaction
                 tx = Transaction.objects.get(id=tx_id, user=user)
                 tx.description = description
                 tx.amount = amount
                 tx.category = category
                 tx.save()
-                messages.success(request, 'Transaction updated!')
-            except Transaction.DoesNotExist:
-                messages.error(request, 'Transaction not found')
-        else:
+                return 'Transaction updated!'
+            if repeat in (RecurringRule.MONTHLY, RecurringRule.WEEKLY):
+                # Stored as a rule only; each occurrence shows up until confirmed
+                RecurringRule.objects.create(
+                    user=user,
+                    description=description,
+                    amount=amount,
+                    category=category,
+                    frequency=repeat,
+                    start_date=tx_date
+                )
+                return 'Recurring transaction added!'
             # Create new transaction
             # Shift existing orders down to make room at top
             Transaction.objects.filter(
@@ -572,8 +564,23 @@ def add_transaction(request):
                 date=tx_date,
                 order=0 # Top of list
             )
-            messages.success(request, 'Transaction added!')
+            return 'Transaction added!'
         
+        try:
+            if category != 'income':
+                # Negative balance check, atomic with the write
+                messages.success(request, ledger.checked_write(user, year, month, amount, write, credit))
+            else:
+                messages.success(request, write())
+                user.bump_data_version()
+        except ledger.InsufficientBalance as e:
+            messages.error(request, f'Insufficient balance! Available: {user.currency}{e.available:g}')
+        except ledger.WriteConflict:
+            messages.error(request, 'Too many changes at once. Please try again.')
+        except Transaction.DoesNotExist:
+            messages.error(request, 'Transaction not found')
+        except ValueError as e:
+            messages.error(request, str(e))
         return redirect(f'/dashboard/?year={year}&month={month}')
     
     return redirect('dashboard')
@@ -586,16 +593,68 @@ def delete_transaction(request, tx_id):
     year = request.GET.get('year', date.today().year)
     month = request.GET.get('month', date.today().month)
     
-    try:
-        tx = Transaction.objects.get(id=tx_id, user=user)
-        tx.delete()
+    tx = archive.hot_transaction(user, tx_id)
+    if tx is not None:
+        # Version first, in one transaction, so a concurrent balance check that counted this row fails
+        with transaction.atomic():
+            user.bump_data_version()
+            tx.delete()
         messages.success(request, 'Transaction deleted!')
-    except Transaction.DoesNotExist:
+    else:
         messages.error(request, 'Transaction not found')
     
     return redirect(f'/dashboard/?year={year}&month={month}')
 
 
+@login_required_view
+@require_http_methods(["POST"])
+def confirm_recurring(request):
+    """Store an unconfirmed recurring transaction as a real one"""
+    user = get_user(request)
+    year = request.POST.get('year', date.today().year)
+    month = request.POST.get('month', date.today().month)
+    
+    try:
+        rule_id, occurrence_date = recurring.parse_key(request.POST.get('occurrence'))
+        rule = RecurringRule.objects.get(id=rule_id, user=user)
+        archive.ensure_hot(user, occurrence_date.year)
+        write = lambda: recurring.materialize(rule, occurrence_date)
+        if rule.category == 'income':
+            write()
+            user.bump_data_version()
+        else:
+            ledger.checked_write(user, occurrence_date.year, occurrence_date.month, rule.amount, write,
+                                 lambda: ledger.occurrence_credit(rule, occurrence_date))
+        messages.success(request, 'Transaction confirmed!')
+    except RecurringRule.DoesNotExist:
+        messages.error(request, 'Recurring transaction not found')
+    except ledger.InsufficientBalance as e:
+        messages.error(request, f'Insufficient balance! Available: {user.currency}{e.available:g}')
+    except ledger.WriteConflict:
+        messages.error(request, 'Too many changes at once. Please try again.')
+    except ValueError as e:
+        messages.error(request, str(e))
+    
+    return redirect(f'/dashboard/?year={year}&month={month}')
+
+
+@login_required_view
+def delete_recurring(request, rule_id):
+    """Stop a recurring transaction; occurrences already confirmed are kept"""
+    user = get_user(request)
+    year = request.GET.get('year', date.today().year)
+    month = request.GET.get('month', date.today().month)
+    
+    deleted, _ = RecurringRule.objects.filter(id=rule_id, user=user).delete()
+    if deleted:
+        user.bump_data_version()
+        messages.success(request, 'Recurring transaction stopped!')
+    else:
+        messages.error(request, 'Recurring transaction not found')
+    
+    return redirect(f'/dashboard/?year={year}&month={month}')
+
+
 @login_required_view
 @require_http_methods(["POST"])
 def reorder_transactions(request):
@@ -605,9 +664,13 @@ def reorder_transactions(request):
     try:
         data = json.loads(request.body)
         order_list = data.get('order', [])
+        if order_list and user.has_archive:
+            # All from one month: bring it back if it is archived
+            archive.hot_transaction(user, order_list[0])
         
         for idx, tx_id in enumerate(order_list):
             Transaction.objects.filter(id=tx_id, user=user).update(order=idx)
+        user.bump_data_version()
         
         return JsonResponse({'success': True})
     except Exception as e:
@@ -619,37 +682,8 @@ def history_view(request):
     """Yearly history view"""
     user = get_user(request)
     
-    # Get all transactions grouped by month
-    transactions = Transaction.objects.filter(user=user).order_by('-date')
-    
-    # Group by month
-    monthly_data = {}
-    for tx in transactions:
-        key = tx.date.strftime('%Y-%m')
-        if key not in monthly_data:
-            monthly_data[key] = {'spent': Decimal('0'), 'extra_income': Decimal('0')}
-        
-        if tx.category == 'income':
-            monthly_data[key]['extra_income'] += tx.amount
-        else:
-            monthly_data[key]['spent'] += tx.amount
-    
-    # Convert to list with calculated values
-    history = []
-    for key in sorted(monthly_data.keys(), reverse=True):
-        year, month = key.split('-')
-        month_name = date(int(year), int(month), 1).strftime('%B %Y')
-        data = monthly_data[key]
-        total_income = user.income + data['extra_income']
-        saved = total_income - data['spent']
-        
-        history.append({
-            'month': month_name,
-            'total_income': total_income,
-            'spent': data['spent'],
-            'saved': saved,
-            'status': 'Saved' if saved >= 0 else 'Over'
-        })
+    # Only computed when the cached history fragment has to be rendered
+    history = fragments.lazy(monthly_history, user, user.recurring_rules.all())
     
     context = {
         'user': user,
@@ -670,67 +704,23 @@ def advisor_view(request):
     current_date = date(year, month, 1)
     
     # Get transactions for current month
-    transactions = Transaction.objects.filter(
-        user=user,
-        date__year=year,
-        date__month=month
-    )
-    
-    # Calculate finances
-    total_spent = Decimal('0')
-    extra_income = Decimal('0')
-    categories = {'needs': Decimal('0'), 'wants': Decimal('0'), 'savings': Decimal('0')}
-    
-    for tx in transactions:
-        if tx.category == 'income':
-            extra_income += tx.amount
-        else:
-            total_spent += tx.amount
-            if tx.category in categories:
-                categories[tx.category] += tx.amount
-    
-    total_income = user.income + extra_income
+    transactions = archive.month_transactions(user, year, month)
+    if transactions is None:
+        transactions = Transaction.objects.filter(
+            user=user,
+            date__year=year,
+            date__month=month
+        )
+    
+    # Calculate finances; the forecast reads the same rules
+    recurring_rules = list(user.recurring_rules.all())
+    virtual = recurring.expand(recurring_rules, year, month, recurring.materialized(transactions))
+    totals = advisor.MonthTotals(user.income)
+    for tx in chain(transactions, virtual):
+        totals.add(tx.category, tx.amount)
     
     # Generate advice
-    advice = []
-    
-    if user.income == 0:
-        advice.append({
-            'type': 'warning',
-            'title': '⚠️ Setup Required',
-            'text': 'Please go to Settings and set your Monthly Income.'
-        })
-    else:
-        income_base = total_income if total_income > 0 else Decimal('1')
-        total_pct = (total_spent / income_base) * 100
-        wants_pct = (categories['wants'] / income_base) * 100
-        
-        if total_pct > 100:
-            advice.append({
-                'type': 'warning',
-                'title': '🚨 Over Budget',
-                'text': f'You are spending {total_pct:.1f}% of your income!'
-            })
-        elif total_pct < 85:
-            advice.append({
-                'type': 'good',
-                'title': '✅ Good Status',
-                'text': f'You are under budget ({total_pct:.1f}%).'
-            })
-        
-        if wants_pct > user.rule_wants:
-            advice.append({
-                'type': 'warning',
-                'title': '⚠️ Wants Alert',
-                'text': 'You exceeded your "Wants" limit.'
-            })
-        
-        if categories['savings'] == 0 and total_spent > 0:
-            advice.append({
-                'type': 'info',
-                'title': '💡 Savings Tip',
-                'text': 'No money allocated to Savings yet.'
-            })
+    advice = advisor.advise(user, year, month, recurring_rules=recurring_rules, month_totals=totals).advice
     
     # Previous and next month
     prev_month = current_date - relativedelta(months=1)
@@ -748,17 +738,13 @@ def advisor_view(request):
 
 
 
-@login_required_view
-def savings_view(request):
-    """Deep analysis of savings"""
-    user = get_user(request)
-    
-    # Year filter
-    year = int(request.GET.get('year', date.today().year))
-    
+def savings_summary(user, year):
+    """Totals, chart series and goal progress for the savings page"""
     # 1. Total Savings Analysis (All time vs This Year)
     all_savings_tx = Transaction.objects.filter(user=user, category='savings').order_by('-date')
     total_saved_all_time = sum(tx.amount for tx in all_savings_tx)
+    archived = archive.archived_months(user)
+    total_saved_all_time += sum(row.total for row in archived if row.category == 'savings')
     
     # Filter for selected year
     year_savings_tx = all_savings_tx.filter(date__year=year)
@@ -770,6 +756,11 @@ def savings_view(request):
     
     for tx in year_savings_tx:
         monthly_data[tx.date.month] += tx.amount
+    # Archived years: per-month totals instead of transactions
+    for row in archived:
+        if row.month.year == year and row.category == 'savings':
+            monthly_data[row.month.month] += row.total
+            total_saved_year += row.total
         
     chart_labels = [date(year, m, 1).strftime('%b') for m in month_range]
     chart_values = [float(monthly_data[m]) for m in month_range]
@@ -783,6 +774,7 @@ def savings_view(request):
     base_income_year = user.income * 12
     extra_income_tx = Transaction.objects.filter(user=user, category='income', date__year=year)
     extra_income_year = sum(tx.amount for tx in extra_income_tx)
+    extra_income_year += sum(row.total for row in archived if row.month.year == year and row.category == 'income')
     total_income_year = base_income_year + extra_income_year
     
     savings_rate = 0
@@ -817,11 +809,7 @@ def savings_view(request):
             status_msg = "On track, over 50%!"
             status_color = "var(--primary)"
     
-    context = {
-        'user': user,
-        'current_year': year,
-        'year_prev': year - 1,
-        'year_next': year + 1 if year < date.today().year else None,
+    return {
         'total_saved_all_time': total_saved_all_time,
         'total_saved_year': total_saved_year,
         'monthly_goal': monthly_goal,
@@ -837,6 +825,24 @@ def savings_view(request):
         'best_month_name': best_month_name,
         'best_month_val': best_month_val,
     }
+
+
+@login_required_view
+def savings_view(request):
+    """Deep analysis of savings"""
+    user = get_user(request)
+    
+    # Year filter
+    year = int(request.GET.get('year', date.today().year))
+    
+    context = {
+        'user': user,
+        'current_year': year,
+        'year_prev': year - 1,
+        'year_next': year + 1 if year < date.today().year else None,
+        # Only computed when the cached savings fragment has to be rendered
+        'summary': fragments.lazy(savings_summary, user, year),
+    }
     
     return render(request, 'core/savings.html', context)
 
@@ -878,13 +884,7 @@ def settings_view(request):
         except Exception as e:
             messages.error(request, f'Error saving settings: {str(e)}')
     
-    currencies = [
-        ('$', '$ Dollar'),
-        ('₹', '₹ Rupee'),
-        ('€', '€ Euro'),
-        ('£', '£ Pound'),
-        ('¥', '¥ Yen'),
-    ]
+    currencies = [(code, f'{code} {name}') for code, name, _ in money.CURRENCIES]
     
     context = {
         'user': user,
@@ -900,8 +900,9 @@ def reset_data(request):
     if request.method == 'POST':
         user = get_user(request)
         
-        # Delete all transactions
-        Transaction.objects.filter(user=user).delete()
+        # Delete all transactions, in batches; in the background unless DELETION['ASYNC'] is off
+        wipe = deletion.schedule(user, DeletionRequest.RESET)
+        archive.discard(user)
         
         # Reset user settings to defaults
         user.income = Decimal('0')
@@ -911,7 +912,10 @@ def reset_data(request):
         user.rule_savings = 20
         user.save()
         
-        messages.success(request, 'All data has been reset!')
+        if wipe.status == DeletionRequest.DONE:
+            messages.success(request, 'All data has been reset!')
+        else:
+            messages.success(request, 'Settings reset. Your transactions are being deleted.')
         return redirect('settings')
     
     return redirect('settings')
@@ -922,7 +926,10 @@ def export_data(request):
     """Export user data as JSON"""
     user = get_user(request)
     
-    transactions = Transaction.objects.filter(user=user)
+    transactions = chain(archive.archived_transactions(user), Transaction.objects.filter(user=user))
+    recurring_rules = list(RecurringRule.objects.filter(user=user))
+    # Confirmed occurrences point at their rule by position in 'recurring'
+    rule_index = {rule.id: i for i, rule in enumerate(recurring_rules)}
     
     data = {
         'income': float(user.income),
@@ -940,8 +947,20 @@ def export_data(request):
                 'cat': tx.category,
                 'date': tx.date.isoformat(),
                 'order': tx.order,
+                'rec': rule_index.get(tx.recurring_rule_id),
             }
             for tx in transactions
+        ],
+        'recurring': [
+            {
+                'desc': rule.description,
+                'amt': float(rule.amount),
+                'cat': rule.category,
+                'freq': rule.frequency,
+                'start': rule.start_date.isoformat(),
+                'end': rule.end_date.isoformat() if rule.end_date else None,
+            }
+            for rule in recurring_rules
         ]
     }
     
@@ -975,19 +994,37 @@ def import_data(request):
         user.rule_savings = rules.get('savings', 20)
         user.save()
         
-        # Delete existing transactions
-        Transaction.objects.filter(user=user).delete()
+        # Delete existing transactions; only rows from before this point, so the import survives
+        deletion.schedule(user, DeletionRequest.IMPORT)
+        archive.discard(user)
+        
+        # Import recurring rules
+        recurring_rules = [
+            RecurringRule.objects.create(
+                user=user,
+                description=rule_data.get('desc', ''),
+                amount=Decimal(str(rule_data.get('amt', 0))),
+                category=rule_data.get('cat', 'needs'),
+                frequency=rule_data.get('freq', RecurringRule.MONTHLY),
+                start_date=date.fromisoformat(rule_data['start']),
+                end_date=date.fromisoformat(rule_data['end']) if rule_data.get('end') else None
+            )
+            for rule_data in data.get('recurring', [])
+        ]
         
         # Import transactions
         for tx_data in data.get('txs', []):
+            rec = tx_data.get('rec')
             Transaction.objects.create(
                 user=user,
                 description=tx_data.get('desc', ''),
                 amount=Decimal(str(tx_data.get('amt', 0))),
                 category=tx_data.get('cat', 'needs'),
                 date=datetime.fromisoformat(tx_data.get('date', datetime.now().isoformat())).date(),
-                order=tx_data.get('order', 0)
+                order=tx_data.get('order', 0),
+                recurring_rule=recurring_rules[rec] if rec is not None else None
             )
+        user.bump_data_version()
         
         messages.success(request, 'Data imported successfully!')
     except Exception as e:
@@ -1008,6 +1045,14 @@ def toggle_theme(request):
     return redirect(referer)
 
 
+def transaction_totals(transactions):
+    """Income and expenses over `transactions`"""
+    return {
+        'income': sum(t.amount for t in transactions if t.category == 'income'),
+        'expenses': sum(t.amount for t in transactions if t.category != 'income'),
+    }
+
+
 @login_required_view
 def transactions_view(request):
     """Full transactions list with filtering"""
@@ -1026,37 +1071,46 @@ def transactions_view(request):
     
     # Use helper date
     current_dt = date(year, month, 1)
+    sort_by = request.GET.get('sort', 'date')
+    archived = archive.month_transactions(user, year, month)
     
-    # Base Query for Summary (All Month Data)
-    month_txs = Transaction.objects.filter(user=user, date__year=year, date__month=month)
-    
-    # Calculate Summary Total (ignore filters)
-    extra_income = sum(t.amount for t in month_txs if t.category == 'income')
-    total_income = extra_income
-    total_expenses = sum(t.amount for t in month_txs if t.category != 'income')
-    
-    # Filtered Query for List
-    txs = month_txs
+    # Base Query for Summary (All Month Data); an archived month is read from its archive
+    if archived is None:
+        month_txs = Transaction.objects.filter(user=user, date__year=year, date__month=month)
+    else:
+        month_txs = archived
     
-    if category != 'all':
-        txs = txs.filter(category=category)
+    # Calculate Summary Total (ignore filters); only needed when the cached summary is rendered
+    totals = fragments.lazy(transaction_totals, month_txs)
     
-    if search:
-        txs = txs.filter(description__icontains=search)
+    if archived is None:
+        # Filtered Query for List
+        txs = month_txs
         
-    # Sort
-    sort_by = request.GET.get('sort', 'date')
-    if sort_by == 'date':
-        # Default: Latest First
-        txs = txs.order_by('order', '-date', '-created_at')
-    elif sort_by == 'amount_high':
-        txs = txs.order_by('-amount')
-    elif sort_by == 'amount_low':
-        txs = txs.order_by('amount')
+        if category != 'all':
+            txs = txs.filter(category=category)
+        
+        if search:
+            txs = txs.filter(description__icontains=search)
+            
+        # Sort
+        if sort_by == 'date':
+            # Default: Latest First
+            txs = txs.order_by('order', '-date', '-created_at')
+        elif sort_by == 'amount_high':
+            txs = txs.order_by('-amount')
+        elif sort_by == 'amount_low':
+            txs = txs.order_by('amount')
+    else:
+        # The same filters over the decoded rows, which are already latest first
+        txs = [tx for tx in archived
+               if (category == 'all' or tx.category == category)
+               and (not search or search.lower() in tx.description.lower())]
+        if sort_by in ('amount_high', 'amount_low'):
+            txs.sort(key=lambda tx: tx.amount, reverse=sort_by == 'amount_high')
     
     context = {
-        'total_income': total_income,
-        'total_expenses': total_expenses,
+        'totals': totals,
         'user': user,
         'transactions': txs,
         'year': year,
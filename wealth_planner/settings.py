@@ -36,12 +36,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.WealthUserMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -58,6 +64,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.fragments.context_processor',
             ],
         },
     },
@@ -94,6 +101,14 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Sessions
+
+# Stored in a signed cookie, so reading one costs no query. With a shared
+# cache (Redis, Memcached) in CACHES, 'django.contrib.sessions.backends.cache'
+# also keeps them off the database and lets logout revoke them server-side.
+SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
+
 # Internationalization
 
 LANGUAGE_CODE = 'en-us'
@@ -111,6 +126,18 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Content-hashed names plus .br/.gz variants, written by `manage.py collectstatic`
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
+# Static files served by core.middleware.StaticFilesMiddleware
+STATIC_ASSETS = {
+    'MAX_AGE': 60 * 60 * 24 * 365,  # Hashed names are also marked immutable
+    'UNHASHED_MAX_AGE': 60,
+}
+
 
 # Default primary key field type
 
@@ -142,6 +169,75 @@ LOGGING = {
     },
 }
 
+# Request timing (Server-Timing header + 'core.timing' log line)
+REQUEST_TIMING = {
+    'SAMPLE_RATE': 0.0,  # Fraction of requests to instrument; set e.g. 1.0 locally to time every request
+    'SERVER_TIMING_HEADER': True,
+    'LOG': True,
+}
+
+# Response compression (brotli when installed, else gzip)
+COMPRESSION = {
+    'MIN_SIZE': 860,        # Bytes; smaller responses are sent uncompressed
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+}
+
+# Per-user template fragment caching (core/fragments.py); keys vary on User.data_version
+FRAGMENT_CACHE = {
+    'TIMEOUT': 60 * 60 * 24,
+}
+
+# OTP SMS delivery (core/otp_delivery.py). PROVIDER is any SMSProvider subclass;
+# ConsoleProvider and FileProvider are local stand-ins for development.
+OTP_DELIVERY = {
+    'PROVIDER': 'core.otp_delivery.ConsoleProvider',
+    'OPTIONS': {},
+    'ASYNC': True,        # Queue and send from a background thread
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 4,
+    'BACKOFF': 1.0,       # Seconds; doubles per retry
+}
+
+# Balance-checked expense writes (core/ledger.py), conditional on User.data_version
+LEDGER = {
+    'MAX_ATTEMPTS': 5,    # Retries when another write for the same user wins the race
+}
+
+# Cold storage of closed years (core/archive.py); run `manage.py archive_transactions` yearly
+ARCHIVE = {
+    'KEEP_YEARS': 2,           # Closed years kept in the Transaction table besides the current one
+    'COMPRESSION_LEVEL': 9,
+}
+
+# Batched deletion for reset, import and account deletion (core/deletion.py);
+# `manage.py process_deletions` resumes requests interrupted by a restart
+DELETION = {
+    'BATCH_SIZE': 500,
+    'PAUSE': 0.05,          # Seconds between batches, so other writes get the database
+}
+
+# /api/bootstrap/ sections computed concurrently on a per-process thread pool (core/bootstrap.py)
+BOOTSTRAP = {
+    'CONCURRENT': True,
+    'WORKERS': 4,
+}
+
+# Prometheus metrics at /metrics (core/metrics.py), for scrapers sending
+# `Authorization: Bearer <TOKEN>`; empty TOKEN disables the endpoint
+METRICS = {
+    'TOKEN': '',
+}
+
+# Request profiling; see `manage.py profile_report`
+PROFILING = {
+    'SAMPLE_RATE': 0.0,          # Fraction of requests to run under cProfile
+    'SLOW_REQUEST_MS': None,     # e.g. 500 to keep stack samples of slow requests
+    'HEADER_TOKEN': '',          # Optional shared secret for the X-Profile header
+    'DIR': BASE_DIR / 'profiles',
+    'MAX_FILES': 200,
+}
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -150,6 +246,17 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.renderers.FastJSONParser',
+        'core.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 # SimpleJWT Configuration
@@ -162,5 +269,21 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# JWT revocation (core/revocation.py): revoked jtis are checked through an
+# in-memory Bloom filter per process; run `manage.py compact_revocations` daily
+TOKEN_REVOCATION = {
+    'FALSE_POSITIVE_RATE': 0.001,
+    'SYNC_INTERVAL': 5,           # Seconds until other processes see a revocation
+    'REBUILD_INTERVAL': 60 * 60,
+}
+
+# Idempotency-Key replay for API writes (core/idempotency.py); responses are
+# kept in CACHES, which must be shared for replays to reach other workers
+IDEMPOTENCY = {
+    'TTL': 60 * 60 * 24,
+    'AUTH_TTL': 5 * 60,     # Responses carrying tokens (registration) are replayed only this long
+    'WAIT_TIMEOUT': 10,     # Seconds a duplicate waits for the in-flight original
+}
+
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = True  # For development - restrict in production